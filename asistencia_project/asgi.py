@@ -14,3 +14,9 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'asistencia_project.settings')
 
 application = get_asgi_application()
+
+# Carga la caché de presencia del día en segundo plano (y a cada medianoche),
+# para que el primer stream no la cargue dentro del bucle de frames
+from core.attendance import get_presence_cache  # noqa: E402
+
+get_presence_cache().start()
@@ -121,6 +121,148 @@ STATIC_URL = 'static/'
 # --- Configuración para fotos de perfil (MEDIA) ---
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Miniaturas cuadradas que se generan al subir cada foto, junto al original
+# (python manage.py build_thumbnails las crea para las fotos existentes)
+PROFILE_THUMBNAIL_WIDTHS = (64, 160, 320)
+# El último formato es el respaldo para navegadores sin WebP
+PROFILE_THUMBNAIL_FORMATS = ('webp', 'jpeg')
+PROFILE_THUMBNAIL_QUALITY = 80
+
+# --- Configuración del modo de captura ---
+# 'server': el servidor lee su cámara (CAMERA_SOURCE) y emite el video MJPEG
+# 'client': el navegador del kiosco captura con getUserMedia y sube frames
+# reducidos a /analyze_frames/; el servidor solo ejecuta la inferencia
+CAPTURE_MODE = 'server'
+# Frames por segundo, ancho en píxeles y calidad JPEG (0-1) de lo que sube el navegador
+CLIENT_CAPTURE_FPS = 10
+CLIENT_CAPTURE_WIDTH = 320
+CLIENT_CAPTURE_QUALITY = 0.7
+# Frames máximos por petición (se acumulan mientras la anterior está en curso)
+CLIENT_CAPTURE_MAX_BATCH = 8
+# Segundos sin peticiones tras los que se libera el detector de un kiosco remoto
+CLIENT_CAPTURE_MAX_IDLE = 300.0
+
+# --- Configuración del reconocimiento facial ---
+# 'off': se registra la asistencia del usuario con sesión iniciada
+# 'verify': solo si el rostro coincide con la foto de perfil de ese usuario
+# 'identify': kiosco compartido; se registra a quien se reconozca, sin que
+# cada persona inicie sesión (python manage.py enroll_faces calcula los vectores)
+FACE_RECOGNITION_MODE = 'off'
+# 'sface': SFace de OpenCV, requiere face_recognition_sface_2021dec.onnx
+# 'lbp': sin modelo, mucho menos preciso (pruebas o grupos pequeños)
+FACE_EMBEDDER_BACKEND = 'sface'
+FACE_EMBEDDER_MODEL_PATH = None
+# Similitud coseno mínima para aceptar una coincidencia (None = la del modelo)
+FACE_RECOGNITION_THRESHOLD = None
+# Muestras del rostro que votan la identidad durante la prueba de vida
+FACE_RECOGNITION_SAMPLES = 5
+# Matriz de vectores enrolados (.npy) que se mapea en memoria al arrancar;
+# se actualiza fila por fila al cambiar una foto de perfil
+FACE_EMBEDDINGS_DIR = BASE_DIR / 'embeddings'
+
+# --- Configuración de la cámara ---
+# Fuente de frames del kiosco:
+#   0, 1...                    cámara local (índice del dispositivo)
+#   'rtsp://...', 'http://...' cámara de red
+#   '/ruta/video.mp4'          video grabado (se reproduce en bucle)
+#   '/ruta/imagenes/'          directorio de imágenes, en orden alfabético
+#   'synthetic:640x480'        frames generados, sin hardware
+CAMERA_SOURCE = 0
+# Resolución y fps pedidos a la cámara (None = los del dispositivo). En videos
+# y directorios fijan el tamaño de salida y la velocidad de reproducción.
+CAMERA_WIDTH = None
+CAMERA_HEIGHT = None
+CAMERA_FPS = None
+# Frames que retiene el driver; 1 evita entregar frames atrasados
+CAMERA_BUFFER_SIZE = 1
+# Reiniciar videos y directorios al terminar
+CAMERA_LOOP = True
+# Varias entradas: una cámara por identificador, servida en /video_feed/<id>/.
+# Cada una acepta 'source', 'name', 'width', 'height', 'fps', 'buffer_size',
+# 'loop' y 'weight' (parte de la capacidad de inferencia que le corresponde);
+# lo que falte se toma de CAMERA_*. Vacío: una sola cámara con CAMERA_SOURCE.
+# CAMERAS = {
+#     'principal': {'source': 0, 'name': 'Entrada principal'},
+#     'norte': {'source': 'rtsp://10.0.0.12/stream', 'name': 'Entrada norte', 'fps': 15},
+# }
+CAMERAS = {}
+# Segundos que el dispositivo sigue abierto tras desconectarse el último visor
+CAMERA_IDLE_TIMEOUT = 5.0
+# Tamaño de las colas entre etapas del pipeline (se descarta el frame más antiguo)
+PIPELINE_QUEUE_SIZE = 2
+
+# --- Configuración de la codificación JPEG del stream ---
+# 'opencv' o 'turbojpeg' (libjpeg-turbo vía PyTurboJPEG; si no está
+# disponible se usa OpenCV)
+JPEG_ENCODER = 'opencv'
+JPEG_QUALITY = 80
+# Submuestreo de croma: '444', '422' o '420' (el más ligero)
+JPEG_SUBSAMPLING = '420'
+# Ruta a libturbojpeg.so si no está en las rutas estándar del sistema
+TURBOJPEG_LIB_PATH = None
+# Techos del stream adaptativo; cada visor puede bajarlos con ?fps=&q=&w=
+# y el servidor reduce calidad, resolución y fps si la red no da abasto
+STREAM_MAX_FPS = 30
+# Ancho máximo en píxeles del video enviado (None = resolución de la cámara)
+STREAM_MAX_WIDTH = None
+# Diferencia media (niveles de gris, 0-255) por debajo de la cual un frame se
+# considera igual al último enviado y no se codifica
+STREAM_DIFF_THRESHOLD = 1.5
+# Segundos máximos entre frames enviados aunque la imagen no cambie
+STREAM_KEEPALIVE = 0.5
+
+# --- Configuración de las métricas en tiempo real ---
+# Backend de las métricas en tiempo real:
+# 'memory' (un solo proceso), 'unix' (almacén local por socket Unix, para
+# varios workers en la misma máquina) o 'redis' (requiere el paquete redis)
+METRICS_BACKEND = 'memory'
+METRICS_SOCKET_PATH = '/tmp/asistencia-metrics.sock'
+METRICS_REDIS_URL = 'redis://localhost:6379/0'
+# Métricas por sesión: número de particiones del registro y segundos sin uso
+# tras los que se descarta el canal de un kiosco
+METRICS_SHARDS = 16
+METRICS_MAX_IDLE = 3600.0
+# Segundos sin cambios tras los que el stream SSE de métricas envía un keep-alive
+METRICS_SSE_KEEPALIVE = 15.0
+
+# --- Configuración de la detección de rostros ---
+# Detector: 'mediapipe_full' (alcance completo), 'mediapipe_short' (rostros a
+# menos de 2 m), 'yunet' y 'ssd' (OpenCV DNN, requieren un modelo local) o
+# 'haar' (el más barato). Compáralos con: python manage.py bench_detection
+FACE_DETECTOR_BACKEND = 'mediapipe_full'
+# Modelo para 'yunet' (.onnx) o 'ssd' (.caffemodel/.onnx) y, para Caffe, su
+# deploy.prototxt; con 'haar' MODEL_PATH puede apuntar a otra cascada
+FACE_DETECTOR_MODEL_PATH = None
+FACE_DETECTOR_CONFIG_PATH = None
+# 'tracking': detecta cada K frames y sigue el rostro entre detecciones
+# 'every_frame': ejecuta el modelo en todos los frames
+FACE_DETECTION_MODE = 'tracking'
+# Ancho en píxeles del frame que recibe el modelo (None = resolución completa)
+FACE_DETECTION_INPUT_WIDTH = 320
+# Presupuesto de CPU por frame para la detección; K se ajusta para respetarlo
+FACE_DETECTION_BUDGET_MS = 10.0
+FACE_DETECTION_MAX_INTERVAL = 10
+# Por debajo de esta confianza el recuadro seguido fuerza una nueva detección
+FACE_TRACKING_MIN_CONFIDENCE = 0.5
+# 'pool': un servicio central con un detector por núcleo atiende a todos los
+# streams en micro-lotes; 'process': igual, pero cada detector corre en su
+# propio proceso y recibe los frames por memoria compartida (sin competir
+# por el GIL con Django); 'local': cada stream crea su propio modelo
+FACE_INFERENCE_BACKEND = 'pool'
+# Detectores del pool (None = uno por núcleo de CPU)
+FACE_INFERENCE_WORKERS = None
+# Frames máximos por micro-lote y segundos máximos de espera para completarlo
+FACE_INFERENCE_MAX_BATCH = 8
+FACE_INFERENCE_MAX_DELAY = 0.002
+# Segundos que un stream espera una detección del pool; si vence, ese frame
+# se procesa como sin rostros en lugar de bloquear el stream
+FACE_INFERENCE_TIMEOUT = 1.0
+
+# --- Configuración del registro de asistencias ---
+# Las asistencias se guardan en lotes desde un hilo en segundo plano
+ATTENDANCE_BATCH_SIZE = 200
+# Segundos que se espera a reunir un lote antes de escribirlo
+ATTENDANCE_FLUSH_DELAY = 0.05
 
 # --- Configuración para login/logout ---
 LOGIN_REDIRECT_URL = '/'
@@ -1,8 +1,17 @@
 from django.contrib import admin
-from .models import UserProfile, Asistencia
+from .models import UserProfile, Asistencia, AsistenciaDuplicada, FaceEmbedding
+from .templatetags.thumbnails import profile_picture
 
-admin.site.register(UserProfile)
-admin.site.register(Asistencia)
-from django.contrib import admin
+@admin.register(UserProfile)
+class UserProfileAdmin(admin.ModelAdmin):
+    list_display = ('user', 'miniatura')
+    search_fields = ('user__username',)
 
-# Register your models here.
+    @admin.display(description='Foto')
+    def miniatura(self, obj):
+        # La miniatura más chica en lugar de la foto original
+        return profile_picture(obj, 48)
+
+admin.site.register(Asistencia)
+admin.site.register(FaceEmbedding)
+admin.site.register(AsistenciaDuplicada)
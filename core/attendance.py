@@ -0,0 +1,288 @@
+"""
+Registro de asistencias fuera del bucle de frames.
+
+El stream no escribe en la base de datos: encola el registro en
+``AttendanceWriter`` y recibe un ``Future`` que se resuelve cuando la
+asistencia queda confirmada. Un hilo en segundo plano agrupa las peticiones
+en lotes y las guarda con un único ``bulk_create`` por lote, de modo que la
+contención de SQLite nunca detiene el video.
+
+``PresenceCache`` guarda en memoria quién ya registró asistencia hoy, para
+que iniciar o reconectar un stream de alguien ya registrado no consulte la
+base de datos. Se carga al arrancar el servidor (``wsgi.py``/``asgi.py``).
+"""
+import datetime
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from queue import Empty, Queue
+
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Asistencia
+
+logger = logging.getLogger(__name__)
+
+
+class PresenceCache:
+    """
+    Conjunto de usuarios con asistencia en el día local actual.
+
+    ``start()`` lo carga desde la base de datos al arrancar el servidor y lo
+    vuelve a cargar en un hilo propio a cada medianoche local (``TIME_ZONE``,
+    America/Guayaquil), fuera del bucle de frames. Un acierto responde en
+    O(1) sin tocar la base de datos.
+
+    Un fallo no es definitivo: con varios workers (gunicorn/uvicorn) cada
+    proceso tiene su propia caché y otro pudo registrar al usuario, así que
+    se confirma con una consulta por la restricción única (user, fecha) y,
+    si existe, se agrega. Los borrados hechos desde otro proceso se ven
+    recién en la siguiente recarga.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._day = None
+        self._users = set()
+        self._warmer = None
+
+    def _current_locked(self):
+        today = timezone.localdate()
+        if today != self._day:
+            # Cambió el día antes de la recarga: se empieza vacío y los
+            # fallos consultan la base de datos
+            self._users = set()
+            self._day = today
+        return today
+
+    def warm(self):
+        """Carga los presentes de hoy desde la base de datos."""
+        today = timezone.localdate()
+        users = set(Asistencia.objects.filter(fecha=today).values_list('user_id', flat=True))
+        with self._lock:
+            if self._day == today:
+                # Registros agregados mientras corría la consulta
+                users |= self._users
+            self._day = today
+            self._users = users
+        return len(users)
+
+    def start(self):
+        """Carga la caché ahora y a cada medianoche local, en segundo plano."""
+        with self._lock:
+            if self._warmer is not None and self._warmer.is_alive():
+                return
+            self._warmer = threading.Thread(target=self._warm_daily, name="presence-warmer", daemon=True)
+            self._warmer.start()
+
+    def _warm_daily(self):
+        while True:
+            try:
+                logger.info("Caché de presencia cargada: %d usuarios", self.warm())
+                delay = seconds_until_midnight() + 1
+            except DatabaseError:
+                # Base sin migrar o no disponible: se reintenta
+                logger.exception("No se pudo cargar la caché de presencia")
+                delay = 60
+            finally:
+                connection.close()
+            time.sleep(delay)
+
+    def has_attended(self, user_id):
+        with self._lock:
+            today = self._current_locked()
+            if user_id in self._users:
+                return True
+        # Se consulta fuera del lock: no bloquea a los demás streams
+        if not Asistencia.objects.filter(user_id=user_id, fecha=today).exists():
+            return False
+        self.add([user_id], day=today)
+        return True
+
+    def add(self, user_ids, day=None):
+        """Marca ``user_ids`` como presentes en ``day`` (hoy por defecto)."""
+        with self._lock:
+            today = self._current_locked()
+            if day is None or day == today:
+                self._users.update(user_ids)
+
+    def invalidate(self):
+        """Descarta lo cargado; los fallos vuelven a consultar la base de datos."""
+        with self._lock:
+            self._day = None
+            self._users = set()
+
+
+def seconds_until_midnight():
+    """Segundos hasta la próxima medianoche local."""
+    now = timezone.localtime()
+    midnight = datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time())
+    return max(0.0, (timezone.make_aware(midnight) - now).total_seconds())
+
+
+class AttendanceWriter:
+    """Cola de escritura diferida con escritura por lotes."""
+
+    def __init__(self, batch_size=200, max_delay=0.05, presence=None):
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.presence = presence
+        self._queue = Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._rows = 0
+        self._requests = 0
+        self._commit_seconds = 0.0
+
+    def submit(self, user_id):
+        """
+        Encola el registro de asistencia de hoy para ``user_id``.
+
+        El ``Future`` devuelto se resuelve con True si se creó el registro o
+        False si el usuario ya tenía asistencia hoy.
+        """
+        future = Future()
+        self._ensure_started()
+        self._queue.put((user_id, future))
+        return future
+
+    def flush(self, timeout=None):
+        """Espera a que se escriban todas las peticiones encoladas hasta ahora."""
+        return self.submit(None).result(timeout)
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "requests": self._requests,
+                "rows": self._rows,
+                "batches": self._batches,
+                "avg_batch": round(self._requests / self._batches, 1) if self._batches else 0,
+                "avg_commit_ms": round(self._commit_seconds * 1000 / self._batches, 2) if self._batches else 0,
+                "pending": self._queue.qsize(),
+            }
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="attendance-writer", daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                created = self._write([user_id for user_id, _ in batch if user_id is not None])
+            except Exception as exc:
+                logger.exception("Error al guardar un lote de %d asistencias", len(batch))
+                # La conexión puede haber quedado inutilizable
+                connection.close()
+                for _, future in batch:
+                    future.set_exception(exc)
+                continue
+            for user_id, future in batch:
+                future.set_result(user_id in created)
+
+    def _write(self, user_ids):
+        """Guarda un lote; devuelve el conjunto de usuarios registrados ahora."""
+        if not user_ids:
+            return set()
+        start = time.perf_counter()
+        today = timezone.localdate()
+        pending = set(user_ids)
+        with transaction.atomic():
+            existing = set(
+                Asistencia.objects.filter(user_id__in=pending, fecha=today)
+                .values_list('user_id', flat=True)
+            )
+            created = self._insert(pending - existing, today)
+        with self._stats_lock:
+            self._batches += 1
+            self._requests += len(user_ids)
+            self._rows += len(created)
+            self._commit_seconds += time.perf_counter() - start
+        if self.presence is not None:
+            self.presence.add(pending, day=today)
+        return created
+
+    def _insert(self, user_ids, today):
+        """
+        Inserta la asistencia de ``user_ids``; devuelve los que se insertaron.
+
+        Lo normal es un único ``bulk_create``. Si otro proceso registró a
+        alguno entre la consulta y la inserción, la restricción única
+        (user, fecha) rechaza el lote y se repite fila por fila para saber
+        exactamente cuáles quedaron escritas por este lote.
+        """
+        if not user_ids:
+            return set()
+        try:
+            with transaction.atomic():
+                Asistencia.objects.bulk_create([Asistencia(user_id=user_id, fecha=today) for user_id in user_ids])
+            return set(user_ids)
+        except IntegrityError:
+            pass
+        inserted = set()
+        for user_id in user_ids:
+            try:
+                with transaction.atomic():
+                    Asistencia.objects.create(user_id=user_id, fecha=today)
+            except IntegrityError:
+                continue
+            inserted.add(user_id)
+        return inserted
+
+
+_writer = None
+_presence = PresenceCache()
+_writer_lock = threading.Lock()
+
+
+def get_presence_cache():
+    """Devuelve la caché de presencia del día compartida por el proceso."""
+    return _presence
+
+
+def get_attendance_writer():
+    """Devuelve el escritor de asistencias compartido por el proceso."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            from django.conf import settings
+            _writer = AttendanceWriter(
+                batch_size=getattr(settings, 'ATTENDANCE_BATCH_SIZE', 200),
+                max_delay=getattr(settings, 'ATTENDANCE_FLUSH_DELAY', 0.05),
+                presence=_presence,
+            )
+        return _writer
+
+
+@receiver(post_save, sender=Asistencia)
+def add_to_presence_cache(sender, instance, created, **kwargs):
+    # Registros creados fuera del stream (admin, shell) también cuentan
+    # Tras el commit: un registro revertido no debe marcar presencia
+    if created:
+        transaction.on_commit(lambda: _presence.add([instance.user_id], day=instance.fecha))
+
+
+@receiver(post_delete, sender=Asistencia)
+def invalidate_presence_cache(sender, instance, **kwargs):
+    _presence.invalidate()
@@ -0,0 +1,247 @@
+"""
+Servicio de captura compartido.
+
+Un único hilo en segundo plano es dueño del dispositivo de captura y publica
+los últimos frames en un buffer circular. Cada visor de ``/video_feed/`` se
+suscribe al servicio en lugar de abrir su propia ``cv2.VideoCapture``, de modo
+que N visores cuestan una sola decodificación y reconectarse no obliga a
+reabrir la cámara. La fuente puede ser una cámara local, una URL, un video,
+un directorio de imágenes o frames sintéticos (ver ``core.sources``).
+"""
+import threading
+import time
+from collections import deque
+
+from .sources import open_source
+
+
+class CameraService:
+    """Hilo de captura que publica frames para varios suscriptores."""
+
+    def __init__(self, device=0, buffer_size=2, idle_timeout=5.0, options=None):
+        self.device = device
+        # Resolución, fps, buffer y bucle que se pasan a ``open_source``
+        self.options = dict(options or {})
+        self.idle_timeout = idle_timeout
+        self.error = None
+        self._frames = deque(maxlen=buffer_size)
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._subscribers = 0
+        self._last_release = time.monotonic()
+        self._running = False
+        self._thread = None
+
+    @property
+    def running(self):
+        with self._cond:
+            return self._running
+
+    @property
+    def subscribers(self):
+        with self._cond:
+            return self._subscribers
+
+    def acquire(self):
+        """Registra un visor y arranca el hilo de captura si hace falta."""
+        with self._cond:
+            self._subscribers += 1
+            if not self._running:
+                self._start_locked()
+
+    def release(self):
+        """Da de baja un visor; el dispositivo sigue abierto ``idle_timeout`` segundos."""
+        with self._cond:
+            self._subscribers = max(0, self._subscribers - 1)
+            self._last_release = time.monotonic()
+
+    def latest(self):
+        """Devuelve ``(seq, frame)`` del último frame publicado o ``(0, None)``."""
+        with self._cond:
+            if not self._frames:
+                return 0, None
+            return self._frames[-1]
+
+    def frames(self):
+        """
+        Genera los frames más recientes a medida que llegan.
+
+        Un visor lento no frena la captura: simplemente salta los frames
+        intermedios y recibe siempre el último. Los frames son compartidos,
+        por lo que el consumidor debe copiarlos antes de dibujar sobre ellos.
+        """
+        self.acquire()
+        try:
+            with self._cond:
+                last_seq = self._seq
+            while True:
+                with self._cond:
+                    while self._running and self._seq == last_seq:
+                        self._cond.wait(timeout=1.0)
+                    if self._seq == last_seq:
+                        return
+                    last_seq, frame = self._frames[-1]
+                yield frame
+        finally:
+            self.release()
+
+    def stop(self, timeout=None):
+        """Detiene el hilo de captura y libera el dispositivo."""
+        with self._cond:
+            self._running = False
+            thread = self._thread
+            self._cond.notify_all()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def _start_locked(self):
+        previous = self._thread
+        self.error = None
+        self._frames.clear()
+        self._running = True
+        self._thread = threading.Thread(
+            target=self._run, args=(previous,),
+            name=f"camera-{self.device}", daemon=True,
+        )
+        self._thread.start()
+
+    def _open(self):
+        return open_source(self.device, **self.options)
+
+    def _fail(self, error):
+        with self._cond:
+            self.error = error
+            self._running = False
+            self._cond.notify_all()
+
+    def _run(self, previous):
+        # Un hilo anterior puede estar liberando todavía el mismo dispositivo.
+        if previous is not None:
+            previous.join()
+
+        try:
+            cap = self._open()
+        except Exception as exc:
+            # Fuente mal configurada o que no se puede abrir: los visores
+            # terminan y ``acquire()`` puede volver a intentarlo
+            self._fail(f"Error: Cámara no disponible ({exc})")
+            return
+        if not cap.isOpened():
+            self._fail("Error: Cámara no disponible")
+            return
+
+        try:
+            while True:
+                try:
+                    success, frame = cap.read()
+                except Exception as exc:
+                    self._fail(f"Error al leer la cámara: {exc}")
+                    break
+                with self._cond:
+                    if not self._running:
+                        break
+                    if not success:
+                        self._running = False
+                        break
+                    self._seq += 1
+                    self._frames.append((self._seq, frame))
+                    self._cond.notify_all()
+                    idle = time.monotonic() - self._last_release
+                    if self._subscribers == 0 and idle > self.idle_timeout:
+                        self._running = False
+                        break
+        finally:
+            cap.release()
+            with self._cond:
+                self._cond.notify_all()
+
+
+# --- Cámaras configuradas ---
+DEFAULT_CAMERA = 'principal'
+# Opciones de ``CAMERAS`` que se pasan a ``open_source`` al abrir la fuente
+CAPTURE_OPTIONS = ('width', 'height', 'fps', 'buffer_size', 'loop')
+
+
+def configured_cameras():
+    """
+    Cámaras declaradas en ``settings.CAMERAS``: ``{camera_id: opciones}``.
+
+    Cada cámara tiene ``source`` y, opcionalmente, ``name``, ``width``,
+    ``height``, ``fps``, ``buffer_size``, ``loop`` y ``weight`` (su parte de
+    la capacidad de inferencia). Lo que no se indique se toma de los ajustes
+    ``CAMERA_*``. Sin ``CAMERAS`` hay una sola cámara, ``DEFAULT_CAMERA``,
+    que lee ``CAMERA_SOURCE``.
+
+    Lanza ImproperlyConfigured si un ``weight`` no es un número positivo o
+    si dos cámaras usan la misma fuente con distintas opciones de captura,
+    antes de que algún stream la abra.
+    """
+    from django.conf import settings
+    from django.core.exceptions import ImproperlyConfigured
+
+    defaults = {
+        'source': getattr(settings, 'CAMERA_SOURCE', getattr(settings, 'CAMERA_DEVICE', 0)),
+        'width': getattr(settings, 'CAMERA_WIDTH', None),
+        'height': getattr(settings, 'CAMERA_HEIGHT', None),
+        'fps': getattr(settings, 'CAMERA_FPS', None),
+        'buffer_size': getattr(settings, 'CAMERA_BUFFER_SIZE', 1),
+        'loop': getattr(settings, 'CAMERA_LOOP', True),
+        'weight': 1.0,
+    }
+    cameras = getattr(settings, 'CAMERAS', None) or {DEFAULT_CAMERA: {}}
+    configured = {}
+    # Fuente -> (cámara, opciones de captura): una fuente se abre una sola vez
+    sources = {}
+    for camera_id, options in cameras.items():
+        config = {**defaults, 'name': str(camera_id), **options}
+        # El pool de inferencia divide el consumo de cada cámara por su peso
+        try:
+            config['weight'] = float(config['weight'])
+        except (TypeError, ValueError):
+            config['weight'] = None
+        if config['weight'] is None or not config['weight'] > 0:
+            raise ImproperlyConfigured(
+                f"CAMERAS: el 'weight' de '{camera_id}' debe ser un número mayor que 0 "
+                f"({options.get('weight')!r})"
+            )
+        capture = {key: config[key] for key in CAPTURE_OPTIONS}
+        first_id, first_capture = sources.setdefault(config['source'], (camera_id, capture))
+        if capture != first_capture:
+            raise ImproperlyConfigured(
+                f"CAMERAS: '{first_id}' y '{camera_id}' comparten la fuente {config['source']!r} "
+                f"con opciones de captura distintas ({first_capture} y {capture})"
+            )
+        configured[str(camera_id)] = config
+    return configured
+
+
+def default_camera_id():
+    """Primera cámara configurada; es la de ``/video_feed/`` sin identificador."""
+    return next(iter(configured_cameras()))
+
+
+# --- Registro de servicios por dispositivo ---
+_services_lock = threading.Lock()
+# ``device -> (servicio, kwargs con los que se creó)``
+_services = {}
+
+
+def get_camera(device=0, **kwargs):
+    """
+    Devuelve el servicio de captura compartido para ``device``.
+
+    Un dispositivo se abre una sola vez, así que todas las cámaras que lo
+    usan deben pedirlo con las mismas opciones; si no, lanza ValueError en
+    lugar de entregar en silencio el servicio creado con otras.
+    """
+    with _services_lock:
+        entry = _services.get(device)
+        if entry is None:
+            entry = _services[device] = (CameraService(device, **kwargs), kwargs)
+        service, created_with = entry
+        if kwargs != created_with:
+            raise ValueError(
+                f"La fuente {device!r} ya está abierta con otras opciones "
+                f"({created_with}); use las mismas en todas las cámaras que la comparten"
+            )
+        return service
@@ -0,0 +1,365 @@
+"""
+Detección de rostros para el stream de video.
+
+Todos los detectores reciben frames BGR y devuelven una lista de
+``FaceBox`` relativos, con ``detect(frame)`` y ``close()``:
+
+- ``mediapipe_short`` / ``mediapipe_full``: MediaPipe de corto alcance
+  (rostros a menos de 2 m) o de alcance completo.
+- ``yunet``: YuNet con ``cv2.FaceDetectorYN`` (modelo ONNX local).
+- ``ssd``: ResNet-10 SSD u otra red de ``cv2.dnn`` (modelo local).
+- ``haar``: clasificador Haar de OpenCV; el más barato y el menos preciso.
+
+``build_face_detector`` los construye por nombre. ``TrackingDetector``
+envuelve a cualquiera para ejecutar la detección solo cada K frames (o
+cuando la confianza del recuadro seguido decae) y, entre detecciones,
+desplaza el recuadro con flujo óptico, que es mucho más barato. K se adapta
+al presupuesto de CPU por frame.
+"""
+import math
+import os
+import time
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+# Recuadro relativo (0-1) al tamaño del frame, como en MediaPipe
+FaceBox = namedtuple("FaceBox", "xmin ymin width height score")
+
+
+def box_to_pixels(box, frame_shape):
+    """Convierte un ``FaceBox`` relativo a ``(x, y, w, h)`` en píxeles."""
+    ih, iw = frame_shape[:2]
+    return (int(box.xmin * iw), int(box.ymin * ih),
+            int(box.width * iw), int(box.height * ih))
+
+
+class InferenceResizer:
+    """
+    Reduce los frames a ``width`` píxeles de ancho antes de la inferencia.
+
+    Los buffers de salida se reservan una vez y se reutilizan mientras el
+    tamaño del frame de entrada no cambie. Como MediaPipe devuelve recuadros
+    relativos y se conserva la relación de aspecto, los recuadros se
+    reproyectan sobre el frame original sin ninguna corrección.
+    """
+
+    def __init__(self, width=None):
+        self.width = width
+        self._shape = None
+        self._size = None
+        self._small = None
+        self._rgb = None
+
+    def _allocate(self, shape):
+        ih, iw = shape[:2]
+        if self.width and iw > self.width:
+            size = (self.width, max(1, round(ih * self.width / iw)))
+        else:
+            size = (iw, ih)
+        self._shape = shape
+        self._size = size
+        self._small = np.empty((size[1], size[0], 3), dtype=np.uint8) if size != (iw, ih) else None
+        self._rgb = np.empty((size[1], size[0], 3), dtype=np.uint8)
+
+    def small(self, frame):
+        """Devuelve el frame reducido en BGR (buffer reutilizado)."""
+        if frame.shape != self._shape:
+            self._allocate(frame.shape)
+        if self._small is None:
+            return frame
+        cv2.resize(frame, self._size, dst=self._small, interpolation=cv2.INTER_AREA)
+        return self._small
+
+    def rgb(self, frame):
+        """Devuelve el frame reducido y convertido a RGB (buffer reutilizado)."""
+        cv2.cvtColor(self.small(frame), cv2.COLOR_BGR2RGB, dst=self._rgb)
+        return self._rgb
+
+
+class MediaPipeDetector:
+    """Detector de rostros de MediaPipe sobre frames BGR."""
+
+    def __init__(self, model_selection=1, min_detection_confidence=0.5, input_width=None):
+        import mediapipe as mp
+        self._detector = mp.solutions.face_detection.FaceDetection(
+            model_selection=model_selection,
+            min_detection_confidence=min_detection_confidence,
+        )
+        self._resizer = InferenceResizer(input_width)
+
+    def detect(self, frame):
+        results = self._detector.process(self._resizer.rgb(frame))
+        boxes = []
+        for detection in results.detections or ():
+            bboxC = detection.location_data.relative_bounding_box
+            boxes.append(FaceBox(bboxC.xmin, bboxC.ymin, bboxC.width,
+                                 bboxC.height, detection.score[0]))
+        return boxes
+
+    def close(self):
+        self._detector.close()
+
+
+def _require_model(path, backend):
+    if not path or not os.path.exists(path):
+        raise ValueError(
+            f"El detector '{backend}' requiere un archivo de modelo local "
+            f"(FACE_DETECTOR_MODEL_PATH / FACE_DETECTOR_CONFIG_PATH): {path}"
+        )
+
+
+class YuNetDetector:
+    """Detector YuNet de OpenCV (``face_detection_yunet_*.onnx``)."""
+
+    def __init__(self, model_path, min_detection_confidence=0.5, input_width=None, nms_threshold=0.3):
+        _require_model(model_path, "yunet")
+        self._detector = cv2.FaceDetectorYN.create(
+            model_path, "", (320, 320), min_detection_confidence, nms_threshold)
+        self._resizer = InferenceResizer(input_width)
+        self._size = None
+
+    def detect(self, frame):
+        small = self._resizer.small(frame)
+        ih, iw = small.shape[:2]
+        if (iw, ih) != self._size:
+            self._detector.setInputSize((iw, ih))
+            self._size = (iw, ih)
+        _, faces = self._detector.detect(small)
+        if faces is None:
+            return []
+        # Cada fila: x, y, w, h, 5 puntos faciales (x, y) y la puntuación
+        return [FaceBox(f[0] / iw, f[1] / ih, f[2] / iw, f[3] / ih, float(f[14])) for f in faces]
+
+    def close(self):
+        pass
+
+
+class DNNDetector:
+    """
+    Red de detección SSD de ``cv2.dnn`` (por defecto ResNet-10 300x300).
+
+    ``config_path`` es el ``deploy.prototxt`` para modelos Caffe; los modelos
+    ONNX o TensorFlow se cargan igual con ``cv2.dnn.readNet``.
+    """
+
+    MEAN = (104.0, 177.0, 123.0)
+
+    def __init__(self, model_path, config_path=None, min_detection_confidence=0.5, input_size=300):
+        _require_model(model_path, "ssd")
+        if config_path:
+            _require_model(config_path, "ssd")
+        self._net = cv2.dnn.readNet(model_path, config_path or "")
+        self.min_detection_confidence = min_detection_confidence
+        self.input_size = input_size
+
+    def detect(self, frame):
+        size = (self.input_size, self.input_size)
+        self._net.setInput(cv2.dnn.blobFromImage(frame, 1.0, size, self.MEAN))
+        # Salida [1, 1, N, 7]: imagen, clase, puntuación, x1, y1, x2, y2 (relativos)
+        boxes = []
+        for detection in self._net.forward()[0, 0]:
+            score = float(detection[2])
+            if score < self.min_detection_confidence:
+                continue
+            x1, y1, x2, y2 = np.clip(detection[3:7], 0.0, 1.0)
+            if x2 > x1 and y2 > y1:
+                boxes.append(FaceBox(float(x1), float(y1), float(x2 - x1), float(y2 - y1), score))
+        return boxes
+
+    def close(self):
+        pass
+
+
+class HaarDetector:
+    """
+    Clasificador Haar de OpenCV.
+
+    No da una confianza real: cada rostro se devuelve con puntuación 1.0.
+    """
+
+    def __init__(self, cascade_path=None, input_width=None, scale_factor=1.1, min_neighbors=5):
+        cascade_path = cascade_path or cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+        self._cascade = cv2.CascadeClassifier(cascade_path)
+        if self._cascade.empty():
+            raise ValueError(f"No se pudo cargar el clasificador Haar {cascade_path}")
+        self._resizer = InferenceResizer(input_width)
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+
+    def detect(self, frame):
+        gray = cv2.cvtColor(self._resizer.small(frame), cv2.COLOR_BGR2GRAY)
+        ih, iw = gray.shape
+        faces = self._cascade.detectMultiScale(
+            gray, scaleFactor=self.scale_factor, minNeighbors=self.min_neighbors, minSize=(30, 30))
+        return [FaceBox(x / iw, y / ih, w / iw, h / ih, 1.0) for x, y, w, h in faces]
+
+    def close(self):
+        pass
+
+
+DETECTOR_BACKENDS = ("mediapipe_short", "mediapipe_full", "yunet", "ssd", "haar")
+
+
+def build_face_detector(backend="mediapipe_full", min_detection_confidence=0.5, input_width=None,
+                        model_path=None, config_path=None):
+    """Construye el detector ``backend`` (ver ``DETECTOR_BACKENDS``)."""
+    if backend in ("mediapipe_short", "mediapipe_full"):
+        return MediaPipeDetector(0 if backend == "mediapipe_short" else 1,
+                                 min_detection_confidence, input_width)
+    if backend == "yunet":
+        return YuNetDetector(model_path, min_detection_confidence, input_width)
+    if backend == "ssd":
+        return DNNDetector(model_path, config_path, min_detection_confidence)
+    if backend == "haar":
+        return HaarDetector(model_path, input_width)
+    raise ValueError(f"Detector de rostros desconocido: {backend}")
+
+
+class OpticalFlowTracker:
+    """Sigue un recuadro con Lucas-Kanade sobre puntos característicos."""
+
+    MIN_POINTS = 5
+
+    def __init__(self):
+        self._gray = None
+        self._points = None
+        self._box = None
+
+    def init(self, gray, box):
+        """Inicia el seguimiento de ``box`` (x, y, w, h en píxeles)."""
+        x, y, w, h = box
+        ih, iw = gray.shape
+        x0, y0 = max(0, x), max(0, y)
+        x1, y1 = min(iw, x + w), min(ih, y + h)
+        self._points = None
+        if x1 - x0 < 2 or y1 - y0 < 2:
+            return False
+        points = cv2.goodFeaturesToTrack(gray[y0:y1, x0:x1], maxCorners=30,
+                                         qualityLevel=0.01, minDistance=5)
+        if points is None or len(points) < self.MIN_POINTS:
+            return False
+        points[:, 0, 0] += x0
+        points[:, 0, 1] += y0
+        self._gray = gray
+        self._points = points
+        self._box = (float(x), float(y), w, h)
+        return True
+
+    def update(self, gray):
+        """
+        Desplaza el recuadro al nuevo frame.
+
+        Devuelve ``(box, ratio)`` con la fracción de puntos que se pudieron
+        seguir, o ``(None, 0.0)`` si se perdió el rostro.
+        """
+        if self._points is None:
+            return None, 0.0
+        new_points, status, _ = cv2.calcOpticalFlowPyrLK(self._gray, gray, self._points, None)
+        if new_points is None:
+            self._points = None
+            return None, 0.0
+        good = status.reshape(-1) == 1
+        ratio = float(good.mean())
+        if good.sum() < self.MIN_POINTS:
+            self._points = None
+            return None, 0.0
+        dx, dy = np.median(new_points[good] - self._points[good], axis=0).reshape(-1)
+        x, y, w, h = self._box
+        self._box = (x + dx, y + dy, w, h)
+        self._gray = gray
+        self._points = new_points[good].reshape(-1, 1, 2)
+        return (int(self._box[0]), int(self._box[1]), w, h), ratio
+
+
+class TrackingDetector:
+    """
+    Ejecuta ``detector`` cada K frames y sigue el rostro entre detecciones.
+
+    K se recalcula con la latencia media de la detección para que su coste
+    amortizado no supere ``budget_ms`` por frame. Además se vuelve a detectar
+    en cuanto la confianza del recuadro seguido cae de ``min_confidence``.
+    Siempre devuelve un recuadro por frame mientras el rostro siga visible,
+    de modo que la prueba de vida recibe su centro en cada frame.
+    """
+
+    ALPHA = 0.2
+
+    def __init__(self, detector, budget_ms=10.0, max_interval=10,
+                 min_confidence=0.5, decay=0.97):
+        self.detector = detector
+        self.budget_ms = budget_ms
+        self.max_interval = max_interval
+        self.min_confidence = min_confidence
+        self.decay = decay
+        self.interval = 1
+        self.detect_ms = None
+        self._tracker = OpticalFlowTracker()
+        self._since_detection = 0
+        self._boxes = []
+        self._confidence = 0.0
+
+    def _update_interval(self, elapsed_ms):
+        if self.detect_ms is None:
+            self.detect_ms = elapsed_ms
+        else:
+            self.detect_ms += self.ALPHA * (elapsed_ms - self.detect_ms)
+        wanted = math.ceil(self.detect_ms / self.budget_ms) if self.budget_ms > 0 else 1
+        self.interval = max(1, min(self.max_interval, wanted))
+
+    def _run_detector(self, frame, gray):
+        start = time.perf_counter()
+        boxes = self.detector.detect(frame)
+        self._update_interval((time.perf_counter() - start) * 1000)
+        self._since_detection = 0
+        self._boxes = boxes
+        if boxes:
+            self._confidence = boxes[0].score
+            self._tracker.init(gray, box_to_pixels(boxes[0], frame.shape))
+        else:
+            self._confidence = 0.0
+        return boxes
+
+    def detect(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        self._since_detection += 1
+        if self._since_detection >= self.interval:
+            return self._run_detector(frame, gray)
+        if not self._boxes:
+            # Sin rostro no hay nada que seguir: se espera a la próxima detección
+            return []
+        if self._confidence < self.min_confidence:
+            return self._run_detector(frame, gray)
+
+        box, ratio = self._tracker.update(gray)
+        if box is None:
+            return self._run_detector(frame, gray)
+
+        self._confidence *= self.decay * ratio
+        ih, iw = frame.shape[:2]
+        x, y, w, h = box
+        tracked = FaceBox(x / iw, y / ih, w / iw, h / ih, self._confidence)
+        self._boxes = [tracked] + self._boxes[1:]
+        return self._boxes
+
+    def close(self):
+        self.detector.close()
+
+
+def create_detector(mode="tracking", backend="mediapipe_full", min_detection_confidence=0.5,
+                    input_width=None, budget_ms=10.0, max_interval=10, min_confidence=0.5,
+                    model_path=None, config_path=None, detector=None):
+    """
+    Construye el detector configurado para un stream.
+
+    ``detector`` permite usar un detector ya existente (por ejemplo el del
+    servicio de inferencia compartido) en lugar de crear un modelo propio.
+    """
+    if detector is None:
+        detector = build_face_detector(backend, min_detection_confidence, input_width,
+                                       model_path, config_path)
+    if mode == "tracking":
+        return TrackingDetector(detector, budget_ms=budget_ms, max_interval=max_interval,
+                                min_confidence=min_confidence)
+    return detector
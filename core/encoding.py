@@ -0,0 +1,118 @@
+"""
+Codificación JPEG de los frames del stream.
+
+Cada visor codifica unos 30 frames por segundo, así que el codificador es uno
+de los mayores consumidores de CPU del servidor. Hay dos implementaciones con
+la misma interfaz, ``encode(frame)``, que devuelve un ``memoryview`` sobre el
+JPEG. La vista puede apuntar a un buffer que se reutiliza, así que quien la
+conserve más allá de la siguiente codificación debe copiarla (el stream la
+copia enseguida a su parte del multipart):
+
+- ``opencv``: ``cv2.imencode``; siempre disponible.
+- ``turbojpeg``: libjpeg-turbo a través del paquete opcional PyTurboJPEG.
+  Codifica sobre buffers reservados una vez y reutilizados.
+
+La calidad y el submuestreo de croma (``444``, ``422`` o ``420``) son
+configurables; ``420`` reduce a la mitad los datos de color y es el más rápido.
+"""
+import logging
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SUBSAMPLINGS = ("444", "422", "420")
+
+
+class OpenCVEncoder:
+    """Codificador JPEG de OpenCV."""
+
+    name = "opencv"
+
+    def __init__(self, quality=80, subsampling="420"):
+        if subsampling not in SUBSAMPLINGS:
+            raise ValueError(f"Submuestreo de croma desconocido: {subsampling}")
+        self.quality = quality
+        self.subsampling = subsampling
+        self._sampling = getattr(cv2, f"IMWRITE_JPEG_SAMPLING_FACTOR_{subsampling}")
+
+    def encode(self, frame):
+        # La calidad se lee en cada frame: el control adaptativo la ajusta en vivo
+        params = [cv2.IMWRITE_JPEG_QUALITY, int(self.quality),
+                  cv2.IMWRITE_JPEG_SAMPLING_FACTOR, self._sampling]
+        ret, buffer = cv2.imencode('.jpg', frame, params)
+        # Vista sobre el array de OpenCV: evita la copia de ``tobytes()``
+        return memoryview(buffer) if ret else None
+
+
+class TurboJPEGEncoder:
+    """
+    Codificador de libjpeg-turbo que escribe sobre buffers reutilizados.
+
+    Los ``slots`` buffers se usan por turnos, así que un frame codificado es
+    válido mientras no se hayan codificado ``slots`` frames más; el codificador
+    no sabe cuándo el consumidor terminó con una vista, por lo que conservarla
+    más tiempo exige copiarla. ``jpeg`` permite pasar una instancia de
+    ``TurboJPEG`` ya construida.
+    """
+
+    name = "turbojpeg"
+
+    def __init__(self, quality=80, subsampling="420", lib_path=None, slots=4, jpeg=None):
+        if subsampling not in SUBSAMPLINGS:
+            raise ValueError(f"Submuestreo de croma desconocido: {subsampling}")
+        try:
+            import turbojpeg
+        except ImportError as exc:
+            raise RuntimeError(
+                "El codificador 'turbojpeg' requiere el paquete PyTurboJPEG (pip install PyTurboJPEG)"
+            ) from exc
+        if jpeg is None:
+            # Lanza OSError/RuntimeError si no encuentra libturbojpeg
+            jpeg = turbojpeg.TurboJPEG(lib_path) if lib_path else turbojpeg.TurboJPEG()
+        self._jpeg = jpeg
+        self._pixel_format = turbojpeg.TJPF_BGR
+        self._subsample = getattr(turbojpeg, f"TJSAMP_{subsampling}")
+        self.quality = quality
+        self.subsampling = subsampling
+        self._buffers = [None] * max(1, slots)
+        self._next = 0
+        self._shape = None
+
+    def _buffer_for(self, frame):
+        if frame.shape != self._shape:
+            # Cota superior del tamaño del JPEG (la de tjBufSize con holgura)
+            h, w = frame.shape[:2]
+            size = ((w + 15) // 16 * 16) * ((h + 15) // 16 * 16) * 6 + 2048
+            self._buffers = [bytearray(size) for _ in self._buffers]
+            self._shape = frame.shape
+        buffer = self._buffers[self._next]
+        self._next = (self._next + 1) % len(self._buffers)
+        return buffer
+
+    def encode(self, frame):
+        buffer = self._buffer_for(frame)
+        _, size = self._jpeg.encode(
+            np.ascontiguousarray(frame), quality=int(self.quality),
+            pixel_format=self._pixel_format, jpeg_subsample=self._subsample, dst=buffer,
+        )
+        return memoryview(buffer)[:size]
+
+
+def create_encoder(name="opencv", quality=80, subsampling="420", lib_path=None, slots=4):
+    """
+    Construye el codificador configurado en ``JPEG_ENCODER``.
+
+    Si se pide ``turbojpeg`` pero la librería no está disponible se usa
+    OpenCV, para que el stream funcione igual en cualquier instalación.
+    """
+    if name == "opencv":
+        return OpenCVEncoder(quality, subsampling)
+    if name == "turbojpeg":
+        try:
+            return TurboJPEGEncoder(quality, subsampling, lib_path=lib_path, slots=slots)
+        except (RuntimeError, OSError) as exc:
+            logger.warning("libjpeg-turbo no disponible (%s); se usa el codificador de OpenCV", exc)
+            return OpenCVEncoder(quality, subsampling)
+    raise ValueError(f"Codificador JPEG desconocido: {name}")
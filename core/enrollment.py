@@ -0,0 +1,101 @@
+"""
+Preparación de alumnos para el enrolamiento masivo (``enroll_bulk``).
+
+``prepare_student`` corre en los procesos del pool: decodifica la foto,
+la reduce, recorta el rostro, genera sus miniaturas y, con el
+reconocimiento activo, calcula su vector; además calcula el hash de la
+contraseña, que con PBKDF2 es lo más lento de crear un usuario. Al proceso
+principal solo vuelven bytes (JPEG, miniaturas, vector y hash) listos para
+``bulk_create``.
+
+El módulo no importa modelos al cargarse: los procesos del pool se crean
+con ``spawn`` y ``init_worker`` configura Django antes de usarlos.
+"""
+import os
+
+import cv2
+import numpy as np
+
+# Detector y modelo de embedding de cada proceso del pool
+_worker = {}
+
+
+def init_worker(detector_factory, embedder_backend=None, embedder_model_path=None):
+    """Inicializa un proceso del pool (también se usa sin pool, en el proceso actual)."""
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+    _worker['detector'] = detector_factory()
+    _worker['embedder'] = None
+    if embedder_backend:
+        from .recognition import build_embedder
+
+        _worker['embedder'] = build_embedder(embedder_backend, embedder_model_path)
+
+
+def close_worker():
+    detector = _worker.pop('detector', None)
+    if detector is not None:
+        detector.close()
+
+
+def _fit(image, max_size):
+    """Reduce ``image`` para que su lado mayor no pase de ``max_size``."""
+    h, w = image.shape[:2]
+    scale = max_size / max(h, w)
+    if scale >= 1:
+        return image
+    return cv2.resize(image, (round(w * scale), round(h * scale)), interpolation=cv2.INTER_AREA)
+
+
+def prepare_student(row, photo_dir, max_size=640, crop_margin=0.5, quality=90):
+    """
+    Prepara una fila del CSV.
+
+    Devuelve un dict con ``row``, ``password`` (hash), ``photo`` (JPEG o
+    None), ``thumbnails`` (ver ``render_thumbnails``), ``vector`` (bytes
+    float32 o None) y ``warning`` (motivo por el que falta la foto o el
+    vector).
+    """
+    from django.contrib.auth.hashers import make_password
+
+    from .recognition import crop_face, largest_face
+    from .thumbnails import render_thumbnails
+
+    result = {
+        'row': row,
+        # Sin contraseña en el CSV la cuenta no puede iniciar sesión
+        'password': make_password(row.get('password') or None),
+        'photo': None,
+        'thumbnails': {},
+        'vector': None,
+        'warning': None,
+    }
+    name = (row.get('foto') or '').strip()
+    path = os.path.join(photo_dir, name)
+    image = cv2.imread(path) if name and os.path.isfile(path) else None
+    if image is None:
+        result['warning'] = "foto faltante o ilegible" if name else "sin foto"
+        return result
+
+    image = _fit(image, max_size)
+    box = largest_face(image, _worker['detector'])
+    if box is None:
+        # Se guarda la foto reducida para revisarla desde el admin
+        result['warning'] = "sin rostro detectable en la foto"
+        photo = image
+    else:
+        photo = crop_face(image, box, margin=crop_margin)
+        if photo is None:
+            photo = image
+        embedder = _worker.get('embedder')
+        face = crop_face(image, box)
+        if embedder is not None and face is not None:
+            result['vector'] = embedder.embed(face).astype(np.float32).tobytes()
+    success, encoded = cv2.imencode('.jpg', photo, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if success:
+        result['photo'] = encoded.tobytes()
+        result['thumbnails'] = render_thumbnails(photo)
+    return result
@@ -0,0 +1,500 @@
+"""
+Servicio central de inferencia de rostros.
+
+Sin este servicio cada stream construye su propio modelo de MediaPipe y lo
+ejecuta frame a frame: con muchos streams hay tantos modelos como visores
+compitiendo por los mismos núcleos. ``InferenceService`` mantiene un número
+fijo de detectores (uno por núcleo, cada uno en su hilo) y una única cola de
+peticiones. Cada hilo toma un micro-lote de la cola, con un plazo máximo de
+espera desde la petición más antigua, lo procesa con su detector y resuelve
+el ``Future`` de cada frame.
+
+Con varias cámaras la cola es ``FairQueue``: cada cámara tiene su propia
+fila y se atiende primero a la que menos tiempo de inferencia consumió en
+proporción a su peso, así una entrada con muchos visores no deja sin
+detecciones a las demás.
+
+Los streams siguen usando ``TrackingDetector`` para seguir el rostro entre
+detecciones; solo las detecciones pasan por el servicio, a través de
+``PooledDetector``.
+
+Con ``SharedMemoryDetector`` cada hilo del servicio delega en su propio
+proceso, de modo que MediaPipe corre fuera del intérprete de Django y no
+compite por el GIL. Los frames se copian en ranuras de un bloque de
+``multiprocessing.shared_memory``; por la tubería solo viajan el índice de
+ranura y la forma del frame, y de vuelta los recuadros detectados.
+"""
+import atexit
+import functools
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from multiprocessing import shared_memory
+from queue import Empty
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Marca de parada para los hilos del servicio
+_STOP = object()
+# Segundos que un stream espera una detección antes de seguir sin rostros
+DEFAULT_TIMEOUT = 1.0
+
+
+class FairQueue:
+    """
+    Cola con una fila FIFO por cliente (cámara) y reparto por tiempo de CPU.
+
+    ``get()`` entrega el frame más antiguo del cliente con pendientes que
+    menos tiempo de inferencia lleva consumido, dividido por su peso. Un
+    cliente que vuelve tras estar inactivo parte del consumo del más
+    atrasado de los activos, de modo que no acapara el servicio para
+    "recuperar" el tiempo que no usó.
+    """
+
+    def __init__(self):
+        self._queues = {}
+        self._usage = {}
+        self._weights = {}
+        self._control = deque()
+        self._size = 0
+        self._cond = threading.Condition()
+
+    def put(self, item, tenant=None, weight=1.0):
+        if not weight > 0:
+            # Se valida aquí, en el hilo que encola: ``charge()`` divide por el
+            # peso en el hilo del servicio, donde un error lo detendría
+            raise ValueError(f"El peso de un cliente debe ser mayor que 0: {weight!r}")
+        with self._cond:
+            if item is _STOP:
+                self._control.append(item)
+            else:
+                queue = self._queues.setdefault(tenant, deque())
+                self._weights[tenant] = weight
+                if not queue:
+                    backlogged = [self._usage[t] for t, q in self._queues.items() if q and t != tenant]
+                    floor = min(backlogged) if backlogged else max(self._usage.values(), default=0.0)
+                    self._usage[tenant] = max(self._usage.get(tenant, 0.0), floor)
+                queue.append(item)
+                self._size += 1
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Extrae el siguiente elemento; lanza ``Empty`` si vence ``timeout``."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._size or self._control, timeout):
+                raise Empty
+            if self._control:
+                return self._control.popleft()
+            tenant = min((t for t, q in self._queues.items() if q), key=self._usage.__getitem__)
+            self._size -= 1
+            return self._queues[tenant].popleft()
+
+    def get_nowait(self):
+        return self.get(timeout=0)
+
+    def charge(self, tenant, seconds):
+        """Suma ``seconds`` de inferencia al consumo de ``tenant``."""
+        with self._cond:
+            self._usage[tenant] = self._usage.get(tenant, 0.0) + seconds / self._weights.get(tenant, 1.0)
+
+    def qsize(self):
+        with self._cond:
+            return self._size
+
+    def pending(self):
+        """Frames pendientes de cada cliente."""
+        with self._cond:
+            return {tenant: len(queue) for tenant, queue in self._queues.items()}
+
+
+class PooledDetector:
+    """
+    Detector de un stream que delega en el servicio compartido.
+
+    Si la detección no llega en ``timeout`` segundos (un detector colgado o
+    un servicio saturado) el frame se trata como sin rostros, para que la
+    etapa de inferencia del stream no quede bloqueada.
+    """
+
+    def __init__(self, service, timeout=DEFAULT_TIMEOUT, tenant=None, weight=1.0):
+        self.service = service
+        self.timeout = timeout
+        self.tenant = tenant
+        self.weight = weight
+
+    def detect(self, frame):
+        future = self.service.submit(frame, self.tenant, self.weight)
+        try:
+            return future.result(self.timeout)
+        except FutureTimeoutError:
+            # Si sigue en la cola, el servicio lo descarta sin procesarlo
+            future.cancel()
+            logger.warning("Detección sin respuesta en %.1f s; frame sin rostros", self.timeout)
+            return []
+
+    def close(self):
+        # Los detectores del pool pertenecen al servicio, no al stream
+        pass
+
+
+class _UnavailableDetector:
+    """Detector que falla con el error con el que falló su construcción."""
+
+    def __init__(self, error):
+        self.error = error
+
+    def detect(self, frame):
+        raise self.error
+
+    def close(self):
+        pass
+
+
+def _detector_process(conn, detector_factory):
+    """Bucle del proceso de detección: lee frames de la memoria compartida."""
+    detector = detector_factory()
+    shm = None
+    slot_bytes = 0
+    try:
+        while True:
+            message = conn.recv()
+            op = message[0]
+            if op == "stop":
+                return
+            if op == "attach":
+                if shm is not None:
+                    shm.close()
+                # Con "spawn" el hijo comparte el resource tracker del padre, que
+                # es quien crea el bloque y lo libera con ``unlink()``
+                shm = shared_memory.SharedMemory(name=message[1])
+                slot_bytes = message[2]
+                continue
+            results = []
+            for slot, shape in message[1]:
+                frame = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=slot * slot_bytes)
+                try:
+                    results.append([tuple(box) for box in detector.detect(frame)])
+                except Exception as exc:
+                    results.append(exc)
+                del frame
+            conn.send(results)
+    finally:
+        detector.close()
+        if shm is not None:
+            shm.close()
+
+
+class SharedMemoryDetector:
+    """
+    Detector que se ejecuta en un proceso hijo.
+
+    ``detector_factory`` debe poder serializarse (una clase o un
+    ``functools.partial``), porque se construye dentro del proceso. El bloque
+    compartido tiene ``slots`` ranuras del tamaño del frame más grande visto;
+    si llega uno mayor se reserva un bloque nuevo. Un mismo objeto no debe
+    usarse desde varios hilos a la vez: en el servicio cada hilo tiene el suyo.
+
+    Los procesos se crean con "spawn", que es seguro con hilos en marcha;
+    el script principal debe estar protegido con ``if __name__ ==
+    '__main__'``, como ya lo está ``manage.py``.
+    """
+
+    def __init__(self, detector_factory, slots=8):
+        self.detector_factory = detector_factory
+        self.slots = slots
+        self._shm = None
+        self._slot_bytes = 0
+        self._start()
+
+    def _start(self):
+        context = multiprocessing.get_context("spawn")
+        self._conn, child = context.Pipe()
+        self._process = context.Process(
+            target=_detector_process, args=(child, self.detector_factory),
+            name="face-detector", daemon=True,
+        )
+        self._process.start()
+        child.close()
+        if self._shm is not None:
+            self._conn.send(("attach", self._shm.name, self._slot_bytes))
+
+    def _reserve(self, nbytes):
+        if nbytes <= self._slot_bytes:
+            return
+        self._release_shm()
+        self._shm = shared_memory.SharedMemory(create=True, size=nbytes * self.slots)
+        self._slot_bytes = nbytes
+        self._conn.send(("attach", self._shm.name, nbytes))
+
+    def _release_shm(self):
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def detect(self, frame):
+        result = self.detect_batch([frame])[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def detect_batch(self, frames):
+        """
+        Detecta rostros en varios frames con un solo viaje al proceso.
+
+        Devuelve una lista con los ``FaceBox`` de cada frame o la excepción
+        que produjo ese frame.
+        """
+        from .detection import FaceBox
+
+        results = []
+        for start in range(0, len(frames), self.slots):
+            chunk = [np.ascontiguousarray(f, dtype=np.uint8) for f in frames[start:start + self.slots]]
+            self._reserve(max(f.nbytes for f in chunk))
+            for slot, frame in enumerate(chunk):
+                view = np.ndarray(frame.shape, dtype=np.uint8, buffer=self._shm.buf,
+                                  offset=slot * self._slot_bytes)
+                view[...] = frame
+            try:
+                self._conn.send(("detect", [(slot, f.shape) for slot, f in enumerate(chunk)]))
+                replies = self._conn.recv()
+            except (EOFError, OSError) as exc:
+                # El proceso murió: se levanta otro para los siguientes frames
+                logger.error("El proceso de detección terminó inesperadamente; se reinicia")
+                self._conn.close()
+                self._start()
+                raise RuntimeError("El proceso de detección terminó inesperadamente") from exc
+            results.extend(
+                reply if isinstance(reply, Exception) else [FaceBox(*box) for box in reply]
+                for reply in replies
+            )
+        return results
+
+    def close(self):
+        try:
+            self._conn.send(("stop",))
+        except OSError:
+            pass
+        self._process.join(timeout=5)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._conn.close()
+        self._release_shm()
+
+
+class InferenceService:
+    """
+    Pool de detectores que procesa frames de todos los streams en micro-lotes.
+
+    ``detector_factory`` construye un detector con ``detect(frame)`` y
+    ``close()``; se llama una vez en cada hilo. Un lote se cierra al reunir
+    ``max_batch`` frames o al vencer ``max_delay`` segundos desde que se
+    encoló el primero, lo que acota la latencia añadida por el agrupamiento.
+    Mientras haya hilos libres cada uno toma un solo frame: los lotes solo se
+    forman cuando todos los detectores están ocupados.
+    """
+
+    def __init__(self, detector_factory, workers=None, max_batch=8, max_delay=0.002):
+        self.detector_factory = detector_factory
+        self.workers = workers or os.cpu_count() or 1
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue = FairQueue()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._frames = 0
+        self._wait_seconds = 0.0
+        self._busy_seconds = 0.0
+        self._idle = 0
+        self._tenants = {}
+
+    def submit(self, frame, tenant=None, weight=1.0):
+        """
+        Encola ``frame``; el ``Future`` se resuelve con la lista de ``FaceBox``.
+
+        ``tenant`` identifica la cámara de origen para repartir el servicio
+        entre cámaras según ``weight``.
+        """
+        future = Future()
+        self._ensure_started()
+        self._queue.put((frame, future, time.monotonic(), tenant), tenant, weight)
+        return future
+
+    def detector(self, timeout=DEFAULT_TIMEOUT, tenant=None, weight=1.0):
+        """Detector para un stream, con la misma interfaz que ``MediaPipeDetector``."""
+        return PooledDetector(self, timeout, tenant, weight)
+
+    def stats(self):
+        pending = self._queue.pending()
+        with self._stats_lock:
+            return {
+                "workers": len(self._threads),
+                "frames": self._frames,
+                "batches": self._batches,
+                "avg_batch": round(self._frames / self._batches, 2) if self._batches else 0,
+                "avg_wait_ms": round(self._wait_seconds * 1000 / self._frames, 2) if self._frames else 0,
+                "avg_detect_ms": round(self._busy_seconds * 1000 / self._frames, 2) if self._frames else 0,
+                "pending": self._queue.qsize(),
+                "cameras": {
+                    str(tenant): {
+                        "frames": frames,
+                        "detect_ms": round(seconds * 1000, 1),
+                        "pending": pending.get(tenant, 0),
+                    }
+                    for tenant, (frames, seconds) in self._tenants.items()
+                },
+            }
+
+    def close(self):
+        """Detiene los hilos y libera los detectores."""
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(_STOP)
+        for thread in threads:
+            thread.join()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"inference-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _collect(self):
+        with self._stats_lock:
+            self._idle += 1
+        first = self._queue.get()
+        with self._stats_lock:
+            self._idle -= 1
+            others_idle = self._idle
+        if first is _STOP:
+            return None
+        batch = [first]
+        if others_idle:
+            # Con detectores libres, agrupar solo restaría paralelismo
+            return batch
+        deadline = first[2] + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except Empty:
+                break
+            if item is _STOP:
+                # Se devuelve para que la reciba otro hilo o este en la siguiente vuelta
+                self._queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        try:
+            detector = self.detector_factory()
+        except Exception as exc:
+            # Sin detector el hilo sigue respondiendo para no dejar streams colgados
+            logger.exception("No se pudo crear el detector del servicio de inferencia")
+            detector = _UnavailableDetector(exc)
+        try:
+            while True:
+                batch = self._collect()
+                if batch is None:
+                    return
+                start = time.monotonic()
+                wait = sum(start - submitted for _, _, submitted, _ in batch)
+                batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+                self._detect_batch(detector, batch)
+                busy = time.monotonic() - start
+                # Cada frame del lote se cobra a su cámara a partes iguales
+                share = busy / len(batch) if batch else 0.0
+                with self._stats_lock:
+                    self._batches += 1
+                    self._frames += len(batch)
+                    self._wait_seconds += wait
+                    self._busy_seconds += busy
+                    for _, _, _, tenant in batch:
+                        frames, seconds = self._tenants.get(tenant, (0, 0.0))
+                        self._tenants[tenant] = (frames + 1, seconds + share)
+                for _, _, _, tenant in batch:
+                    self._queue.charge(tenant, share)
+        finally:
+            detector.close()
+
+    def _detect_batch(self, detector, batch):
+        if hasattr(detector, "detect_batch"):
+            # Un solo viaje para todo el lote (detectores en otro proceso)
+            try:
+                results = detector.detect_batch([frame for frame, _, _, _ in batch])
+            except Exception as exc:
+                logger.exception("Error en la inferencia de un lote")
+                results = [exc] * len(batch)
+        else:
+            results = []
+            for frame, _, _, _ in batch:
+                try:
+                    results.append(detector.detect(frame))
+                except Exception as exc:
+                    logger.exception("Error en la inferencia de un frame")
+                    results.append(exc)
+        for (_, future, _, _), result in zip(batch, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def detector_factory_from_settings():
+    """
+    Fábrica serializable del detector configurado en ``FACE_DETECTOR_*``.
+
+    Se usa tanto para los detectores propios de cada stream como para los
+    del pool, incluidos los que se construyen en otro proceso.
+    """
+    from django.conf import settings
+
+    from .detection import build_face_detector
+
+    return functools.partial(
+        build_face_detector,
+        getattr(settings, 'FACE_DETECTOR_BACKEND', 'mediapipe_full'),
+        input_width=getattr(settings, 'FACE_DETECTION_INPUT_WIDTH', None),
+        model_path=getattr(settings, 'FACE_DETECTOR_MODEL_PATH', None),
+        config_path=getattr(settings, 'FACE_DETECTOR_CONFIG_PATH', None),
+    )
+
+
+def get_inference_service():
+    """Devuelve el servicio de inferencia compartido por el proceso."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            from django.conf import settings
+
+            factory = detector_factory_from_settings()
+            max_batch = getattr(settings, 'FACE_INFERENCE_MAX_BATCH', 8)
+            if getattr(settings, 'FACE_INFERENCE_BACKEND', 'pool') == 'process':
+                # Cada hilo del servicio delega en su propio proceso de detección
+                factory = functools.partial(SharedMemoryDetector, factory, slots=max_batch)
+            _service = InferenceService(
+                factory,
+                workers=getattr(settings, 'FACE_INFERENCE_WORKERS', None),
+                max_batch=max_batch,
+                max_delay=getattr(settings, 'FACE_INFERENCE_MAX_DELAY', 0.002),
+            )
+            # Los grafos de MediaPipe deben cerrarse antes de que termine el intérprete
+            atexit.register(_service.close)
+        return _service
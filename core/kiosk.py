@@ -0,0 +1,144 @@
+"""
+Análisis de frames de un kiosco.
+
+``analyze_frame`` es el paso de inferencia común a los dos modos de captura:
+
+- ``server``: el servidor lee su propia cámara y emite un stream MJPEG
+  (``stream_generator``).
+- ``client``: el navegador del kiosco captura con ``getUserMedia`` y sube
+  frames reducidos en lotes a ``/analyze_frames/``. El servidor no abre
+  ninguna cámara ni codifica video; solo ejecuta la inferencia y devuelve
+  el estado de la prueba de vida. ``RemoteKiosk`` guarda el detector y el
+  validador de cada kiosco entre peticiones.
+
+En modo ``client`` el estado de cada kiosco vive en memoria del worker que
+lo atiende, así que con varios workers hace falta afinidad de sesión.
+"""
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from .detection import box_to_pixels
+
+
+def analyze_frame(frame, detector, validator, metrics, recognizer=None):
+    """
+    Detecta el rostro, avanza la prueba de vida y publica las métricas.
+
+    Con ``recognizer`` (``core.recognition.FaceRecognizer``) se toman
+    muestras del rostro mientras la persona está quieta, para saber a quién
+    registrar. Devuelve ``(box, status_text, color)``; ``box`` es el recuadro
+    en píxeles ``(x, y, w, h)`` del primer rostro o None si no hay ninguno.
+    """
+    detections = detector.detect(frame)
+    if not detections:
+        metrics.reset()
+        if (recognizer is not None and recognizer.mode == "identify"
+                and validator.liveness_step == 4 and not validator.registro_pendiente):
+            # Kiosco compartido: al irse la persona registrada empieza la siguiente
+            validator.reset()
+            recognizer.reset()
+        return None, None, None
+
+    box = box_to_pixels(detections[0], frame.shape)
+    x, y, w, h = box
+    if recognizer is not None and validator.liveness_step == 3:
+        recognizer.observe(frame, box)
+    status_text, color = validator.update((x + w // 2, y + h // 2))
+    metrics.update(face_count=len(detections), status=status_text,
+                   liveness_step=validator.liveness_step)
+    return box, status_text, color
+
+
+def decode_frame(data):
+    """Decodifica un JPEG subido por el navegador; None si no es válido."""
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    if not buffer.size:
+        return None
+    return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
+
+class RemoteKiosk:
+    """Detector y prueba de vida de un kiosco que captura en el navegador."""
+
+    def __init__(self, detector, validator, metrics, recognizer=None):
+        self.detector = detector
+        self.validator = validator
+        self.metrics = metrics
+        self.recognizer = recognizer
+        self.frames = 0
+        self.closed = False
+        self.last_used = time.monotonic()
+        # Un mismo kiosco puede solapar peticiones; el seguimiento es secuencial
+        self._lock = threading.Lock()
+
+    def analyze(self, frames):
+        """Procesa un lote de frames en orden y devuelve el estado final."""
+        with self._lock:
+            self.last_used = time.monotonic()
+            box = status_text = color = None
+            shape = frames[-1].shape
+            for frame in frames:
+                if self.closed:
+                    # El kiosco se reinició mientras llegaba este lote
+                    break
+                box, status_text, color = analyze_frame(frame, self.detector, self.validator, self.metrics,
+                                                         self.recognizer)
+                shape = frame.shape
+                self.frames += 1
+            state = self.metrics.snapshot()
+
+        ih, iw = shape[:2]
+        return {
+            "face_count": state["face_count"],
+            "status": state["status"],
+            "liveness_step": state["liveness_step"],
+            # Recuadro relativo para dibujarlo sobre el video del navegador
+            "box": [box[0] / iw, box[1] / ih, box[2] / iw, box[3] / ih] if box else None,
+            "label": status_text,
+            "color": "#{2:02x}{1:02x}{0:02x}".format(*color) if color else None,
+        }
+
+    def close(self):
+        with self._lock:
+            if not self.closed:
+                self.closed = True
+                self.detector.close()
+
+
+class RemoteKioskRegistry:
+    """Kioscos remotos activos; los inactivos liberan su detector."""
+
+    def __init__(self, max_idle=300.0):
+        self.max_idle = max_idle
+        self._kiosks = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, factory):
+        """Devuelve el kiosco de ``key`` o lo crea con ``factory()``."""
+        with self._lock:
+            kiosk = self._kiosks.get(key)
+            if kiosk is None:
+                stale = self._prune_locked()
+                kiosk = self._kiosks[key] = factory()
+            else:
+                stale = []
+        for old in stale:
+            old.close()
+        return kiosk
+
+    def discard(self, key):
+        with self._lock:
+            kiosk = self._kiosks.pop(key, None)
+        if kiosk is not None:
+            kiosk.close()
+
+    def __len__(self):
+        return len(self._kiosks)
+
+    def _prune_locked(self):
+        limit = time.monotonic() - self.max_idle
+        stale = [k for k, kiosk in self._kiosks.items() if kiosk.last_used < limit]
+        return [self._kiosks.pop(k) for k in stale]
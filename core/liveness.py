@@ -0,0 +1,123 @@
+"""
+Máquina de estados de la prueba de vida.
+
+Pasos: 1 buscando rostro, 2 mover el rostro, 3 quedarse quieto,
+4 asistencia registrada. Recibe el centro del rostro en cada frame y decide
+el texto de estado, el color del recuadro y cuándo registrar la asistencia.
+
+``on_register`` puede devolver un ``Future``: mientras no se resuelva el
+estado es "Registrando asistencia..." y, si falla, la validación se reinicia.
+Si falla con ``RegistroRechazado`` (p. ej. el rostro no es el del usuario)
+su mensaje se muestra unos frames antes de volver a empezar.
+"""
+from concurrent.futures import Future
+
+# Colores BGR usados en el recuadro del rostro
+COLOR_BUSCANDO = (255, 165, 0)
+COLOR_YA_REGISTRADA = (0, 128, 0)
+COLOR_REGISTRADA = (0, 255, 0)
+COLOR_RECHAZADO = (0, 0, 255)
+
+
+class RegistroRechazado(ValueError):
+    """El registro no se hizo por una razón que se le explica al usuario."""
+
+
+class LivenessValidator:
+    """Valida que el rostro se mueva y luego permanezca quieto."""
+
+    MOVE_THRESHOLD = 20
+    STILL_FRAMES = 30
+    # Frames que se muestra el motivo de un registro rechazado
+    REJECTED_FRAMES = 60
+
+    def __init__(self, asistencia_registrada=False, on_register=None):
+        self.asistencia_registrada = asistencia_registrada
+        self.on_register = on_register
+        self.liveness_step = 1
+        self.last_face_center = None
+        self.still_frames_count = 0
+        self._registro = None
+        self._rechazo = None
+        self._rechazo_frames = 0
+
+    def reset(self):
+        """Vuelve al paso 1 para validar a otra persona."""
+        self._registro = None
+        self._rechazo = None
+        self._rechazo_frames = 0
+        self.asistencia_registrada = False
+        self.liveness_step = 1
+        self.last_face_center = None
+        self.still_frames_count = 0
+
+    @property
+    def registro_pendiente(self):
+        """True mientras el registro del paso 4 no se haya confirmado."""
+        return self._registro is not None and not self._registro.done()
+
+    def _estado_registro(self):
+        """Texto y color del paso 4 según la confirmación del registro."""
+        if self._registro is not None:
+            if not self._registro.done():
+                return "Registrando asistencia...", COLOR_BUSCANDO
+            error = self._registro.exception()
+            if isinstance(error, RegistroRechazado):
+                # Se muestra el motivo y luego se repite la validación
+                self.reset()
+                self._rechazo = (str(error), COLOR_RECHAZADO)
+                self._rechazo_frames = self.REJECTED_FRAMES
+                return self._rechazo
+            if error is not None:
+                # No se pudo guardar: se repite la validación
+                self.reset()
+                return "Error al registrar la asistencia", COLOR_BUSCANDO
+            if self._registro.result() is False:
+                # Otro kiosco o proceso la registró antes: no se escribió nada
+                return "Asistencia ya registrada", COLOR_YA_REGISTRADA
+        return "Asistencia Registrada", COLOR_REGISTRADA
+
+    def update(self, face_center):
+        """
+        Avanza la máquina de estados con el centro del rostro detectado.
+
+        Devuelve ``(status_text, color)``.
+        """
+        status_text = "Buscando tu rostro..."
+        color = COLOR_BUSCANDO
+
+        if self.asistencia_registrada and self.liveness_step != 4:
+            return "Asistencia ya registrada", COLOR_YA_REGISTRADA
+
+        if self._rechazo_frames:
+            self._rechazo_frames -= 1
+            return self._rechazo
+
+        if self.liveness_step == 1:
+            status_text = "¡Hola! Por favor, gira tu rostro"
+            self.liveness_step = 2
+            self.last_face_center = face_center
+        elif self.liveness_step == 2:
+            if self.last_face_center:
+                move_distance = (abs(face_center[0] - self.last_face_center[0])
+                                 + abs(face_center[1] - self.last_face_center[1]))
+                if move_distance > self.MOVE_THRESHOLD:
+                    status_text = "¡Genial! Ahora quédate quieto"
+                    self.liveness_step = 3
+                    self.still_frames_count = 0
+                else:
+                    status_text = "Por favor, mueve un poco tu rostro"
+            self.last_face_center = face_center
+        elif self.liveness_step == 3:
+            self.still_frames_count += 1
+            status_text = f"Validando... ({self.still_frames_count}/{self.STILL_FRAMES})"
+            if self.still_frames_count > self.STILL_FRAMES:
+                result = self.on_register() if self.on_register is not None else None
+                self._registro = result if isinstance(result, Future) else None
+                self.asistencia_registrada = True
+                self.liveness_step = 4
+                status_text, _ = self._estado_registro()
+        elif self.liveness_step == 4:
+            status_text, color = self._estado_registro()
+
+        return status_text, color
@@ -0,0 +1,128 @@
+"""
+Benchmark de los detectores de rostros y de la resolución de inferencia.
+
+Ejecuta cada detector sobre los frames de un video a varios anchos de entrada
+y compara el resultado con la referencia (por defecto MediaPipe de alcance
+completo a resolución completa):
+
+    python manage.py bench_detection grabacion.mp4 --widths 160 240 320 480 0
+    python manage.py bench_detection grabacion.mp4 --widths 320 \
+        --backends mediapipe_short mediapipe_full haar yunet \
+        --model-path face_detection_yunet_2023mar.onnx
+
+Para cada combinación informa fps, latencia, uso de CPU (tiempo de CPU del
+proceso / tiempo real; puede superar el 100 % si el detector usa varios
+hilos), recall e IoU frente a la referencia.
+"""
+import json
+import time
+
+import cv2
+from django.core.management.base import BaseCommand, CommandError
+
+from core.detection import DETECTOR_BACKENDS, box_to_pixels, build_face_detector
+
+
+def iou(a, b):
+    """Intersección sobre unión de dos recuadros ``(x, y, w, h)``."""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union > 0 else 0.0
+
+
+def load_frames(path, limit):
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise CommandError(f"No se pudo abrir el video {path}")
+    frames = []
+    while len(frames) < limit:
+        success, frame = cap.read()
+        if not success:
+            break
+        frames.append(frame)
+    cap.release()
+    if not frames:
+        raise CommandError(f"El video {path} no contiene frames")
+    return frames
+
+
+def run_detector(frames, backend, width, model_path=None, config_path=None):
+    """Devuelve los recuadros por frame, el tiempo real y el tiempo de CPU."""
+    try:
+        detector = build_face_detector(backend, input_width=width or None,
+                                       model_path=model_path, config_path=config_path)
+    except ValueError as exc:
+        raise CommandError(str(exc))
+    boxes = []
+    try:
+        # El primer frame inicializa el modelo y no se mide
+        detector.detect(frames[0])
+        start, cpu_start = time.perf_counter(), time.process_time()
+        for frame in frames:
+            detections = detector.detect(frame)
+            boxes.append(box_to_pixels(detections[0], frame.shape) if detections else None)
+        elapsed, cpu = time.perf_counter() - start, time.process_time() - cpu_start
+    finally:
+        detector.close()
+    return boxes, elapsed, cpu
+
+
+class Command(BaseCommand):
+    help = "Mide latencia, CPU y precisión de los detectores a distintas resoluciones de inferencia"
+
+    def add_arguments(self, parser):
+        parser.add_argument('video', help="Video con rostros usado como referencia")
+        parser.add_argument('--widths', type=int, nargs='+', default=[160, 240, 320, 480, 0],
+                            help="Anchos de inferencia a probar (0 = resolución completa)")
+        parser.add_argument('--backends', nargs='+', choices=DETECTOR_BACKENDS,
+                            default=['mediapipe_full'], help="Detectores a comparar")
+        parser.add_argument('--reference', choices=DETECTOR_BACKENDS, default='mediapipe_full',
+                            help="Detector que se toma como verdad (a resolución completa)")
+        parser.add_argument('--model-path', help="Modelo local para yunet/ssd")
+        parser.add_argument('--config-path', help="deploy.prototxt del modelo ssd (Caffe)")
+        parser.add_argument('--frames', type=int, default=300)
+        parser.add_argument('--json', action='store_true', help="Emitir resultados en JSON")
+
+    def handle(self, *args, **options):
+        frames = load_frames(options['video'], options['frames'])
+        models = {'model_path': options['model_path'], 'config_path': options['config_path']}
+        reference, _, _ = run_detector(frames, options['reference'], None, **models)
+        with_face = [i for i, box in enumerate(reference) if box is not None]
+
+        results = []
+        for backend in options['backends']:
+            for width in options['widths']:
+                boxes, elapsed, cpu = run_detector(frames, backend, width, **models)
+                ious = [iou(reference[i], boxes[i]) if boxes[i] else 0.0 for i in with_face]
+                results.append({
+                    "backend": backend,
+                    "width": width or frames[0].shape[1],
+                    "fps": round(len(frames) / elapsed, 1),
+                    "ms_per_frame": round(elapsed * 1000 / len(frames), 2),
+                    "cpu_percent": round(cpu * 100 / elapsed, 1),
+                    "recall": round(sum(v >= 0.5 for v in ious) / len(ious), 3) if ious else None,
+                    "mean_iou": round(sum(ious) / len(ious), 3) if ious else None,
+                })
+
+        if options['json']:
+            self.stdout.write(json.dumps({
+                "frames": len(frames),
+                "reference": options['reference'],
+                "frames_with_face": len(with_face),
+                "results": results,
+            }, indent=2))
+            return
+
+        self.stdout.write(f"Frames: {len(frames)} (con rostro según {options['reference']}: {len(with_face)})")
+        self.stdout.write(f"{'detector':>16} {'ancho':>6} {'fps':>8} {'ms/frame':>9} {'CPU %':>6} {'recall':>7} {'IoU':>6}")
+        for row in results:
+            self.stdout.write(
+                f"{row['backend']:>16} {row['width']:>6} {row['fps']:>8} {row['ms_per_frame']:>9} "
+                f"{row['cpu_percent']:>6} "
+                f"{row['recall'] if row['recall'] is not None else '-':>7} "
+                f"{row['mean_iou'] if row['mean_iou'] is not None else '-':>6}"
+            )
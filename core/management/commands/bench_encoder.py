@@ -0,0 +1,89 @@
+"""
+Benchmark de la codificación JPEG del stream.
+
+Codifica los frames de un video (o frames sintéticos si no se indica ninguno)
+con cada combinación de codificador, calidad y submuestreo de croma:
+
+    python manage.py bench_encoder grabacion.mp4 --encoders opencv turbojpeg \\
+        --qualities 70 80 90 --subsamplings 420 444
+"""
+import json
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from core.encoding import SUBSAMPLINGS, create_encoder
+
+from .bench_detection import load_frames
+
+
+def synthetic_frames(count, width=640, height=480):
+    """Frames con gradiente y ruido, más realistas para el JPEG que un color plano."""
+    rng = np.random.default_rng(0)
+    base = np.zeros((height, width, 3), dtype=np.uint8)
+    base[..., 0] = np.linspace(0, 255, width, dtype=np.uint8)
+    base[..., 1] = np.linspace(0, 255, height, dtype=np.uint8)[:, None]
+    frames = []
+    for i in range(count):
+        noise = rng.integers(0, 24, size=base.shape, dtype=np.uint8)
+        frames.append(np.roll(base, i * 4, axis=1) + noise)
+    return frames
+
+
+class Command(BaseCommand):
+    help = "Mide el rendimiento de los codificadores JPEG con distintas configuraciones"
+
+    def add_arguments(self, parser):
+        parser.add_argument('video', nargs='?', help="Video de referencia (por defecto, frames sintéticos)")
+        parser.add_argument('--encoders', nargs='+', default=['opencv', 'turbojpeg'])
+        parser.add_argument('--qualities', type=int, nargs='+', default=[70, 80, 90])
+        parser.add_argument('--subsamplings', nargs='+', choices=SUBSAMPLINGS, default=['420', '444'])
+        parser.add_argument('--frames', type=int, default=300)
+        parser.add_argument('--lib-path', help="Ruta a libturbojpeg.so")
+        parser.add_argument('--json', action='store_true', help="Emitir resultados en JSON")
+
+    def handle(self, *args, **options):
+        if options['video']:
+            frames = load_frames(options['video'], options['frames'])
+        else:
+            frames = synthetic_frames(options['frames'])
+
+        results = []
+        for name in options['encoders']:
+            if create_encoder(name, lib_path=options['lib_path']).name != name:
+                # Sin libjpeg-turbo la fábrica devuelve OpenCV: no se repite la medida
+                self.stderr.write(f"Codificador '{name}' no disponible; se omite")
+                continue
+            for quality in options['qualities']:
+                for subsampling in options['subsamplings']:
+                    encoder = create_encoder(name, quality, subsampling, lib_path=options['lib_path'])
+                    total_bytes = 0
+                    start = time.perf_counter()
+                    for frame in frames:
+                        total_bytes += encoder.encode(frame).nbytes
+                    elapsed = time.perf_counter() - start
+                    results.append({
+                        "encoder": name,
+                        "quality": quality,
+                        "subsampling": subsampling,
+                        "fps": round(len(frames) / elapsed, 1),
+                        "ms_per_frame": round(elapsed * 1000 / len(frames), 2),
+                        "kb_per_frame": round(total_bytes / len(frames) / 1024, 1),
+                    })
+
+        if options['json']:
+            self.stdout.write(json.dumps({
+                "frames": len(frames),
+                "resolution": f"{frames[0].shape[1]}x{frames[0].shape[0]}",
+                "results": results,
+            }, indent=2))
+            return
+
+        self.stdout.write(f"Frames: {len(frames)} ({frames[0].shape[1]}x{frames[0].shape[0]})")
+        self.stdout.write(f"{'codificador':>11} {'calidad':>7} {'croma':>5} {'fps':>8} {'ms/frame':>9} {'KB/frame':>9}")
+        for row in results:
+            self.stdout.write(
+                f"{row['encoder']:>11} {row['quality']:>7} {row['subsampling']:>5} "
+                f"{row['fps']:>8} {row['ms_per_frame']:>9} {row['kb_per_frame']:>9}"
+            )
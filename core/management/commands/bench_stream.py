@@ -0,0 +1,207 @@
+"""
+Benchmark del stream completo sin cámara.
+
+Reproduce un video grabado (o frames sintéticos si no se indica ninguno) a
+través de ``stream_generator`` — captura, inferencia, overlay, control de
+bitrate y codificación JPEG — con N visores simulados en paralelo:
+
+    python manage.py bench_stream grabacion.mp4 --streams 4 --json > bench.json
+
+Informa los frames por segundo analizados y enviados, los percentiles
+p50/p95/p99 de la latencia de cada etapa, el tiempo de CPU por frame y la
+memoria del proceso. La salida JSON permite comparar versiones.
+"""
+import json
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.liveness import LivenessValidator
+from core.metrics import MetricsChannel
+from core.pipeline import active_pipelines, percentile
+from core.views import stream_generator
+
+from .bench_detection import load_frames
+from .bench_encoder import synthetic_frames
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows
+    resource = None
+
+
+def replay(frames, fps):
+    """Entrega ``frames`` al ritmo de una cámara a ``fps`` (0 = lo más rápido posible)."""
+    interval = 1.0 / fps if fps else 0.0
+    deadline = time.perf_counter()
+    for frame in frames:
+        if interval:
+            delay = deadline - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            deadline += interval
+        yield frame
+
+
+def memory_mb():
+    """Memoria residente actual y máxima del proceso, en MB."""
+    current = None
+    try:
+        with open('/proc/self/statm') as statm:
+            current = int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError):
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 if resource else None
+    return (round(current, 1) if current is not None else None,
+            round(peak, 1) if peak is not None else None)
+
+
+class SimulatedViewer(threading.Thread):
+    """Consume un ``stream_generator`` como lo haría el servidor HTTP."""
+
+    def __init__(self, index, frames, fps, limits):
+        super().__init__(name=f"bench-stream-{index}", daemon=True)
+        self.user = SimpleNamespace(pk=f"bench-{index}")
+        self.frames = frames
+        self.fps = fps
+        self.limits = limits
+        self.pipeline = None
+        self.sent_frames = 0
+        self.sent_bytes = 0
+        self.error = None
+
+    def _find_pipeline(self):
+        suffix = f":{self.user.pk}"
+        for pipeline in active_pipelines():
+            if pipeline.name.startswith("video_feed:") and pipeline.name.endswith(suffix):
+                return pipeline
+        return None
+
+    def run(self):
+        # Sin ``on_register`` la prueba de vida nunca escribe en la base de datos
+        validator = LivenessValidator()
+        try:
+            stream = stream_generator(self.user, MetricsChannel(), self.limits,
+                                      source=replay(self.frames, self.fps), validator=validator)
+            # Una parte del multipart por frame enviado
+            for part in stream:
+                if self.pipeline is None:
+                    self.pipeline = self._find_pipeline()
+                self.sent_frames += 1
+                self.sent_bytes += len(part)
+        except Exception as exc:
+            self.error = exc
+
+
+class Command(BaseCommand):
+    help = "Mide fps, latencia por etapa, CPU y memoria del stream con visores simulados"
+
+    def add_arguments(self, parser):
+        parser.add_argument('video', nargs='?', help="Video a reproducir (por defecto, frames sintéticos)")
+        parser.add_argument('--streams', type=int, default=1, help="Visores simultáneos")
+        parser.add_argument('--frames', type=int, default=300, help="Frames reproducidos por visor")
+        parser.add_argument('--fps', type=float, default=30.0,
+                            help="Ritmo de la fuente simulada (0 = sin límite)")
+        parser.add_argument('--max-fps', type=int, help="Techo de fps enviados (por defecto STREAM_MAX_FPS)")
+        parser.add_argument('--warmup', type=int, default=10,
+                            help="Frames por visor para cargar los modelos antes de medir")
+        parser.add_argument('--json', action='store_true', help="Emitir resultados en JSON")
+
+    def run_viewers(self, frames, fps, limits, count):
+        viewers = [SimulatedViewer(i, frames, fps, limits) for i in range(count)]
+        for viewer in viewers:
+            viewer.start()
+        for viewer in viewers:
+            viewer.join()
+        errors = [str(v.error) for v in viewers if v.error is not None]
+        if errors:
+            raise CommandError(f"Error en el stream: {errors[0]}")
+        return viewers
+
+    def handle(self, *args, **options):
+        if options['streams'] < 1:
+            raise CommandError("--streams debe ser al menos 1")
+        if options['video']:
+            frames = load_frames(options['video'], options['frames'])
+        else:
+            frames = synthetic_frames(options['frames'])
+
+        limits = (
+            options['max_fps'] or getattr(settings, 'STREAM_MAX_FPS', 30),
+            getattr(settings, 'JPEG_QUALITY', 80),
+            getattr(settings, 'STREAM_MAX_WIDTH', None),
+        )
+        # La carga de los modelos y del pool de inferencia no entra en la medida
+        if options['warmup']:
+            self.run_viewers(frames[:options['warmup']], 0, limits, options['streams'])
+
+        start, cpu_start = time.perf_counter(), time.process_time()
+        viewers = self.run_viewers(frames, options['fps'], limits, options['streams'])
+        elapsed, cpu = time.perf_counter() - start, time.process_time() - cpu_start
+
+        # Latencias de todos los visores agregadas por etapa
+        samples, processed, dropped = {}, {}, {}
+        for viewer in viewers:
+            if viewer.pipeline is None:
+                continue
+            for stage, values in viewer.pipeline.latency_samples().items():
+                samples.setdefault(stage, []).extend(values)
+            for stage, info in viewer.pipeline.stats().items():
+                if "processed" in info:
+                    processed[stage] = processed.get(stage, 0) + info["processed"]
+                    dropped[stage] = dropped.get(stage, 0) + info["dropped"]
+
+        stages = {}
+        for stage, values in samples.items():
+            stages[stage] = {"processed": processed.get(stage, 0), "dropped": dropped.get(stage, 0)}
+            for q in (50, 95, 99):
+                value = percentile(values, q)
+                stages[stage][f"p{q}_ms"] = round(value * 1000, 2) if value is not None else None
+
+        analyzed = processed.get("inference", 0)
+        sent = sum(v.sent_frames for v in viewers)
+        memory_current, memory_peak = memory_mb()
+        report = {
+            "streams": len(viewers),
+            "frames_per_stream": len(frames),
+            "resolution": f"{frames[0].shape[1]}x{frames[0].shape[0]}",
+            "source_fps": options['fps'],
+            "max_fps": limits[0],
+            "detector_backend": getattr(settings, 'FACE_DETECTOR_BACKEND', 'mediapipe_full'),
+            "inference_backend": getattr(settings, 'FACE_INFERENCE_BACKEND', 'pool'),
+            "elapsed_s": round(elapsed, 2),
+            "analyzed_fps": round(analyzed / elapsed, 1),
+            "sent_fps": round(sent / elapsed, 1),
+            "kb_per_sent_frame": round(sum(v.sent_bytes for v in viewers) / sent / 1024, 1) if sent else None,
+            "cpu_ms_per_frame": round(cpu * 1000 / analyzed, 2) if analyzed else None,
+            "cpu_percent": round(cpu * 100 / elapsed, 1),
+            "memory_mb": memory_current,
+            "peak_memory_mb": memory_peak,
+            "stages": stages,
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(
+            f"{report['streams']} visor(es) x {report['frames_per_stream']} frames "
+            f"({report['resolution']}, fuente a {report['source_fps'] or 'máx.'} fps) en {report['elapsed_s']} s"
+        )
+        self.stdout.write(
+            f"Analizados: {report['analyzed_fps']} fps  Enviados: {report['sent_fps']} fps  "
+            f"CPU: {report['cpu_ms_per_frame']} ms/frame ({report['cpu_percent']} %)  "
+            f"Memoria: {report['memory_mb']} MB (máx. {report['peak_memory_mb']} MB)"
+        )
+        self.stdout.write(f"{'etapa':>10} {'frames':>7} {'descart.':>8} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7}")
+        for stage, row in stages.items():
+            self.stdout.write(
+                f"{stage:>10} {row['processed']:>7} {row['dropped']:>8} "
+                f"{row['p50_ms'] if row['p50_ms'] is not None else '-':>7} "
+                f"{row['p95_ms'] if row['p95_ms'] is not None else '-':>7} "
+                f"{row['p99_ms'] if row['p99_ms'] is not None else '-':>7}"
+            )
@@ -0,0 +1,49 @@
+"""
+Genera las miniaturas de las fotos de perfil que ya existían.
+
+Las fotos nuevas reciben sus miniaturas al guardarse; este comando cubre
+las subidas antes de que existieran (o tras cambiar los tamaños en
+``PROFILE_THUMBNAIL_WIDTHS``/``PROFILE_THUMBNAIL_FORMATS``):
+
+    python manage.py build_thumbnails           # fotos sin miniaturas
+    python manage.py build_thumbnails --force   # todas
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.models import UserProfile
+from core.thumbnails import build_thumbnails, has_thumbnails
+
+
+class Command(BaseCommand):
+    help = "Genera las miniaturas WebP/JPEG de las fotos de perfil existentes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Regenerar también las que ya tienen miniaturas")
+        parser.add_argument('--user', action='append', dest='usernames', help="Solo la foto de este usuario")
+
+    def handle(self, *args, **options):
+        profiles = UserProfile.objects.select_related('user').exclude(foto_perfil='')
+        profiles = profiles.exclude(foto_perfil__isnull=True)
+        if options['usernames']:
+            profiles = profiles.filter(user__username__in=options['usernames'])
+        total = profiles.count()
+
+        built = skipped = failed = 0
+        start = time.perf_counter()
+        for number, profile in enumerate(profiles.iterator(), start=1):
+            if not options['force'] and has_thumbnails(profile):
+                skipped += 1
+            elif build_thumbnails(profile):
+                built += 1
+            else:
+                failed += 1
+                self.stderr.write(f"{profile.user.username}: no se pudo leer {profile.foto_perfil.name}")
+            if number % 100 == 0:
+                elapsed = time.perf_counter() - start
+                self.stdout.write(f"  {number}/{total} fotos  ({number / elapsed:.1f}/s)")
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"Con miniaturas nuevas: {built}  Ya tenían: {skipped}  Ilegibles: {failed}  ({elapsed:.1f} s)"
+        )
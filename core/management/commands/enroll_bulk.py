@@ -0,0 +1,217 @@
+"""
+Alta masiva de alumnos desde un CSV y un directorio de fotos.
+
+    python manage.py enroll_bulk alumnos.csv fotos/ --workers 4
+
+El CSV lleva una fila por alumno con las columnas ``username`` y ``foto``
+(nombre del archivo dentro del directorio) y, opcionalmente,
+``first_name``, ``last_name``, ``email`` y ``password``. Se omiten los
+usuarios que ya existen y los usernames que ``User`` no aceptaría.
+
+Las fotos se procesan en un pool de procesos (``core.enrollment``): se
+decodifican, se reducen a ``--max-size`` píxeles, se recorta el rostro, se
+generan las miniaturas y, con ``FACE_RECOGNITION_MODE`` activo, se calcula
+su vector. Usuarios, perfiles y vectores se crean con ``bulk_create`` por
+lotes, en lugar de una señal ``post_save`` por fila (``create_user_profile``,
+``create_profile_thumbnails`` y ``refresh_face_embedding`` hacen lo mismo
+de a uno). Si un lote falla, su transacción se deshace y se borran las
+fotos y miniaturas que ya había guardado.
+"""
+import csv
+import functools
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core import enrollment
+from core.inference import detector_factory_from_settings
+from core.models import FaceEmbedding, UserProfile
+from core.recognition import get_embedder, get_embedding_store, rebuild_store
+from core.thumbnails import save_thumbnails, thumbnail_record
+
+REQUIRED_COLUMNS = ('username', 'foto')
+
+
+def read_rows(path):
+    """Filas del CSV, sin espacios alrededor de los valores."""
+    with open(path, newline='', encoding='utf-8-sig') as csv_file:
+        reader = csv.DictReader(csv_file)
+        missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or ())]
+        if missing:
+            raise CommandError(f"Faltan columnas en el CSV: {', '.join(missing)}")
+        return [{key: (value or '').strip() for key, value in row.items() if key} for row in reader]
+
+
+class Command(BaseCommand):
+    help = "Crea usuarios y perfiles en lote desde un CSV y un directorio de fotos"
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv', help="CSV con username, foto y opcionalmente first_name, last_name, email, password")
+        parser.add_argument('photo_dir', help="Directorio con las fotos nombradas en la columna 'foto'")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="Procesos para las fotos (0 = en este proceso)")
+        parser.add_argument('--batch-size', type=int, default=500, help="Usuarios por bulk_create")
+        parser.add_argument('--max-size', type=int, default=640, help="Lado mayor de la foto guardada, en píxeles")
+
+    def handle(self, *args, **options):
+        if not os.path.isdir(options['photo_dir']):
+            raise CommandError(f"No existe el directorio de fotos: {options['photo_dir']}")
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size debe ser mayor que 0")
+        rows = read_rows(options['csv'])
+
+        # bulk_create no valida los modelos: el username se valida aquí
+        username_field = User._meta.get_field('username')
+        for row in rows:
+            row['username'] = User.normalize_username(row['username'])
+        seen, pending = set(), []
+        existing = set(User.objects.filter(username__in=[row['username'] for row in rows])
+                       .values_list('username', flat=True))
+        for number, row in enumerate(rows, start=2):
+            username = row['username']
+            reason = None
+            if not username:
+                reason = "sin username"
+            elif username in seen:
+                reason = "repetido"
+            elif username in existing:
+                reason = "ya existe"
+            else:
+                try:
+                    username_field.run_validators(username)
+                except ValidationError as exc:
+                    reason = f"username inválido: {' '.join(exc.messages)}"
+            if reason:
+                self.stderr.write(f"Fila {number}: {username or '-'} omitido ({reason})")
+                continue
+            seen.add(username)
+            pending.append(row)
+
+        embedder = None
+        if getattr(settings, 'FACE_RECOGNITION_MODE', 'off') != 'off':
+            try:
+                embedder = get_embedder()
+            except ValueError as exc:
+                self.stderr.write(f"Sin vectores de reconocimiento: {exc}")
+        initargs = (
+            detector_factory_from_settings(),
+            getattr(settings, 'FACE_EMBEDDER_BACKEND', 'sface') if embedder else None,
+            getattr(settings, 'FACE_EMBEDDER_MODEL_PATH', None),
+        )
+
+        self.stdout.write(f"Alumnos a crear: {len(pending)} (omitidos {len(rows) - len(pending)})")
+        start = time.perf_counter()
+        created = with_photo = with_vector = 0
+        for batch in self._prepare(pending, options, initargs):
+            users, photos, vectors = self._create_batch(batch, embedder)
+            created += users
+            with_photo += photos
+            with_vector += vectors
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f"  {created}/{len(pending)} alumnos  ({created / elapsed:.1f}/s)")
+
+        if with_vector:
+            # Los kioscos mapean el almacén; se reescribe una vez al final
+            rebuild_store(get_embedding_store(embedder), embedder.name)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"Creados: {created}  Con foto: {with_photo}  Con vector: {with_vector}  "
+            f"({elapsed:.1f} s, {created / elapsed if elapsed else 0:.1f} alumnos/s)"
+        )
+
+    def _prepare(self, rows, options, initargs):
+        """Resultados de ``prepare_student`` en lotes de ``--batch-size``, en orden."""
+        size = options['batch_size']
+        prepare = functools.partial(enrollment.prepare_student, photo_dir=options['photo_dir'],
+                                    max_size=options['max_size'])
+        if options['workers'] <= 0:
+            enrollment.init_worker(*initargs)
+            try:
+                for i in range(0, len(rows), size):
+                    yield [prepare(row) for row in rows[i:i + size]]
+            finally:
+                enrollment.close_worker()
+            return
+
+        # ``spawn``: los procesos no heredan hilos ni conexiones de este proceso
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(options['workers'], mp_context=context,
+                                 initializer=enrollment.init_worker, initargs=initargs) as pool:
+            chunksize = max(1, min(32, size // (options['workers'] * 4)))
+            results = pool.map(prepare, rows, chunksize=chunksize)
+            batch = []
+            for result in results:
+                batch.append(result)
+                if len(batch) == size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+
+    def _create_batch(self, batch, embedder):
+        """Crea usuarios, perfiles y vectores de un lote; devuelve cuántos de cada uno."""
+        storage = UserProfile._meta.get_field('foto_perfil').storage
+        saved = []
+        try:
+            with transaction.atomic():
+                return self._insert_batch(batch, embedder, saved)
+        except Exception:
+            # La transacción no deshace los archivos: se borran los de este lote
+            for name in saved:
+                storage.delete(name)
+            raise
+
+    def _insert_batch(self, batch, embedder, saved):
+        """Cuerpo de ``_create_batch``; anota en ``saved`` cada archivo guardado."""
+        # Otro proceso pudo crear alguno de estos usuarios mientras se
+        # procesaban las fotos
+        taken = set(User.objects.filter(username__in=[result['row']['username'] for result in batch])
+                    .values_list('username', flat=True))
+        for username in sorted(taken):
+            self.stderr.write(f"{username}: omitido (ya existe)")
+        batch = [result for result in batch if result['row']['username'] not in taken]
+
+        User.objects.bulk_create([
+            User(
+                username=result['row']['username'],
+                first_name=result['row'].get('first_name', ''),
+                last_name=result['row'].get('last_name', ''),
+                email=result['row'].get('email', ''),
+                password=result['password'],
+            )
+            for result in batch
+        ])
+        # No todas las bases devuelven los ids en bulk_create
+        ids = dict(User.objects.filter(username__in=[result['row']['username'] for result in batch])
+                   .values_list('username', 'id'))
+
+        field = UserProfile._meta.get_field('foto_perfil')
+        profiles, embeddings = [], []
+        for result in batch:
+            username = result['row']['username']
+            if result['warning']:
+                self.stderr.write(f"{username}: {result['warning']}")
+            photo, thumbnails = '', {}
+            if result['photo'] is not None:
+                photo = field.storage.save(field.generate_filename(None, f"{username}.jpg"),
+                                           ContentFile(result['photo']))
+                saved.append(photo)
+                saved.extend(save_thumbnails(field.storage, photo, result['thumbnails']))
+                if result['thumbnails']:
+                    thumbnails = thumbnail_record(photo, result['thumbnails'])
+            profiles.append(UserProfile(user_id=ids[username], foto_perfil=photo or None,
+                                        miniaturas=thumbnails))
+            if result['vector'] is not None:
+                embeddings.append(FaceEmbedding(user_id=ids[username], vector=result['vector'],
+                                                modelo=embedder.name, foto=photo))
+        UserProfile.objects.bulk_create(profiles)
+        FaceEmbedding.objects.bulk_create(embeddings)
+        return len(batch), sum(1 for p in profiles if p.foto_perfil), len(embeddings)
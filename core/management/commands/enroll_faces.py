@@ -0,0 +1,71 @@
+"""
+Enrolamiento facial a partir de las fotos de perfil.
+
+Calcula el vector del rostro de cada ``UserProfile.foto_perfil`` con el
+modelo configurado (``FACE_EMBEDDER_BACKEND``) y lo guarda en
+``FaceEmbedding``:
+
+    python manage.py enroll_faces               # usuarios sin vector
+    python manage.py enroll_faces --all         # recalcula todos
+    python manage.py enroll_faces --user ana --user luis
+    python manage.py enroll_faces --rebuild-index   # rehace el almacén en disco
+
+Los vectores también se escriben en ``FACE_EMBEDDINGS_DIR``, el archivo que
+los kioscos mapean en memoria al arrancar.
+"""
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from core.inference import detector_factory_from_settings
+from core.recognition import enroll_user, get_embedder, get_embedding_store, rebuild_store
+
+
+class Command(BaseCommand):
+    help = "Calcula los vectores de reconocimiento facial de las fotos de perfil"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='usernames', help="Enrolar solo a este usuario")
+        parser.add_argument('--all', action='store_true',
+                            help="Recalcular también a los usuarios que ya tienen vector")
+        parser.add_argument('--rebuild-index', action='store_true',
+                            help="Solo reescribir el almacén en disco desde la base de datos")
+
+    def handle(self, *args, **options):
+        try:
+            embedder = get_embedder()
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        if options['rebuild_index']:
+            store = get_embedding_store(embedder)
+            count = rebuild_store(store, embedder.name)
+            self.stdout.write(f"Almacén reescrito: {count} vectores en {store.matrix_path}")
+            return
+
+        users = User.objects.select_related('profile').exclude(profile__foto_perfil='')
+        users = users.exclude(profile__foto_perfil__isnull=True)
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+        elif not options['all']:
+            # Sin vector, o con un vector de otro modelo
+            users = users.exclude(face_embedding__modelo=embedder.name)
+
+        detector = detector_factory_from_settings()()
+        enrolled = skipped = 0
+        start = time.perf_counter()
+        try:
+            for user in users.iterator():
+                if enroll_user(user, detector, embedder) is None:
+                    skipped += 1
+                    self.stderr.write(f"{user.username}: sin rostro detectable en la foto de perfil")
+                else:
+                    enrolled += 1
+        finally:
+            detector.close()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"Enrolados: {enrolled}  Sin rostro: {skipped}  "
+            f"({embedder.name}, {elapsed:.1f} s)"
+        )
@@ -0,0 +1,125 @@
+"""
+Métricas en tiempo real del stream de video.
+
+``MetricsChannel`` guarda el último estado (rostros, texto de estado, paso de
+la prueba de vida) junto con un número de versión que solo avanza cuando algún
+valor cambia de verdad. Los suscriptores del endpoint SSE esperan sobre esa
+versión, así que solo se envía un evento cuando hay algo nuevo que mostrar.
+"""
+import json
+import threading
+import time
+import zlib
+
+DEFAULT_METRICS = {
+    "face_count": 0,
+    "status": "Iniciando...",
+    "liveness_step": 1,  # 1: Buscando, 2: Mover rostro, 3: Quedarse quieto
+}
+
+
+class MetricsChannel:
+    """Estado de métricas con notificación de cambios."""
+
+    def __init__(self, **initial):
+        self._cond = threading.Condition()
+        self._data = dict(DEFAULT_METRICS, **initial)
+        self.version = 0
+        self.last_used = time.monotonic()
+
+    def update(self, **values):
+        """Actualiza los valores; devuelve True si alguno cambió."""
+        with self._cond:
+            changed = {k: v for k, v in values.items() if self._data.get(k) != v}
+            if not changed:
+                return False
+            self._data.update(changed)
+            self.version += 1
+            self.last_used = time.monotonic()
+            self._cond.notify_all()
+            return True
+
+    def reset(self, status="Buscando tu rostro..."):
+        return self.update(face_count=0, status=status, liveness_step=1)
+
+    def snapshot(self):
+        with self._cond:
+            return dict(self._data)
+
+    def state(self):
+        """Devuelve ``(version, datos)`` de forma consistente."""
+        with self._cond:
+            return self.version, dict(self._data)
+
+    def wait(self, version, timeout=None):
+        """
+        Espera a que la versión supere ``version``.
+
+        Devuelve ``(version, datos)``; si vence ``timeout`` la versión
+        devuelta es la misma que la recibida.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self.version != version, timeout)
+            self.last_used = time.monotonic()
+            return self.version, dict(self._data)
+
+
+class MetricsRegistry:
+    """
+    Canales de métricas por sesión.
+
+    Cada kiosco (sesión) tiene su propio ``MetricsChannel``, así que las
+    actualizaciones por frame de un stream solo toman el lock de su canal.
+    El índice de canales está repartido en ``shards`` diccionarios con lock
+    propio para que crear o buscar canales tampoco serialice a todos los
+    streams. Los canales sin uso durante ``max_idle`` segundos se eliminan.
+    """
+
+    def __init__(self, shards=16, max_idle=3600.0):
+        self.max_idle = max_idle
+        self._shards = [({}, threading.Lock()) for _ in range(shards)]
+
+    def _shard(self, key):
+        return self._shards[zlib.crc32(str(key).encode()) % len(self._shards)]
+
+    def get(self, key):
+        """Devuelve el canal de ``key``, creándolo si no existe."""
+        channels, lock = self._shard(key)
+        with lock:
+            channel = channels.get(key)
+            if channel is None:
+                self._prune_locked(channels)
+                channel = channels[key] = MetricsChannel()
+            return channel
+
+    def discard(self, key):
+        channels, lock = self._shard(key)
+        with lock:
+            channels.pop(key, None)
+
+    def __len__(self):
+        return sum(len(channels) for channels, _ in self._shards)
+
+    def _prune_locked(self, channels):
+        limit = time.monotonic() - self.max_idle
+        for key in [k for k, c in channels.items() if c.last_used < limit]:
+            del channels[key]
+
+
+def sse_events(channel, keepalive=15.0):
+    """
+    Generador de eventos Server-Sent Events para ``channel``.
+
+    Envía el estado actual al conectarse y luego un evento por cada cambio.
+    Si no hay cambios en ``keepalive`` segundos manda un comentario para
+    mantener viva la conexión y detectar clientes desconectados.
+    """
+    version, data = channel.state()
+    while True:
+        yield f"id: {version}\ndata: {json.dumps(data)}\n\n"
+        while True:
+            new_version, data = channel.wait(version, timeout=keepalive)
+            if new_version != version:
+                version = new_version
+                break
+            yield ": ping\n\n"
@@ -0,0 +1,275 @@
+"""
+Backends de estado para las métricas en tiempo real.
+
+Con varios workers (gunicorn/uvicorn) el stream de video y las peticiones de
+métricas de un mismo kiosco pueden caer en procesos distintos, así que el
+estado no puede vivir solo en memoria del proceso. Los backends exponen la
+misma interfaz que ``MetricsRegistry``: ``get(key)`` devuelve un canal con
+``update``, ``reset``, ``snapshot``, ``state`` y ``wait``.
+
+- ``memory``: ``MetricsRegistry`` en el propio proceso (un solo worker).
+- ``unix``: un almacén local servido por un socket Unix. El primer worker
+  que lo necesita lo levanta en un hilo; el resto se conecta como cliente.
+- ``redis``: cualquier servidor compatible con Redis. Acepta un cliente ya
+  construido, lo que permite sustituirlo por un doble en pruebas locales.
+"""
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+import time
+
+from .metrics import DEFAULT_METRICS, MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class RemoteChannel:
+    """
+    Canal cuyo estado vive fuera del proceso.
+
+    Recuerda lo último que escribió para no enviar actualizaciones que no
+    cambian nada; esa caché se descarta cada ``resync`` segundos por si otro
+    proceso modificó el estado entretanto.
+    """
+
+    def __init__(self, backend, key, resync=1.0):
+        self._backend = backend
+        self.key = key
+        self.resync = resync
+        self._sent = {}
+        self._sent_at = time.monotonic()
+
+    @property
+    def version(self):
+        return self.state()[0]
+
+    def update(self, **values):
+        now = time.monotonic()
+        if now - self._sent_at > self.resync:
+            self._sent = {}
+            self._sent_at = now
+        changed = {k: v for k, v in values.items() if self._sent.get(k, _MISSING) != v}
+        if not changed:
+            return False
+        result = self._backend._update(self.key, changed)
+        self._sent.update(changed)
+        return result
+
+    def reset(self, status="Buscando tu rostro..."):
+        return self.update(face_count=0, status=status, liveness_step=1)
+
+    def snapshot(self):
+        return self.state()[1]
+
+    def state(self):
+        return self._backend._state(self.key)
+
+    def wait(self, version, timeout=None):
+        return self._backend._wait(self.key, version, timeout)
+
+
+# --- Almacén local por socket Unix ---
+
+class _StoreHandler(socketserver.StreamRequestHandler):
+    """Atiende peticiones JSON, una por línea, contra el registro en memoria."""
+
+    def handle(self):
+        registry = self.server.registry
+        for line in self.rfile:
+            request = json.loads(line)
+            channel = registry.get(request["key"])
+            op = request["op"]
+            if op == "update":
+                response = {"changed": channel.update(**request["values"])}
+            elif op == "wait":
+                version, data = channel.wait(request["version"], request.get("timeout"))
+                response = {"version": version, "data": data}
+            else:
+                version, data = channel.state()
+                response = {"version": version, "data": data}
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+
+
+class MetricsSocketServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, registry):
+        self.registry = registry
+        super().__init__(path, _StoreHandler)
+
+
+class UnixSocketBackend:
+    """Cliente del almacén local; lo levanta si todavía no existe."""
+
+    # Tope de espera de una petición ``wait`` sin timeout
+    MAX_WAIT = 60.0
+
+    def __init__(self, path, shards=16, max_idle=3600.0):
+        self.path = str(path)
+        self.shards = shards
+        self.max_idle = max_idle
+        self.server = None
+        self._local = threading.local()
+        self._server_lock = threading.Lock()
+
+    def get(self, key):
+        return RemoteChannel(self, key)
+
+    def _ensure_server(self):
+        """Intenta hospedar el almacén en este proceso si nadie lo hace."""
+        with self._server_lock:
+            if self.server is not None:
+                return
+            if os.path.exists(self.path):
+                probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                try:
+                    probe.connect(self.path)
+                    return
+                except OSError:
+                    # Socket huérfano de un proceso que ya terminó
+                    os.unlink(self.path)
+                finally:
+                    probe.close()
+            try:
+                server = MetricsSocketServer(self.path, MetricsRegistry(self.shards, self.max_idle))
+            except OSError:
+                # Otro worker ganó la carrera y ya está sirviendo
+                return
+            threading.Thread(target=server.serve_forever, name="metrics-store", daemon=True).start()
+            self.server = server
+            logger.info("Almacén de métricas escuchando en %s", self.path)
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.path)
+            except OSError:
+                sock.close()
+                self._ensure_server()
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.connect(self.path)
+            conn = self._local.conn = sock.makefile("rwb")
+        return conn
+
+    def _request(self, payload):
+        data = json.dumps(payload).encode() + b"\n"
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.write(data)
+                conn.flush()
+                line = conn.readline()
+                if line:
+                    return json.loads(line)
+            except OSError:
+                if attempt:
+                    raise
+            # El almacén se reinició: se reconecta (o se levanta) y reintenta
+            self._local.conn = None
+            conn.close()
+        raise ConnectionError(f"Sin respuesta del almacén de métricas en {self.path}")
+
+    def _update(self, key, values):
+        return self._request({"op": "update", "key": key, "values": values})["changed"]
+
+    def _state(self, key):
+        response = self._request({"op": "state", "key": key})
+        return response["version"], response["data"]
+
+    def _wait(self, key, version, timeout):
+        if timeout is None:
+            timeout = self.MAX_WAIT
+        response = self._request({"op": "wait", "key": key, "version": version, "timeout": timeout})
+        return response["version"], response["data"]
+
+
+# --- Redis ---
+
+class RedisBackend:
+    """
+    Métricas en un hash de Redis por kiosco.
+
+    Cada campo se guarda serializado en JSON junto a un contador
+    ``__version``; cada cambio se publica en un canal con el mismo nombre que
+    la clave para despertar a quienes esperan.
+    """
+
+    VERSION_FIELD = "__version"
+
+    def __init__(self, url="redis://localhost:6379/0", client=None,
+                 prefix="asistencia:metrics:", max_idle=3600.0):
+        if client is None:
+            try:
+                import redis
+            except ImportError as exc:
+                raise RuntimeError(
+                    "El backend de métricas 'redis' requiere el paquete redis (pip install redis)"
+                ) from exc
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        self.max_idle = int(max_idle)
+
+    def get(self, key):
+        return RemoteChannel(self, key)
+
+    def _key(self, key):
+        return f"{self.prefix}{key}"
+
+    def _update(self, key, values):
+        name = self._key(key)
+        pipe = self.client.pipeline()
+        pipe.hset(name, mapping={k: json.dumps(v) for k, v in values.items()})
+        pipe.hincrby(name, self.VERSION_FIELD, 1)
+        pipe.expire(name, self.max_idle)
+        version = pipe.execute()[1]
+        self.client.publish(name, version)
+        return True
+
+    def _state(self, key):
+        raw = self.client.hgetall(self._key(key))
+        data = dict(DEFAULT_METRICS)
+        version = 0
+        for field, value in raw.items():
+            field = field.decode() if isinstance(field, bytes) else field
+            if field == self.VERSION_FIELD:
+                version = int(value)
+            else:
+                data[field] = json.loads(value)
+        return version, data
+
+    def _wait(self, key, version, timeout):
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        # Suscribirse antes de leer el estado evita perder un cambio intermedio
+        pubsub.subscribe(self._key(key))
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            while True:
+                current, data = self._state(key)
+                if current != version:
+                    return current, data
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return current, data
+                pubsub.get_message(timeout=remaining if remaining is not None else 1.0)
+        finally:
+            pubsub.close()
+
+
+def create_metrics_backend(name="memory", shards=16, max_idle=3600.0,
+                           socket_path=None, redis_url=None):
+    """Construye el backend de métricas configurado en ``METRICS_BACKEND``."""
+    if name == "memory":
+        return MetricsRegistry(shards=shards, max_idle=max_idle)
+    if name == "unix":
+        return UnixSocketBackend(socket_path, shards=shards, max_idle=max_idle)
+    if name == "redis":
+        return RedisBackend(redis_url, max_idle=max_idle)
+    raise ValueError(f"Backend de métricas desconocido: {name}")
@@ -0,0 +1,97 @@
+# Generated by Django 5.2.7 on 2026-10-17 10:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef, Q, Subquery
+from django.db.models.functions import TruncDate
+
+
+def duplicate_rows(Asistencia):
+    """Asistencias que no son la primera de su usuario y día (una sola consulta)."""
+    earlier = Asistencia.objects.filter(user_id=OuterRef('user_id'), fecha=OuterRef('fecha')).filter(
+        Q(fecha_hora__lt=OuterRef('fecha_hora')) | Q(fecha_hora=OuterRef('fecha_hora'), id__lt=OuterRef('id'))
+    )
+    return Asistencia.objects.filter(Exists(earlier))
+
+
+def backfill_fecha(apps, schema_editor):
+    Asistencia = apps.get_model('core', 'Asistencia')
+    AsistenciaDuplicada = apps.get_model('core', 'AsistenciaDuplicada')
+    # Un solo UPDATE: TruncDate convierte fecha_hora a la zona local (TIME_ZONE)
+    Asistencia.objects.filter(fecha__isnull=True).update(fecha=TruncDate('fecha_hora'))
+    # Antes de exigir una asistencia por día, las repetidas se mueven a
+    # AsistenciaDuplicada (no se pierden; revertir la migración las restaura)
+    duplicates = duplicate_rows(Asistencia)
+    AsistenciaDuplicada.objects.bulk_create(
+        (AsistenciaDuplicada(asistencia_id=row['id'], user_id=row['user_id'],
+                             fecha_hora=row['fecha_hora'], fecha=row['fecha'])
+         for row in duplicates.values('id', 'user_id', 'fecha_hora', 'fecha').iterator()),
+        batch_size=500,
+    )
+    Asistencia.objects.filter(id__in=AsistenciaDuplicada.objects.values('asistencia_id')).delete()
+
+
+def restore_duplicates(apps, schema_editor):
+    Asistencia = apps.get_model('core', 'Asistencia')
+    AsistenciaDuplicada = apps.get_model('core', 'AsistenciaDuplicada')
+    Asistencia.objects.bulk_create(
+        (Asistencia(id=row['asistencia_id'], user_id=row['user_id'],
+                    fecha_hora=row['fecha_hora'], fecha=row['fecha'])
+         for row in AsistenciaDuplicada.objects.values('asistencia_id', 'user_id', 'fecha_hora', 'fecha').iterator()),
+        batch_size=500,
+    )
+    # bulk_create aplica auto_now_add: se devuelve la hora original en un UPDATE
+    original = AsistenciaDuplicada.objects.filter(asistencia_id=OuterRef('id')).values('fecha_hora')[:1]
+    (Asistencia.objects.filter(id__in=AsistenciaDuplicada.objects.values('asistencia_id'))
+     .update(fecha_hora=Subquery(original)))
+    AsistenciaDuplicada.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AsistenciaDuplicada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('asistencia_id', models.BigIntegerField()),
+                ('fecha_hora', models.DateTimeField()),
+                ('fecha', models.DateField()),
+                ('archivada', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='asistencia',
+            name='fecha',
+            field=models.DateField(editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_fecha, restore_duplicates),
+        migrations.AlterField(
+            model_name='asistencia',
+            name='fecha',
+            field=models.DateField(editable=False),
+        ),
+        migrations.AlterUniqueTogether(
+            name='asistencia',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='asistencia',
+            constraint=models.UniqueConstraint(fields=('user', 'fecha'), name='asistencia_unica_por_dia'),
+        ),
+        migrations.AddIndex(
+            model_name='asistencia',
+            index=models.Index(fields=['user', '-fecha_hora'], name='asistencia_user_fh_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asistencia',
+            index=models.Index(fields=['fecha', 'user'], name='asistencia_fecha_user_idx'),
+        ),
+    ]
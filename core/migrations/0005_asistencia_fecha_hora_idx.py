@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-17 12:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_face_embedding_foto'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='asistencia',
+            index=models.Index(fields=['-fecha_hora', '-id'], name='asistencia_fh_id_idx'),
+        ),
+    ]
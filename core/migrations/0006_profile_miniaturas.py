@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_asistencia_fecha_hora_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='miniaturas',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -1,11 +1,19 @@
+import logging
+
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
 
 class UserProfile(models.Model):
 	user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
 	foto_perfil = models.ImageField(upload_to='fotos_perfil/', null=True, blank=True)
+	# Miniaturas generadas: {'foto': nombre, 'anchos': [...], 'formatos': [...]}
+	miniaturas = models.JSONField(default=dict, blank=True)
 
 	def __str__(self):
 		return self.user.username
@@ -15,15 +23,89 @@ def create_user_profile(sender, instance, created, **kwargs):
 	if created:
 		UserProfile.objects.create(user=instance)
 
+@receiver(post_save, sender=UserProfile)
+def create_profile_thumbnails(sender, instance, raw=False, **kwargs):
+	# Las miniaturas anotadas son de otra foto (o de ninguna): se generan
+	from .thumbnails import build_thumbnails, has_thumbnails
+	if not raw and instance.foto_perfil and not has_thumbnails(instance):
+		build_thumbnails(instance)
+
+@receiver(post_save, sender=UserProfile)
+def refresh_face_embedding(sender, instance, raw=False, **kwargs):
+	# Con el reconocimiento activo, una foto de perfil nueva se enrola al guardarla
+	if raw or getattr(settings, 'FACE_RECOGNITION_MODE', 'off') == 'off':
+		return
+	from .recognition import refresh_profile
+	try:
+		refresh_profile(instance)
+	except ValueError as exc:
+		# Sin modelo de embedding disponible: se enrola luego con enroll_faces
+		logger.warning("No se pudo actualizar el vector de %s: %s", instance, exc)
+
+class FaceEmbedding(models.Model):
+	"""Vector del rostro de la foto de perfil, usado para reconocer al usuario."""
+	user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='face_embedding')
+	# float32 normalizado (norma 1), guardado como bytes
+	vector = models.BinaryField()
+	# Modelo que generó el vector: vectores de modelos distintos no se comparan
+	modelo = models.CharField(max_length=50)
+	# Foto de perfil de la que salió el vector, para recalcularlo solo si cambia
+	foto = models.CharField(max_length=255, blank=True, default='')
+	actualizado = models.DateTimeField(auto_now=True)
+
+	def __str__(self):
+		return f"{self.user.username} ({self.modelo})"
+
+@receiver(post_delete, sender=FaceEmbedding)
+def discard_face_embedding(sender, instance, **kwargs):
+	# Usuarios borrados o fotos quitadas dejan de reconocerse en todos los procesos
+	from .recognition import discard_embedding
+	discard_embedding(instance.user_id)
+
+class AsistenciaDuplicada(models.Model):
+	"""
+	Asistencia repetida en un mismo día, apartada por la migración 0002 al
+	exigir una por usuario y día. Se conserva para revisarla o restaurarla
+	(revertir la migración la devuelve a Asistencia).
+	"""
+	# id que tenía en Asistencia
+	asistencia_id = models.BigIntegerField()
+	user = models.ForeignKey(User, on_delete=models.CASCADE)
+	fecha_hora = models.DateTimeField()
+	fecha = models.DateField()
+	archivada = models.DateTimeField(auto_now_add=True)
+
+	def __str__(self):
+		return f"{self.user.username} - {self.fecha_hora.strftime('%Y-%m-%d %H:%M:%S')} (duplicada)"
+
 class Asistencia(models.Model):
 	user = models.ForeignKey(User, on_delete=models.CASCADE)
 	fecha_hora = models.DateTimeField(auto_now_add=True)
+	# Fecha local (America/Guayaquil) del registro, desnormalizada para
+	# consultar por día sin extraer la fecha de fecha_hora
+	fecha = models.DateField(editable=False)
 
 	def __str__(self):
 		return f"{self.user.username} - {self.fecha_hora.strftime('%Y-%m-%d %H:%M:%S')}"
 
+	def save(self, *args, **kwargs):
+		if self.fecha is None:
+			self.fecha = timezone.localdate(self.fecha_hora) if self.fecha_hora else timezone.localdate()
+		super().save(*args, **kwargs)
+
 	class Meta:
-		unique_together = ('user', 'fecha_hora')
+		constraints = [
+			# Una sola asistencia por usuario y día
+			models.UniqueConstraint(fields=['user', 'fecha'], name='asistencia_unica_por_dia'),
+		]
+		indexes = [
+			# Últimas asistencias de un usuario (vista index)
+			models.Index(fields=['user', '-fecha_hora'], name='asistencia_user_fh_idx'),
+			# Reportes por rango de fechas
+			models.Index(fields=['fecha', 'user'], name='asistencia_fecha_user_idx'),
+			# Registros de todos los usuarios paginados por cursor (reportes)
+			models.Index(fields=['-fecha_hora', '-id'], name='asistencia_fh_id_idx'),
+		]
 from django.db import models
 
 # Create your models here.
@@ -0,0 +1,269 @@
+"""
+Pipeline productor/consumidor para el stream de video.
+
+Cada etapa (captura, inferencia, codificación JPEG) corre en su propio hilo y
+se comunica con la siguiente mediante colas acotadas que descartan el
+elemento más antiguo cuando se llenan. Así un cliente lento o una inferencia
+lenta nunca frenan la captura: solo se pierden frames intermedios.
+"""
+import logging
+import threading
+import time
+import weakref
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class QueueClosed(Exception):
+    """La cola fue cerrada y ya no quedan elementos."""
+
+
+class DropOldestQueue:
+    """Cola acotada que descarta el elemento más antiguo al llenarse."""
+
+    def __init__(self, maxsize=2):
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def __len__(self):
+        with self._cond:
+            return len(self._items)
+
+    @property
+    def closed(self):
+        with self._cond:
+            return self._closed
+
+    def put(self, item):
+        """Encola ``item``; devuelve False si la cola ya está cerrada."""
+        with self._cond:
+            if self._closed:
+                return False
+            if len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+            return True
+
+    def get(self, timeout=None):
+        """
+        Extrae el elemento más antiguo, esperando si la cola está vacía.
+
+        Lanza ``QueueClosed`` cuando la cola está cerrada y vacía, y
+        ``TimeoutError`` si vence ``timeout``.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items or self._closed, timeout):
+                raise TimeoutError
+            if self._items:
+                return self._items.popleft()
+            raise QueueClosed
+
+    def close(self, discard=False):
+        """Cierra la cola; con ``discard`` se descartan los elementos pendientes."""
+        with self._cond:
+            self._closed = True
+            if discard:
+                self._items.clear()
+            self._cond.notify_all()
+
+
+def percentile(samples, q):
+    """Percentil ``q`` (0-100) por rango más cercano; None si no hay muestras."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, round(q / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+class StageStats:
+    """
+    Contadores y latencia de una etapa.
+
+    Guarda un promedio móvil exponencial y las últimas ``window`` muestras,
+    de las que se obtienen los percentiles p50/p95/p99.
+    """
+
+    ALPHA = 0.1
+
+    def __init__(self, window=512):
+        self.processed = 0
+        self.latency_avg = 0.0
+        self.latency_max = 0.0
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self.processed += 1
+            if self.processed == 1:
+                self.latency_avg = seconds
+            else:
+                self.latency_avg += self.ALPHA * (seconds - self.latency_avg)
+            self.latency_max = max(self.latency_max, seconds)
+            self._samples.append(seconds)
+
+    def samples(self):
+        """Últimas latencias registradas, en segundos."""
+        with self._lock:
+            return list(self._samples)
+
+    def snapshot(self):
+        samples = self.samples()
+        with self._lock:
+            data = {
+                "processed": self.processed,
+                "latency_ms": round(self.latency_avg * 1000, 2),
+                "max_latency_ms": round(self.latency_max * 1000, 2),
+            }
+        for q in (50, 95, 99):
+            value = percentile(samples, q)
+            data[f"p{q}_latency_ms"] = round(value * 1000, 2) if value is not None else None
+        return data
+
+
+class Stage(threading.Thread):
+    """Hilo que aplica ``func`` a cada elemento de ``inbox`` y lo pasa a ``outbox``."""
+
+    def __init__(self, name, func, inbox, outbox, on_stop=None):
+        super().__init__(name=name, daemon=True)
+        self.func = func
+        self.inbox = inbox
+        self.outbox = outbox
+        self.on_stop = on_stop
+        self.stats = StageStats()
+        self.error = None
+
+    def run(self):
+        try:
+            while True:
+                try:
+                    item = self.inbox.get()
+                except QueueClosed:
+                    break
+                start = time.perf_counter()
+                result = self.func(item)
+                self.stats.record(time.perf_counter() - start)
+                if result is not None:
+                    self.outbox.put(result)
+        except Exception as exc:
+            logger.exception("Error en la etapa %s", self.name)
+            self.error = exc
+        finally:
+            # Se libera primero para que al terminar el pipeline no queden
+            # recursos abiertos en hilos daemon.
+            if self.on_stop is not None:
+                self.on_stop()
+            self.outbox.close()
+
+
+class SourceStage(Stage):
+    """Primera etapa: lee elementos de un iterable (p. ej. la cámara)."""
+
+    def __init__(self, name, source, outbox, stop_event):
+        super().__init__(name, None, None, outbox)
+        self.source = source
+        self.stop_event = stop_event
+
+    def run(self):
+        iterator = iter(self.source)
+        try:
+            while not self.stop_event.is_set():
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                # La latencia de captura es el tiempo de espera del frame
+                self.stats.record(time.perf_counter() - start)
+                self.outbox.put(item)
+        except Exception as exc:
+            logger.exception("Error en la etapa %s", self.name)
+            self.error = exc
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+            self.outbox.close()
+
+
+# Pipelines en ejecución, para exponer sus estadísticas
+_active = weakref.WeakSet()
+
+
+def active_pipelines():
+    return list(_active)
+
+
+class FramePipeline:
+    """
+    Encadena una fuente y varias etapas con colas ``DropOldestQueue``.
+
+    ``stages`` es una lista de tuplas ``(nombre, func)`` o
+    ``(nombre, func, on_stop)``. Iterar el pipeline devuelve los resultados
+    de la última etapa. ``monitors`` asocia nombres a objetos con
+    ``snapshot()`` cuyo estado se añade a ``stats()``.
+    """
+
+    def __init__(self, source, stages, maxsize=2, name="stream", monitors=None):
+        self.name = name
+        self.monitors = dict(monitors or {})
+        self._stop = threading.Event()
+        self._queues = [DropOldestQueue(maxsize)]
+        self._stages = [SourceStage("capture", source, self._queues[0], self._stop)]
+        for spec in stages:
+            stage_name, func = spec[0], spec[1]
+            on_stop = spec[2] if len(spec) > 2 else None
+            outbox = DropOldestQueue(maxsize)
+            self._stages.append(Stage(stage_name, func, self._queues[-1], outbox, on_stop))
+            self._queues.append(outbox)
+        self._started = False
+
+    def start(self):
+        if not self._started:
+            self._started = True
+            for stage in self._stages:
+                stage.start()
+            _active.add(self)
+        return self
+
+    def __iter__(self):
+        self.start()
+        output = self._queues[-1]
+        try:
+            while True:
+                try:
+                    yield output.get()
+                except QueueClosed:
+                    return
+        finally:
+            self.close()
+
+    def close(self):
+        """Detiene todas las etapas y descarta los frames pendientes."""
+        self._stop.set()
+        for q in self._queues:
+            q.close(discard=True)
+        _active.discard(self)
+
+    def stats(self):
+        """Profundidad de cola, descartes y latencia de cada etapa."""
+        data = {}
+        for stage in self._stages:
+            info = stage.stats.snapshot()
+            info["queue_depth"] = len(stage.outbox)
+            info["dropped"] = stage.outbox.dropped
+            data[stage.name] = info
+        for monitor_name, monitor in self.monitors.items():
+            data[monitor_name] = monitor.snapshot()
+        return data
+
+    def latency_samples(self):
+        """Últimas latencias (en segundos) de cada etapa, para agregarlas entre pipelines."""
+        return {stage.name: stage.stats.samples() for stage in self._stages}
@@ -0,0 +1,604 @@
+"""
+Reconocimiento facial contra las fotos de perfil.
+
+Al enrolar a un usuario se detecta el rostro de su ``foto_perfil``, se
+calcula su vector (embedding) y se guarda en ``FaceEmbedding``. En el stream,
+``FaceRecognizer`` toma algunas muestras del rostro mientras la persona está
+quieta (paso 3 de la prueba de vida) y las busca en ``EmbeddingIndex``: una
+matriz ``(usuarios, dimensión)`` de vectores normalizados, de modo que la
+similitud coseno con todos los usuarios es un único producto matriz-vector.
+Con 10.000 usuarios y vectores de 128 dimensiones la búsqueda exacta cuesta
+menos de un milisegundo, así que no hace falta un índice aproximado.
+
+Modelos de embedding (``FACE_EMBEDDER_BACKEND``):
+
+- ``sface``: SFace de OpenCV (``face_recognition_sface_2021dec.onnx``),
+  requiere el modelo en ``FACE_EMBEDDER_MODEL_PATH``.
+- ``lbp``: histogramas de patrones binarios locales. No necesita modelos,
+  pero distingue mucho peor; sirve para pruebas y grupos pequeños.
+
+Los vectores se guardan además en ``FACE_EMBEDDINGS_DIR`` (``EmbeddingStore``):
+al arrancar, el índice mapea esa matriz en memoria en lugar de leer la tabla
+o decodificar fotos, y cambiar la foto de perfil de un usuario reescribe
+solo su fila.
+"""
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+import cv2
+import numpy as np
+
+from .detection import box_to_pixels
+from .models import FaceEmbedding
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+EMBEDDER_BACKENDS = ("sface", "lbp")
+
+
+def normalize(vectors):
+    """Normaliza a norma 1 (un vector o las filas de una matriz), en float32."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def crop_face(frame, box, margin=0.15):
+    """Recorta el recuadro ``(x, y, w, h)`` en píxeles con un margen relativo."""
+    x, y, w, h = box
+    dx, dy = int(w * margin), int(h * margin)
+    ih, iw = frame.shape[:2]
+    x0, y0 = max(0, x - dx), max(0, y - dy)
+    x1, y1 = min(iw, x + w + dx), min(ih, y + h + dy)
+    if x1 - x0 < 8 or y1 - y0 < 8:
+        return None
+    return frame[y0:y1, x0:x1]
+
+
+class SFaceEmbedder:
+    """Embedding SFace de OpenCV (128 dimensiones)."""
+
+    name = "sface"
+    dim = 128
+    # Umbral de similitud coseno recomendado por OpenCV para SFace
+    default_threshold = 0.363
+
+    def __init__(self, model_path):
+        if not model_path or not os.path.exists(model_path):
+            raise ValueError(
+                f"El modelo de reconocimiento 'sface' requiere un archivo local "
+                f"(FACE_EMBEDDER_MODEL_PATH): {model_path}"
+            )
+        self._model = cv2.FaceRecognizerSF.create(model_path, "")
+        # La red de OpenCV no admite inferencias simultáneas
+        self._lock = threading.Lock()
+
+    def embed(self, face):
+        face = cv2.resize(face, (112, 112), interpolation=cv2.INTER_AREA)
+        with self._lock:
+            feature = self._model.feature(face)
+        return normalize(feature.ravel())
+
+
+class LBPEmbedder:
+    """Histogramas de patrones binarios locales en una rejilla sobre el rostro."""
+
+    name = "lbp"
+    default_threshold = 0.92
+
+    def __init__(self, size=64, grid=4, bins=32):
+        self.size = size
+        self.grid = grid
+        self.bins = bins
+        self.dim = grid * grid * bins
+
+    def embed(self, face):
+        gray = cv2.cvtColor(face, cv2.COLOR_BGR2GRAY) if face.ndim == 3 else face
+        gray = cv2.equalizeHist(cv2.resize(gray, (self.size, self.size), interpolation=cv2.INTER_AREA))
+        center = gray[1:-1, 1:-1]
+        codes = np.zeros(center.shape, dtype=np.uint8)
+        offsets = ((0, 0), (0, 1), (0, 2), (1, 2), (2, 2), (2, 1), (2, 0), (1, 0))
+        for bit, (dy, dx) in enumerate(offsets):
+            neighbour = gray[dy:dy + center.shape[0], dx:dx + center.shape[1]]
+            codes |= (neighbour >= center).astype(np.uint8) << bit
+        codes >>= 8 - int(np.log2(self.bins))
+        cell = codes.shape[0] // self.grid
+        cells = codes[:cell * self.grid, :cell * self.grid].reshape(self.grid, cell, self.grid, cell)
+        cells = cells.transpose(0, 2, 1, 3).reshape(self.grid * self.grid, -1)
+        # Histograma de cada celda con un solo bincount
+        flat = cells + (np.arange(len(cells)) * self.bins)[:, None]
+        histogram = np.bincount(flat.ravel(), minlength=self.dim).astype(np.float32)
+        # Raíz cuadrada (distancia de Hellinger) antes de la similitud coseno
+        return normalize(np.sqrt(histogram))
+
+
+def build_embedder(backend="sface", model_path=None):
+    """Construye el modelo de embedding ``backend`` (ver ``EMBEDDER_BACKENDS``)."""
+    if backend == "sface":
+        return SFaceEmbedder(model_path)
+    if backend == "lbp":
+        return LBPEmbedder()
+    raise ValueError(f"Modelo de reconocimiento desconocido: {backend}")
+
+
+class EmbeddingIndex:
+    """
+    Vectores normalizados de los usuarios enrolados, en una sola matriz.
+
+    Las búsquedas leen una instantánea ``(matriz, ids)``; las altas y bajas
+    construyen una matriz nueva y la publican de una vez, así que no hace
+    falta bloquear las búsquedas.
+    """
+
+    def __init__(self, dim, user_ids=(), matrix=None, normalized=False):
+        self.dim = dim
+        self._lock = threading.Lock()
+        ids = np.asarray(user_ids, dtype=np.int64)
+        if matrix is None:
+            matrix = np.empty((0, dim), dtype=np.float32)
+        elif not normalized:
+            matrix = normalize(matrix)
+        # Con ``normalized`` la matriz se usa tal cual (p. ej. una vista mmap)
+        if len(ids) != len(matrix):
+            raise ValueError("Debe haber un user_id por fila de la matriz")
+        self._snapshot = (matrix, ids)
+        self._rows = dict(zip(ids.tolist(), range(len(ids))))
+
+    def __len__(self):
+        return len(self._snapshot[1])
+
+    def __contains__(self, user_id):
+        return user_id in self._rows
+
+    def upsert(self, user_id, vector):
+        """Agrega o reemplaza el vector de ``user_id``."""
+        vector = normalize(vector)
+        with self._lock:
+            matrix, ids = self._snapshot
+            row = self._rows.get(user_id)
+            if row is None:
+                matrix = np.vstack([matrix, vector[None, :]])
+                ids = np.append(ids, np.int64(user_id))
+                self._rows[user_id] = len(ids) - 1
+            else:
+                matrix = matrix.copy()
+                matrix[row] = vector
+            self._snapshot = (matrix, ids)
+
+    def remove(self, user_id):
+        """Quita a ``user_id`` del índice si estaba enrolado."""
+        with self._lock:
+            row = self._rows.pop(user_id, None)
+            if row is None:
+                return
+            matrix, ids = self._snapshot
+            matrix, ids = np.delete(matrix, row, axis=0), np.delete(ids, row)
+            self._rows = {int(uid): i for i, uid in enumerate(ids)}
+            self._snapshot = (matrix, ids)
+
+    def search(self, vector, k=1):
+        """Los ``k`` usuarios más parecidos: lista de ``(user_id, similitud)``."""
+        matrix, ids = self._snapshot
+        if not len(ids):
+            return []
+        scores = matrix @ normalize(vector)
+        k = min(k, len(ids))
+        if k == 1:
+            best = np.array([int(np.argmax(scores))])
+        else:
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best])]
+        return [(int(ids[i]), float(scores[i])) for i in best]
+
+    def match(self, vector, threshold):
+        """``(user_id, similitud)`` del mejor candidato, o ``(None, similitud)`` si no supera el umbral."""
+        results = self.search(vector, 1)
+        if not results:
+            return None, 0.0
+        user_id, score = results[0]
+        return (user_id if score >= threshold else None), score
+
+
+class FaceRecognizer:
+    """
+    Identifica al rostro de un stream por votación entre varias muestras.
+
+    ``observe`` se llama con cada frame mientras la persona está quieta; se
+    toma una muestra cada ``interval`` frames hasta reunir ``samples``.
+    ``identity()`` devuelve el usuario que obtuvo la mayoría de los votos.
+    """
+
+    def __init__(self, index, embedder, threshold=None, samples=5, interval=3, mode="identify"):
+        self.index = index
+        self.embedder = embedder
+        self.threshold = embedder.default_threshold if threshold is None else threshold
+        self.samples = samples
+        self.interval = interval
+        self.mode = mode
+        self.reset()
+
+    def reset(self):
+        self.votes = []
+        self._frames = 0
+
+    def observe(self, frame, box):
+        if len(self.votes) >= self.samples:
+            return
+        self._frames += 1
+        if (self._frames - 1) % self.interval:
+            return
+        face = crop_face(frame, box)
+        if face is None:
+            return
+        user_id, score = self.index.match(self.embedder.embed(face), self.threshold)
+        self.votes.append((user_id, score))
+
+    def identity(self):
+        """Usuario reconocido por mayoría, o None si no hay acuerdo."""
+        if not self.votes:
+            return None
+        user_id, count = Counter(uid for uid, _ in self.votes).most_common(1)[0]
+        return user_id if user_id is not None and count * 2 > len(self.votes) else None
+
+
+# --- Enrolamiento ---
+
+def largest_face(image, detector):
+    """Recuadro en píxeles del rostro más grande de ``image``, o None."""
+    detections = detector.detect(image)
+    if not detections:
+        return None
+    boxes = [box_to_pixels(d, image.shape) for d in detections]
+    return max(boxes, key=lambda b: b[2] * b[3])
+
+
+def embed_image(image, detector, embedder):
+    """Vector del rostro más grande de ``image``, o None si no hay rostro."""
+    box = largest_face(image, detector)
+    if box is None:
+        return None
+    face = crop_face(image, box)
+    return embedder.embed(face) if face is not None else None
+
+
+def read_photo(field):
+    """Decodifica una imagen de un ``ImageField``; None si no se puede leer."""
+    if not field:
+        return None
+    try:
+        with field.open('rb') as photo:
+            data = np.frombuffer(photo.read(), dtype=np.uint8)
+    except (OSError, ValueError):
+        return None
+    return cv2.imdecode(data, cv2.IMREAD_COLOR) if data.size else None
+
+
+def enroll_user(user, detector, embedder):
+    """
+    Calcula y guarda el vector de la foto de perfil de ``user``.
+
+    Devuelve el ``FaceEmbedding`` o None si la foto no existe o no tiene un
+    rostro detectable. El almacén de vectores se actualiza en el momento
+    (solo la fila de ``user``).
+    """
+    profile = getattr(user, 'profile', None)
+    image = read_photo(profile.foto_perfil) if profile is not None else None
+    vector = embed_image(image, detector, embedder) if image is not None else None
+    if vector is None:
+        return None
+    embedding, _ = FaceEmbedding.objects.update_or_create(
+        user=user, defaults={
+            'vector': vector.astype(np.float32).tobytes(),
+            'modelo': embedder.name,
+            'foto': profile.foto_perfil.name,
+        },
+    )
+    get_embedding_store(embedder).upsert(user.pk, vector)
+    return embedding
+
+
+def load_index(modelo, dim):
+    """Construye el índice con los vectores de ``modelo`` guardados en la base de datos."""
+    rows = list(FaceEmbedding.objects.filter(modelo=modelo).values_list('user_id', 'vector'))
+    if not rows:
+        return EmbeddingIndex(dim)
+    matrix = np.stack([np.frombuffer(bytes(vector), dtype=np.float32) for _, vector in rows])
+    return EmbeddingIndex(dim, [user_id for user_id, _ in rows], matrix)
+
+
+def rebuild_store(store, modelo):
+    """Reescribe ``store`` con los vectores de ``modelo`` guardados en la base de datos."""
+    matrix, ids = load_index(modelo, store.dim)._snapshot
+    store.write_all(ids, matrix)
+    return len(ids)
+
+
+# --- Almacén persistente ---
+
+class EmbeddingStore:
+    """
+    Vectores enrolados en disco, para no recalcularlos al arrancar.
+
+    ``<modelo>.npy`` guarda la matriz ``(capacidad, dim)`` y
+    ``<modelo>.ids.npy`` el ``user_id`` de cada fila (-1 = fila libre). Las
+    filas ocupadas son siempre las primeras, así el índice es una vista de
+    la matriz mapeada en memoria, sin copiarla ni decodificar fotos.
+
+    Cambiar el vector de un usuario escribe solo su fila en el mapeo
+    compartido, de modo que los demás procesos la ven al instante. Las altas
+    y bajas cambian la lista de ids; los índices lo detectan con
+    ``version()`` y vuelven a mapear los archivos. Al llenarse, la capacidad
+    se duplica escribiendo archivos nuevos que reemplazan a los anteriores.
+    """
+
+    def __init__(self, directory, modelo, dim):
+        self.directory = str(directory)
+        self.dim = dim
+        self.matrix_path = os.path.join(self.directory, f"{modelo}.npy")
+        self.ids_path = os.path.join(self.directory, f"{modelo}.ids.npy")
+        self._lock_path = os.path.join(self.directory, f"{modelo}.lock")
+        self._thread_lock = threading.Lock()
+
+    def exists(self):
+        return os.path.exists(self.matrix_path) and os.path.exists(self.ids_path)
+
+    def version(self):
+        """Cambia cada vez que cambia la lista de usuarios del almacén."""
+        try:
+            stat = os.stat(self.ids_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    @contextmanager
+    def _locked(self):
+        """Exclusión entre hilos y, con ``fcntl``, entre procesos."""
+        os.makedirs(self.directory, exist_ok=True)
+        with self._thread_lock, open(self._lock_path, 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def load(self):
+        """``EmbeddingIndex`` sobre los archivos mapeados, o None si no son válidos."""
+        if not self.exists():
+            return None
+        matrix = np.load(self.matrix_path, mmap_mode='r')
+        ids = np.load(self.ids_path, mmap_mode='r')
+        if matrix.ndim != 2 or matrix.shape[1] != self.dim or len(matrix) != len(ids):
+            # Otro modelo, o se está reemplazando la capacidad: se reintenta luego
+            return None
+        count = int(np.count_nonzero(ids >= 0))
+        return EmbeddingIndex(self.dim, ids[:count], matrix[:count], normalized=True)
+
+    def write_all(self, user_ids, matrix):
+        """Reemplaza el contenido del almacén (p. ej. desde ``FaceEmbedding``)."""
+        with self._locked():
+            self._write_locked(np.asarray(user_ids, dtype=np.int64), normalize(matrix).reshape(-1, self.dim))
+
+    def _write_locked(self, ids, matrix, capacity=None):
+        capacity = max(capacity or 0, 16, len(ids))
+        full_ids = np.full(capacity, -1, dtype=np.int64)
+        full_ids[:len(ids)] = ids
+        full_matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+        full_matrix[:len(matrix)] = matrix
+        # Archivos nuevos + rename: quien tenga mapeados los anteriores no ve
+        # un archivo a medio escribir. La matriz se reemplaza antes que los ids.
+        for path, array in ((self.matrix_path, full_matrix), (self.ids_path, full_ids)):
+            tmp = f"{path}.tmp.npy"
+            np.save(tmp, array)
+            os.replace(tmp, path)
+
+    def upsert(self, user_id, vector):
+        """Escribe el vector de ``user_id`` en su fila (o en una fila libre)."""
+        vector = normalize(vector)
+        with self._locked():
+            if not self.exists():
+                self._write_locked(np.array([user_id]), vector[None, :])
+                return
+            ids = np.load(self.ids_path, mmap_mode='r+')
+            rows = np.flatnonzero(ids == user_id)
+            count = int(np.count_nonzero(ids >= 0))
+            if len(rows):
+                matrix = np.load(self.matrix_path, mmap_mode='r+')
+                matrix[rows[0]] = vector
+                matrix.flush()
+            elif count < len(ids):
+                matrix = np.load(self.matrix_path, mmap_mode='r+')
+                matrix[count] = vector
+                matrix.flush()
+                ids[count] = user_id
+                ids.flush()
+                self._touch()
+            else:
+                matrix = np.load(self.matrix_path, mmap_mode='r')
+                self._write_locked(np.append(ids[:count], user_id),
+                                   np.vstack([matrix[:count], vector[None, :]]), capacity=2 * len(ids))
+
+    def remove(self, user_id):
+        """Libera la fila de ``user_id``; la última fila ocupada ocupa su lugar."""
+        if not self.exists():
+            return
+        with self._locked():
+            ids = np.load(self.ids_path, mmap_mode='r+')
+            rows = np.flatnonzero(ids == user_id)
+            if not len(rows):
+                return
+            matrix = np.load(self.matrix_path, mmap_mode='r+')
+            last = int(np.count_nonzero(ids >= 0)) - 1
+            row = int(rows[0])
+            matrix[row] = matrix[last]
+            ids[row] = ids[last]
+            matrix[last] = 0
+            ids[last] = -1
+            matrix.flush()
+            ids.flush()
+            self._touch()
+
+    def _touch(self):
+        # Los cambios por mmap no siempre actualizan la fecha del archivo
+        os.utime(self.ids_path)
+
+
+class StoredFaceIndex:
+    """
+    Índice de búsqueda respaldado por un ``EmbeddingStore``.
+
+    Revisa como mucho cada ``check_interval`` segundos si el almacén cambió
+    (altas y bajas de otros procesos) y, en ese caso, vuelve a mapearlo.
+    Si el almacén no existe se construye una vez desde ``FaceEmbedding``.
+    """
+
+    def __init__(self, store, modelo, check_interval=1.0):
+        self.store = store
+        self.modelo = modelo
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._index = None
+        self._version = None
+        self._checked = 0.0
+
+    @property
+    def dim(self):
+        return self.store.dim
+
+    def current(self):
+        """``EmbeddingIndex`` vigente."""
+        now = time.monotonic()
+        if self._index is not None and now - self._checked < self.check_interval:
+            return self._index
+        with self._lock:
+            self._checked = now
+            version = self.store.version()
+            if self._index is None or version != self._version:
+                index = self.store.load()
+                if index is None and not self.store.exists():
+                    # Primer arranque: se vuelca la tabla y se mapea
+                    rebuild_store(self.store, self.modelo)
+                    version, index = self.store.version(), self.store.load()
+                if index is not None:
+                    self._index, self._version = index, version
+                    logger.info("Índice de rostros mapeado: %d usuarios", len(index))
+                elif self._index is None:
+                    self._index = EmbeddingIndex(self.store.dim)
+            return self._index
+
+    def __len__(self):
+        return len(self.current())
+
+    def __contains__(self, user_id):
+        return user_id in self.current()
+
+    def search(self, vector, k=1):
+        return self.current().search(vector, k)
+
+    def match(self, vector, threshold):
+        return self.current().match(vector, threshold)
+
+
+_embedder = None
+_stores = {}
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_embedder():
+    """Modelo de embedding configurado en settings, compartido por el proceso."""
+    global _embedder
+    with _index_lock:
+        if _embedder is None:
+            from django.conf import settings
+
+            _embedder = build_embedder(
+                getattr(settings, 'FACE_EMBEDDER_BACKEND', 'sface'),
+                getattr(settings, 'FACE_EMBEDDER_MODEL_PATH', None),
+            )
+        return _embedder
+
+
+def get_embedding_store(embedder):
+    """Almacén en disco de los vectores de ``embedder`` (``FACE_EMBEDDINGS_DIR``)."""
+    from django.conf import settings
+
+    directory = str(getattr(settings, 'FACE_EMBEDDINGS_DIR', os.path.join(settings.BASE_DIR, 'embeddings')))
+    key = (directory, embedder.name, embedder.dim)
+    with _index_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = EmbeddingStore(directory, embedder.name, embedder.dim)
+        return store
+
+
+def get_face_index():
+    """Índice de los usuarios enrolados con el modelo configurado, mapeado desde disco."""
+    global _index
+    embedder = get_embedder()
+    store = get_embedding_store(embedder)
+    with _index_lock:
+        if _index is None or _index.store is not store:
+            _index = StoredFaceIndex(store, embedder.name)
+        return _index
+
+
+_detector = None
+_enrollment_lock = threading.Lock()
+
+
+def _enrollment_detector():
+    """Detector para las fotos de perfil, creado al primer enrolamiento."""
+    global _detector
+    with _enrollment_lock:
+        if _detector is None:
+            from .inference import detector_factory_from_settings
+
+            _detector = detector_factory_from_settings()()
+        return _detector
+
+
+def refresh_profile(profile):
+    """
+    Recalcula el vector de ``profile`` si cambió su foto de perfil.
+
+    Lo llama la señal ``post_save`` de ``UserProfile``; solo toca la fila de
+    ese usuario en la base de datos y en el almacén.
+    """
+    embedder = get_embedder()
+    existing = FaceEmbedding.objects.filter(user_id=profile.user_id).first()
+    photo = profile.foto_perfil.name if profile.foto_perfil else ''
+    if existing is not None and existing.foto == photo and existing.modelo == embedder.name:
+        return existing
+    if photo:
+        detector = _enrollment_detector()
+        with _enrollment_lock:
+            embedding = enroll_user(profile.user, detector, embedder)
+        if embedding is not None:
+            return embedding
+    # Sin foto, o la nueva no tiene un rostro detectable: el vector de la foto
+    # anterior ya no representa al usuario
+    if existing is not None:
+        existing.delete()
+    get_embedding_store(embedder).remove(profile.user_id)
+    return None
+
+
+def discard_embedding(user_id):
+    """Quita a ``user_id`` del almacén (su ``FaceEmbedding`` fue borrado)."""
+    try:
+        store = get_embedding_store(get_embedder())
+    except ValueError:
+        # Sin modelo de embedding configurado no hay almacén que actualizar
+        return
+    store.remove(user_id)
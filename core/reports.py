@@ -0,0 +1,187 @@
+"""
+Reportes de asistencia calculados en la base de datos.
+
+Tres vistas sobre un rango de fechas:
+
+- ``records``: registros individuales, del más reciente al más antiguo.
+- ``daily``: asistencias por día (``COUNT`` agrupado por ``fecha``).
+- ``users``: asistencias por usuario, con el primer y último día.
+
+Las agregaciones usan ``Asistencia.fecha``, la fecha local ya
+desnormalizada e indexada (``asistencia_fecha_user_idx``), en lugar de
+truncar ``fecha_hora`` fila por fila con ``TruncDate``: el resultado es el
+mismo y el rango se resuelve con el índice.
+
+La paginación es por cursor (keyset): cada página devuelve un cursor
+opaco con la última clave vista y la siguiente empieza con ``WHERE clave <
+cursor``. A diferencia de ``OFFSET``, pedir la página 200 cuesta lo mismo
+que pedir la primera y no se repiten ni saltan filas si entran registros
+nuevos mientras se pagina. Los registros se recorren con los índices
+``(user, -fecha_hora)`` y ``(-fecha_hora, -id)``, sin ordenar el rango.
+"""
+import base64
+import datetime
+import json
+
+from django.db.models import Count, Max, Min, Q
+from django.utils import dateformat, timezone
+
+from .models import Asistencia
+
+REPORT_VIEWS = ("records", "daily", "users")
+DEFAULT_DAYS = 30
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+# Un año de rango como máximo por consulta
+MAX_DAYS = 366
+
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Cursor inválido")
+
+
+def _parse_date(value, name):
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"'{name}' debe tener el formato AAAA-MM-DD")
+
+
+def date_range(params, today=None):
+    """
+    ``(desde, hasta)`` inclusivos a partir de ``start``/``end`` o ``days``.
+
+    Sin parámetros, los últimos ``DEFAULT_DAYS`` días. Lanza ValueError si
+    el rango es inválido o supera ``MAX_DAYS``.
+    """
+    today = today or timezone.localdate()
+    end = _parse_date(params['end'], 'end') if params.get('end') else today
+    if params.get('start'):
+        start = _parse_date(params['start'], 'start')
+    else:
+        try:
+            days = int(params.get('days') or DEFAULT_DAYS)
+        except ValueError:
+            raise ValueError("'days' debe ser un número")
+        if days < 1:
+            raise ValueError("'days' debe ser mayor que 0")
+        start = end - datetime.timedelta(days=days - 1)
+    if start > end:
+        raise ValueError("'start' no puede ser posterior a 'end'")
+    if (end - start).days >= MAX_DAYS:
+        raise ValueError(f"El rango no puede superar {MAX_DAYS} días")
+    return start, end
+
+
+def parse_limit(value):
+    try:
+        limit = int(value or DEFAULT_LIMIT)
+    except ValueError:
+        raise ValueError("'limit' debe ser un número")
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def _page(rows, limit, key):
+    """Corta ``rows`` (se pidió ``limit + 1``) y calcula el cursor siguiente."""
+    rows = list(rows)
+    has_next = len(rows) > limit
+    rows = rows[:limit]
+    return rows, (encode_cursor(key(rows[-1])) if has_next else None)
+
+
+def records(queryset, cursor=None, limit=DEFAULT_LIMIT):
+    """Registros de ``queryset`` por ``(-fecha_hora, -id)``."""
+    queryset = queryset.order_by('-fecha_hora', '-id')
+    if cursor:
+        moment, pk = decode_cursor(cursor)
+        moment = datetime.datetime.fromisoformat(moment)
+        queryset = queryset.filter(Q(fecha_hora__lt=moment) | Q(fecha_hora=moment, id__lt=pk))
+    rows = queryset.values('id', 'fecha_hora', 'user__username')[:limit + 1]
+    rows, next_cursor = _page(rows, limit, lambda row: [row['fecha_hora'].isoformat(), row['id']])
+    results = []
+    for row in rows:
+        local = timezone.localtime(row['fecha_hora'])
+        results.append({
+            'id': row['id'],
+            'username': row['user__username'],
+            'date': dateformat.format(local, 'd-m-Y'),
+            'time': dateformat.format(local, 'H:i:s'),
+            'weekday': dateformat.format(local, 'l'),
+        })
+    return results, next_cursor
+
+
+def daily(queryset, cursor=None, limit=DEFAULT_LIMIT):
+    """Asistencias y usuarios distintos por día, del más reciente al más antiguo."""
+    if cursor:
+        queryset = queryset.filter(fecha__lt=_parse_date(decode_cursor(cursor), 'cursor'))
+    rows = (queryset.order_by().values('fecha')
+            .annotate(attendances=Count('id'), users=Count('user', distinct=True))
+            .order_by('-fecha')[:limit + 1])
+    rows, next_cursor = _page(rows, limit, lambda row: row['fecha'].isoformat())
+    return [
+        {'date': row['fecha'].isoformat(), 'attendances': row['attendances'], 'users': row['users']}
+        for row in rows
+    ], next_cursor
+
+
+def per_user(queryset, cursor=None, limit=DEFAULT_LIMIT):
+    """Asistencias de cada usuario en el rango, por ``user_id``."""
+    if cursor:
+        queryset = queryset.filter(user_id__gt=int(decode_cursor(cursor)))
+    rows = (queryset.order_by().values('user_id', 'user__username')
+            .annotate(attendances=Count('id'), first=Min('fecha'), last=Max('fecha'))
+            .order_by('user_id')[:limit + 1])
+    rows, next_cursor = _page(rows, limit, lambda row: row['user_id'])
+    return [
+        {
+            'user_id': row['user_id'],
+            'username': row['user__username'],
+            'attendances': row['attendances'],
+            'first': row['first'].isoformat(),
+            'last': row['last'].isoformat(),
+        }
+        for row in rows
+    ], next_cursor
+
+
+def attendance_report(params, user=None):
+    """
+    Reporte pedido en ``params`` (querystring) como dict serializable.
+
+    ``user`` restringe el reporte a sus registros (usuarios que no son
+    staff). Lanza ValueError con un mensaje para el cliente si algún
+    parámetro es inválido.
+    """
+    view = params.get('view') or 'records'
+    if view not in REPORT_VIEWS:
+        raise ValueError(f"'view' debe ser uno de: {', '.join(REPORT_VIEWS)}")
+    start, end = date_range(params)
+    limit = parse_limit(params.get('limit'))
+
+    queryset = Asistencia.objects.filter(fecha__range=(start, end))
+    if user is not None:
+        queryset = queryset.filter(user=user)
+    elif params.get('user'):
+        queryset = queryset.filter(user__username=params['user'])
+
+    build = {'records': records, 'daily': daily, 'users': per_user}[view]
+    try:
+        results, next_cursor = build(queryset, params.get('cursor'), limit)
+    except (TypeError, ValueError, IndexError):
+        raise ValueError("Cursor inválido")
+    return {
+        'view': view,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'results': results,
+        'next': next_cursor,
+    }
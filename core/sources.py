@@ -0,0 +1,217 @@
+"""
+Fuentes de frames para el servicio de captura.
+
+``open_source(source, ...)`` devuelve un objeto con la interfaz de
+``cv2.VideoCapture`` que usa ``CameraService`` (``isOpened()``, ``read()``,
+``release()``). ``source`` puede ser:
+
+- un índice de dispositivo local (``0`` o ``"0"``),
+- una URL de red (``rtsp://``, ``http://``...),
+- un archivo de video,
+- un directorio de imágenes (se reproducen en orden alfabético),
+- ``"synthetic"`` o ``"synthetic:640x480"``: frames generados, sin hardware.
+
+Los archivos, directorios y frames sintéticos se entregan al ritmo de
+``fps`` (como una cámara real) y, con ``loop``, vuelven a empezar al
+terminar. En dispositivos y URLs se pide la resolución y los fps al driver
+y un buffer de un solo frame para no entregar frames atrasados.
+"""
+import os
+import time
+
+import cv2
+import numpy as np
+
+SOURCE_KINDS = ("device", "url", "file", "directory", "synthetic")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+# fps al reproducir archivos o directorios que no informan el suyo
+DEFAULT_FPS = 30.0
+
+
+def source_kind(source):
+    """Clasifica la especificación de una fuente en uno de ``SOURCE_KINDS``."""
+    if isinstance(source, int) or (isinstance(source, str) and source.isdigit()):
+        return "device"
+    source = str(source)
+    if source == "synthetic" or source.startswith("synthetic:"):
+        return "synthetic"
+    if "://" in source:
+        return "url"
+    if os.path.isdir(source):
+        return "directory"
+    return "file"
+
+
+class Pacer:
+    """Espera lo necesario para entregar frames a ``fps`` (0/None = sin límite)."""
+
+    def __init__(self, fps):
+        self.interval = 1.0 / fps if fps else 0.0
+        self._deadline = None
+
+    def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if self._deadline is None or self._deadline < now - self.interval:
+            # Primer frame, o el consumidor se atrasó: no se recupera a ráfagas
+            self._deadline = now
+        elif self._deadline > now:
+            time.sleep(self._deadline - now)
+        self._deadline += self.interval
+
+
+def _resize(frame, width, height):
+    """Ajusta ``frame`` a ``width``/``height`` (si solo se da uno, conserva el aspecto)."""
+    if not width and not height:
+        return frame
+    h, w = frame.shape[:2]
+    width = width or round(w * height / h)
+    height = height or round(h * width / w)
+    if (w, h) == (width, height):
+        return frame
+    return cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+
+
+class VideoFileCapture:
+    """Video local reproducido a su velocidad nominal, opcionalmente en bucle."""
+
+    def __init__(self, path, width=None, height=None, fps=None, loop=True):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.loop = loop
+        self._cap = cv2.VideoCapture(path)
+        native = self._cap.get(cv2.CAP_PROP_FPS) if self._cap.isOpened() else 0
+        self._pacer = Pacer(fps or native or DEFAULT_FPS)
+
+    def isOpened(self):
+        return self._cap.isOpened()
+
+    def read(self):
+        success, frame = self._cap.read()
+        if not success and self.loop:
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            success, frame = self._cap.read()
+        if not success:
+            return False, None
+        self._pacer.wait()
+        return True, _resize(frame, self.width, self.height)
+
+    def release(self):
+        self._cap.release()
+
+
+class ImageDirectoryCapture:
+    """Imágenes de un directorio, en orden alfabético, como si fueran un video."""
+
+    def __init__(self, path, width=None, height=None, fps=None, loop=True):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.loop = loop
+        self.files = sorted(
+            os.path.join(path, name) for name in os.listdir(path)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        self._index = 0
+        self._pacer = Pacer(fps or DEFAULT_FPS)
+
+    def isOpened(self):
+        return bool(self.files)
+
+    def read(self):
+        # Las imágenes ilegibles se saltan; si ninguna se puede leer, termina
+        for _ in range(len(self.files)):
+            if self._index >= len(self.files):
+                if not self.loop:
+                    return False, None
+                self._index = 0
+            frame = cv2.imread(self.files[self._index])
+            self._index += 1
+            if frame is not None:
+                self._pacer.wait()
+                return True, _resize(frame, self.width, self.height)
+        return False, None
+
+    def release(self):
+        self.files = []
+
+
+class SyntheticCapture:
+    """
+    Frames generados: un gradiente con una elipse clara que se desplaza.
+
+    Sirve para probar el stream y medir rendimiento en equipos sin cámara;
+    ``frames`` limita la cantidad (None = infinitos).
+    """
+
+    def __init__(self, width=640, height=480, fps=None, frames=None):
+        self.width = width
+        self.height = height
+        self.frames = frames
+        self._count = 0
+        self._pacer = Pacer(fps or DEFAULT_FPS)
+        self._base = np.empty((height, width, 3), dtype=np.uint8)
+        self._base[...] = np.linspace(40, 200, width, dtype=np.uint8)[None, :, None]
+        self._open = True
+
+    def isOpened(self):
+        return self._open
+
+    def read(self):
+        if not self._open or (self.frames is not None and self._count >= self.frames):
+            return False, None
+        frame = self._base.copy()
+        # La elipse recorre el frame de lado a lado, como un rostro en movimiento
+        span = max(1, self.width // 2)
+        x = self.width // 4 + abs(self._count * 4 % (2 * span) - span)
+        center = (min(x, self.width - 1), self.height // 2)
+        axes = (max(1, self.width // 10), max(1, self.height // 6))
+        cv2.ellipse(frame, center, axes, 0, 0, 360, (180, 200, 230), -1)
+        self._count += 1
+        self._pacer.wait()
+        return True, frame
+
+    def release(self):
+        self._open = False
+
+
+def _open_device(source, width, height, fps, buffer_size):
+    cap = cv2.VideoCapture(source)
+    if cap.isOpened():
+        # Son pedidos al driver: si no los admite se queda con sus valores
+        if width:
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        if height:
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        if fps:
+            cap.set(cv2.CAP_PROP_FPS, fps)
+        if buffer_size:
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, buffer_size)
+    return cap
+
+
+def open_source(source=0, width=None, height=None, fps=None, buffer_size=1, loop=True):
+    """
+    Abre ``source`` y devuelve un objeto compatible con ``cv2.VideoCapture``.
+
+    Si la fuente no se puede abrir, ``isOpened()`` devuelve False.
+    """
+    kind = source_kind(source)
+    if kind == "device":
+        return _open_device(int(source), width, height, fps, buffer_size)
+    if kind == "url":
+        return _open_device(source, width, height, fps, buffer_size)
+    if kind == "directory":
+        return ImageDirectoryCapture(source, width, height, fps, loop)
+    if kind == "synthetic":
+        size = source.partition(":")[2]
+        if size:
+            try:
+                width, height = (int(v) for v in size.lower().split("x"))
+            except ValueError:
+                raise ValueError(f"Tamaño sintético inválido: {source!r} (use 'synthetic:640x480')")
+        return SyntheticCapture(width or 640, height or 480, fps)
+    return VideoFileCapture(source, width, height, fps, loop)
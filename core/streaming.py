@@ -0,0 +1,249 @@
+"""
+Control adaptativo del stream de video.
+
+Un enlace lento no rechaza los frames: se acumulan en los buffers del socket
+y la vista previa del kiosco se va retrasando. ``AdaptiveStreamController``
+mide cuánto tarda en enviarse cada frame (el generador queda bloqueado en el
+``yield`` mientras el servidor escribe en el socket) y, si el envío ocupa una
+parte importante del intervalo entre frames, baja un nivel: primero la
+calidad JPEG, luego la resolución y por último los frames por segundo.
+Cuando el envío vuelve a ser holgado durante un tiempo, sube de nivel.
+
+Los parámetros ``?fps=&q=&w=`` de ``/video_feed/`` fijan el techo de cada
+dimensión; el control nunca lo supera.
+
+``FrameDiffGate`` evita recodificar y reenviar frames casi idénticos (fondo
+estático y rostro quieto, como en el paso "quédate quieto"): compara una
+miniatura en escala de grises con la del último frame enviado y solo deja
+pasar los que cambian, más un frame de keep-alive cada cierto tiempo.
+"""
+import threading
+import time
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+# Un nivel de la escalera de calidad; ``scale`` es relativo al ancho máximo
+StreamLevel = namedtuple("StreamLevel", "fps quality scale")
+
+# Rangos admitidos en los parámetros de la URL
+FPS_RANGE = (1, 60)
+QUALITY_RANGE = (10, 95)
+MIN_WIDTH = 160
+
+
+def _clamp(value, low, high):
+    return max(low, min(high, value))
+
+
+def parse_limits(params, max_fps=30, max_quality=80, max_width=None):
+    """
+    Lee los techos ``fps``, ``q`` y ``w`` de los parámetros de la petición.
+
+    Los valores ausentes o inválidos toman los de la configuración; el
+    visor solo puede bajar los techos configurados, nunca superarlos, y el
+    resto se limita a rangos razonables. Devuelve ``(fps, quality, width)``;
+    ``width`` es None si se usa la resolución de la cámara.
+    """
+    def read(name, default):
+        try:
+            return int(params.get(name, default))
+        except (TypeError, ValueError):
+            return default
+
+    fps = _clamp(min(max_fps, read('fps', max_fps)), *FPS_RANGE)
+    quality = _clamp(min(max_quality, read('q', max_quality)), *QUALITY_RANGE)
+    width = read('w', max_width)
+    if width is not None:
+        if max_width is not None:
+            width = min(max_width, width)
+        width = max(MIN_WIDTH, width)
+    return fps, quality, width
+
+
+def build_levels(max_fps, max_quality, min_fps=2, min_quality=30):
+    """
+    Escalera de niveles del mejor al peor.
+
+    Se degrada primero la calidad (lo menos visible), después la resolución
+    y al final la fluidez.
+    """
+    qualities = [max_quality] + [max(min_quality, round(max_quality * f)) for f in (0.75, 0.55)]
+    scales = [1.0, 0.75, 0.5]
+    rates = [max_fps] + [max(min_fps, max_fps // d) for d in (2, 4)]
+
+    levels = [StreamLevel(max_fps, q, 1.0) for q in qualities]
+    levels += [StreamLevel(max_fps, qualities[-1], s) for s in scales[1:]]
+    levels += [StreamLevel(f, qualities[-1], scales[-1]) for f in rates[1:]]
+    unique = []
+    for level in levels:
+        if level not in unique:
+            unique.append(level)
+    return unique
+
+
+class FrameScaler:
+    """Reduce frames a un ancho dado reutilizando el buffer de salida."""
+
+    def __init__(self):
+        self._buffer = None
+
+    def resize(self, frame, width):
+        ih, iw = frame.shape[:2]
+        if width >= iw:
+            return frame
+        size = (width, max(1, round(ih * width / iw)))
+        if self._buffer is None or self._buffer.shape[:2] != (size[1], size[0]):
+            self._buffer = np.empty((size[1], size[0], 3), dtype=np.uint8)
+        # El frame escalado se codifica de inmediato, así que un buffer basta
+        return cv2.resize(frame, size, dst=self._buffer, interpolation=cv2.INTER_AREA)
+
+
+class AdaptiveStreamController:
+    """
+    Ajusta fps, calidad y resolución según la contrapresión del envío.
+
+    ``admit()`` y ``prepare()`` se llaman desde la etapa de codificación;
+    ``record_send()`` desde el generador que entrega los frames al servidor.
+    """
+
+    # Fracción del intervalo entre frames bloqueada en el envío que se
+    # considera congestión, y la que se considera holgura
+    CONGESTED = 0.5
+    RELAXED = 0.15
+    # Frames holgados seguidos antes de subir un nivel
+    RECOVER_FRAMES = 30
+    # Frames que se esperan tras un cambio antes de volver a evaluar
+    HOLD_FRAMES = 5
+    SMOOTHING = 0.3
+
+    def __init__(self, max_fps=30, max_quality=80, max_width=None):
+        self.max_width = max_width
+        self.levels = build_levels(max_fps, max_quality)
+        self.level = 0
+        self.changes = 0
+        self.sent = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+        self._send_ewma = 0.0
+        self._bytes_ewma = 0.0
+        self._relaxed = 0
+        self._hold = 0
+        self._next_due = 0.0
+        self._scaler = FrameScaler()
+
+    @property
+    def current(self):
+        return self.levels[self.level]
+
+    def admit(self, now=None):
+        """Indica si el siguiente frame debe enviarse según los fps del nivel."""
+        now = time.monotonic() if now is None else now
+        interval = 1.0 / self.current.fps
+        # Tolerancia de un cuarto de intervalo para el jitter de la cámara
+        if now < self._next_due - interval * 0.25:
+            self.skipped += 1
+            return False
+        self._next_due = max(self._next_due, now - interval / 2) + interval
+        return True
+
+    def prepare(self, frame, encoder):
+        """Escala el frame y fija la calidad del codificador para el nivel actual."""
+        level = self.current
+        encoder.quality = level.quality
+        base = frame.shape[1] if self.max_width is None else min(self.max_width, frame.shape[1])
+        width = max(MIN_WIDTH, int(base * level.scale))
+        return self._scaler.resize(frame, width)
+
+    def record_send(self, seconds, nbytes):
+        """Registra lo que tardó en enviarse un frame y ajusta el nivel."""
+        with self._lock:
+            self.sent += 1
+            self._send_ewma += self.SMOOTHING * (seconds - self._send_ewma)
+            self._bytes_ewma += self.SMOOTHING * (nbytes - self._bytes_ewma)
+            if self._hold:
+                self._hold -= 1
+                return
+            ratio = self._send_ewma * self.current.fps
+            if ratio > self.CONGESTED and self.level < len(self.levels) - 1:
+                self._change(self.level + 1)
+            elif ratio < self.RELAXED and self.level > 0:
+                self._relaxed += 1
+                if self._relaxed >= self.RECOVER_FRAMES:
+                    self._change(self.level - 1)
+            else:
+                self._relaxed = 0
+
+    def _change(self, level):
+        self.level = level
+        self.changes += 1
+        self._relaxed = 0
+        self._hold = self.HOLD_FRAMES
+
+    def snapshot(self):
+        level = self.current
+        return {
+            "level": self.level,
+            "fps": level.fps,
+            "quality": level.quality,
+            "scale": level.scale,
+            "send_ms": round(self._send_ewma * 1000, 2),
+            "kb_per_frame": round(self._bytes_ewma / 1024, 1),
+            "sent": self.sent,
+            "skipped": self.skipped,
+            "changes": self.changes,
+        }
+
+
+class FrameDiffGate:
+    """
+    Descarta frames sin cambios apreciables respecto al último enviado.
+
+    La diferencia es el promedio de ``absdiff`` entre miniaturas en escala
+    de grises de ``size`` píxeles, lo que cuesta una fracción de lo que
+    cuesta codificar el frame y filtra el ruido del sensor. ``key``
+    identifica el estado del overlay: si cambia, el frame se envía aunque
+    la imagen sea casi igual. ``keepalive`` es el máximo de segundos entre
+    dos frames enviados.
+    """
+
+    def __init__(self, threshold=1.5, keepalive=0.5, size=(64, 48)):
+        self.threshold = threshold
+        self.keepalive = keepalive
+        self.size = size
+        self.passed = 0
+        self.gated = 0
+        self._small = np.empty((size[1], size[0], 3), dtype=np.uint8)
+        self._gray = np.empty((size[1], size[0]), dtype=np.uint8)
+        self._reference = np.empty_like(self._gray)
+        self._key = None
+        self._sent_at = None
+        self._last_diff = 0.0
+
+    def should_send(self, frame, key=None, now=None):
+        """Indica si ``frame`` debe enviarse; si es así pasa a ser la referencia."""
+        now = time.monotonic() if now is None else now
+        cv2.resize(frame, self.size, dst=self._small, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=self._gray)
+
+        if self._sent_at is not None and key == self._key and now - self._sent_at < self.keepalive:
+            self._last_diff = cv2.norm(self._gray, self._reference, cv2.NORM_L1) / self._gray.size
+            if self._last_diff < self.threshold:
+                self.gated += 1
+                return False
+
+        self._gray, self._reference = self._reference, self._gray
+        self._key = key
+        self._sent_at = now
+        self.passed += 1
+        return True
+
+    def snapshot(self):
+        total = self.passed + self.gated
+        return {
+            "passed": self.passed,
+            "gated": self.gated,
+            "gated_ratio": round(self.gated / total, 3) if total else 0.0,
+            "last_diff": round(self._last_diff, 2),
+        }
@@ -0,0 +1,40 @@
+"""
+Etiquetas de plantilla para las fotos de perfil.
+
+    {% load thumbnails %}
+    {% profile_picture user.profile 40 %}
+
+Genera un ``<picture>`` con las miniaturas en WebP y JPEG; el navegador
+elige la más chica que cubre ``size`` píxeles CSS (según la densidad de la
+pantalla). Sin miniaturas usa la foto original; sin foto no genera nada.
+"""
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from core.thumbnails import FORMATS, thumbnail_sources
+
+register = template.Library()
+
+
+def _srcset(sources):
+    return format_html_join(', ', '{} {}w', sources)
+
+
+@register.simple_tag
+def profile_picture(profile, size=40, css_class='', alt=''):
+    field = getattr(profile, 'foto_perfil', None)
+    if not field:
+        return ''
+    alt = alt or str(profile)
+    sources = thumbnail_sources(profile)
+    if not sources:
+        return format_html('<img src="{}" width="{}" height="{}" class="{}" alt="{}" loading="lazy">',
+                           field.url, size, size, css_class, alt)
+    # El último formato configurado (JPEG) es el respaldo del <img>
+    *preferred, (fallback_fmt, fallback) = sources.items()
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}px" width="{}" height="{}" class="{}" alt="{}" loading="lazy"></picture>',
+        format_html_join('', '<source type="{}" srcset="{}" sizes="{}px">',
+                         ((FORMATS[fmt][2], _srcset(urls), size) for fmt, urls in preferred)),
+        fallback[0][0], _srcset(fallback), size, size, size, css_class, alt,
+    )
@@ -0,0 +1,145 @@
+"""
+Miniaturas de las fotos de perfil.
+
+Cada foto subida se guarda tal cual; junto a ella se generan miniaturas
+cuadradas de ``PROFILE_THUMBNAIL_WIDTHS`` píxeles en cada formato de
+``PROFILE_THUMBNAIL_FORMATS``. El nombre lleva el ancho real de la
+miniatura, que es menor que el configurado si la foto es más chica:
+
+    fotos_perfil/ana.jpg
+    fotos_perfil/ana.64w.webp
+    fotos_perfil/ana.64w.jpg
+    ...
+
+Los anchos y formatos generados se anotan en ``UserProfile.miniaturas``
+junto con el nombre de la foto, así las páginas no consultan el storage.
+Usan ``{% profile_picture %}`` (``core.templatetags.thumbnails``), que
+ofrece las miniaturas con ``srcset`` para que el navegador descargue la
+más chica que alcance, en WebP si lo soporta. Las fotos que ya existían se
+procesan con ``python manage.py build_thumbnails``.
+"""
+import posixpath
+
+import cv2
+import numpy as np
+from django.conf import settings
+
+FORMATS = {
+    'webp': ('.webp', cv2.IMWRITE_WEBP_QUALITY, 'image/webp'),
+    'jpeg': ('.jpg', cv2.IMWRITE_JPEG_QUALITY, 'image/jpeg'),
+}
+
+
+def thumbnail_widths():
+    return tuple(sorted(getattr(settings, 'PROFILE_THUMBNAIL_WIDTHS', (64, 160, 320))))
+
+
+def thumbnail_formats():
+    return tuple(getattr(settings, 'PROFILE_THUMBNAIL_FORMATS', ('webp', 'jpeg')))
+
+
+def thumbnail_name(name, width, fmt):
+    """Nombre de la miniatura de ``name`` (mismo directorio que el original)."""
+    root, _ = posixpath.splitext(name)
+    return f"{root}.{width}w{FORMATS[fmt][0]}"
+
+
+def _square(image):
+    """Recorte cuadrado centrado (el rostro queda al centro de la foto)."""
+    h, w = image.shape[:2]
+    side = min(h, w)
+    y, x = (h - side) // 2, (w - side) // 2
+    return image[y:y + side, x:x + side]
+
+
+def render_thumbnails(image, widths=None, formats=None, quality=None):
+    """
+    Codifica las miniaturas de ``image`` (BGR).
+
+    Devuelve ``{(ancho, formato): bytes}`` con el ancho real de cada
+    miniatura. No se amplía la foto: los anchos mayores que ella se
+    generan una sola vez, con su tamaño original.
+    """
+    widths = widths or thumbnail_widths()
+    formats = formats or thumbnail_formats()
+    quality = quality or getattr(settings, 'PROFILE_THUMBNAIL_QUALITY', 80)
+    square = _square(image)
+    rendered = {}
+    for side in sorted({min(width, square.shape[0]) for width in widths}):
+        thumb = square if side == square.shape[0] else cv2.resize(
+            square, (side, side), interpolation=cv2.INTER_AREA)
+        for fmt in formats:
+            extension, flag, _ = FORMATS[fmt]
+            success, encoded = cv2.imencode(extension, thumb, [flag, quality])
+            if success:
+                rendered[side, fmt] = encoded.tobytes()
+    return rendered
+
+
+def save_thumbnails(storage, name, rendered):
+    """Guarda las miniaturas de ``render_thumbnails`` junto a ``name``, reemplazando las anteriores."""
+    from django.core.files.base import ContentFile
+
+    saved = []
+    for (width, fmt), data in rendered.items():
+        thumb = thumbnail_name(name, width, fmt)
+        if storage.exists(thumb):
+            storage.delete(thumb)
+        saved.append(storage.save(thumb, ContentFile(data)))
+    return saved
+
+
+def thumbnail_record(name, rendered):
+    """Valor de ``UserProfile.miniaturas`` para las miniaturas ``rendered`` de ``name``."""
+    return {
+        'foto': name,
+        'anchos': sorted({width for width, _ in rendered}),
+        # En el orden configurado: el último es el respaldo del <img>
+        'formatos': list(dict.fromkeys(fmt for _, fmt in rendered)),
+    }
+
+
+def has_thumbnails(profile):
+    """True si las miniaturas anotadas en ``profile`` son las de su foto actual."""
+    field = profile.foto_perfil
+    return bool(field) and bool(profile.miniaturas) and profile.miniaturas.get('foto') == field.name
+
+
+def build_thumbnails(profile):
+    """
+    Genera y guarda las miniaturas de la foto de ``profile`` y las anota en
+    ``profile.miniaturas``; [] si la foto no se puede leer.
+    """
+    field = profile.foto_perfil
+    if not field:
+        return []
+    try:
+        with field.storage.open(field.name, 'rb') as photo:
+            data = np.frombuffer(photo.read(), dtype=np.uint8)
+    except (OSError, ValueError):
+        return []
+    image = cv2.imdecode(data, cv2.IMREAD_COLOR) if data.size else None
+    if image is None:
+        return []
+    rendered = render_thumbnails(image)
+    saved = save_thumbnails(field.storage, field.name, rendered)
+    profile.miniaturas = thumbnail_record(field.name, rendered)
+    # update() en lugar de save(): no vuelve a disparar las señales post_save
+    type(profile).objects.filter(pk=profile.pk).update(miniaturas=profile.miniaturas)
+    return saved
+
+
+def thumbnail_sources(profile):
+    """
+    ``{formato: [(url, ancho), ...]}`` de las miniaturas de ``profile``.
+
+    Vacío si la foto todavía no tiene miniaturas (se muestra el original).
+    """
+    if not has_thumbnails(profile):
+        return {}
+    field = profile.foto_perfil
+    record = profile.miniaturas
+    return {
+        fmt: [(field.storage.url(thumbnail_name(field.name, width, fmt)), width) for width in record['anchos']]
+        for fmt in record['formatos']
+    }
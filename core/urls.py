@@ -4,5 +4,10 @@ from . import views
 urlpatterns = [
     path('', views.index, name='index'),
     path('video_feed/', views.video_feed, name='video_feed'),    
+    path('video_feed/<str:camera_id>/', views.video_feed, name='camera_feed'),
     path('get_metrics/', views.get_metrics, name='get_metrics'), # <-- AÑADIDA RUTA
+    path('metrics_stream/', views.metrics_stream, name='metrics_stream'),
+    path('pipeline_stats/', views.pipeline_stats, name='pipeline_stats'),
+    path('attendance_report/', views.attendance_report, name='attendance_report'),
+    path('analyze_frames/', views.analyze_frames, name='analyze_frames'),
 ]
\ No newline at end of file
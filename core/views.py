@@ -2,146 +2,326 @@
 
 
 from django.shortcuts import render
-from django.http import StreamingHttpResponse, JsonResponse
-from django.contrib.auth.decorators import login_required
+from django.http import Http404, StreamingHttpResponse, JsonResponse
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.views.decorators.http import require_POST
+from django.conf import settings
 from .models import Asistencia
+from .attendance import get_attendance_writer, get_presence_cache
+from .camera import CAPTURE_OPTIONS, configured_cameras, default_camera_id, get_camera
+from .detection import create_detector
+from .encoding import create_encoder
+from .inference import detector_factory_from_settings, get_inference_service
+from .kiosk import RemoteKiosk, RemoteKioskRegistry, analyze_frame, decode_frame
+from .liveness import LivenessValidator, RegistroRechazado
+from .metrics import sse_events
+from .metrics_backends import create_metrics_backend
+from .pipeline import FramePipeline, active_pipelines
+from .recognition import FaceRecognizer, get_embedder, get_face_index
+from .reports import attendance_report as attendance_report_data
+from .streaming import AdaptiveStreamController, FrameDiffGate, parse_limits
+from concurrent.futures import Future
+import time
 import cv2
-import threading
-import mediapipe as mp
-from datetime import date
-
-# --- Variables Globales para Métricas ---
-metrics_lock = threading.Lock()
-global_metrics = {
-    "face_count": 0,
-    "status": "Iniciando...",
-    "liveness_step": 1, # 1: Buscando, 2: Mover rostro, 3: Quedarse quieto
-}
+
+# --- Métricas por sesión (un canal por kiosco), compartidas entre workers ---
+metrics_registry = create_metrics_backend(
+    getattr(settings, 'METRICS_BACKEND', 'memory'),
+    shards=getattr(settings, 'METRICS_SHARDS', 16),
+    max_idle=getattr(settings, 'METRICS_MAX_IDLE', 3600.0),
+    socket_path=getattr(settings, 'METRICS_SOCKET_PATH', None),
+    redis_url=getattr(settings, 'METRICS_REDIS_URL', None),
+)
 # ----------------------------------------
-camera_lock = threading.Lock()
 
-mp_face_detection = mp.solutions.face_detection
+# Detector y prueba de vida de los kioscos que capturan en el navegador
+remote_kiosks = RemoteKioskRegistry(max_idle=getattr(settings, 'CLIENT_CAPTURE_MAX_IDLE', 300.0))
+
+# Cabecera y cierre de cada parte del stream multipart
+FRAME_HEADER = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n'
+FRAME_TRAILER = b'\r\n'
+
+def session_key(request):
+    return request.session.session_key or f"user:{request.user.pk}"
+
+def session_metrics(request, camera_id=None):
+    """Canal de métricas de la sesión del navegador (y de la cámara) que hace la petición."""
+    key = session_key(request)
+    if camera_id is not None and camera_id != default_camera_id():
+        key = f"{key}:{camera_id}"
+    return metrics_registry.get(key)
+
+def requested_camera(request, camera_id=None):
+    """Cámara pedida en la URL o en ``?camera=``; 404 si no está configurada."""
+    camera_id = camera_id or request.GET.get('camera') or default_camera_id()
+    if camera_id not in configured_cameras():
+        raise Http404("Cámara no configurada")
+    return camera_id
 
 @login_required
 def index(request):
-    with metrics_lock:
-        global_metrics["face_count"] = 0
-        global_metrics["status"] = "Buscando tu rostro..."
-        global_metrics["liveness_step"] = 1
+    camera_id = requested_camera(request)
+    session_metrics(request, camera_id).reset()
+    # Recargar la página reinicia la prueba de vida del kiosco remoto
+    remote_kiosks.discard(session_key(request))
     # Obtener asistencias recientes del usuario
     asistencias = Asistencia.objects.filter(user=request.user).order_by('-fecha_hora')[:10]
     return render(request, 'core.html', {
         'user': request.user,
-        'asistencias': asistencias
+        'asistencias': asistencias,
+        'capture_mode': getattr(settings, 'CAPTURE_MODE', 'server'),
+        'camera_id': camera_id,
+        'cameras': [(cid, config['name']) for cid, config in configured_cameras().items()],
+        'client_capture': {
+            'fps': getattr(settings, 'CLIENT_CAPTURE_FPS', 10),
+            'width': getattr(settings, 'CLIENT_CAPTURE_WIDTH', 320),
+            'quality': getattr(settings, 'CLIENT_CAPTURE_QUALITY', 0.7),
+            'max_batch': getattr(settings, 'CLIENT_CAPTURE_MAX_BATCH', 8),
+        },
     })
 
-def stream_generator(user):
-    global global_metrics
-    with camera_lock:
-        cap = cv2.VideoCapture(0)
-        if not cap.isOpened():
-            with metrics_lock:
-                global_metrics["status"] = "Error: Cámara no disponible"
-            return
-
-        liveness_step = 1 # 1: Buscando, 2: Mover rostro, 3: Quedarse quieto
-        last_face_center = None
-        still_frames_count = 0
-        today = date.today()
-        asistencia_registrada = Asistencia.objects.filter(user=user, fecha_hora__date=today).exists()
-        if asistencia_registrada:
-            with metrics_lock:
-                global_metrics["status"] = "Asistencia ya registrada hoy"
-
-        with mp_face_detection.FaceDetection(model_selection=1, min_detection_confidence=0.5) as face_detection:
-            while True:
-                success, frame = cap.read()
-                if not success:
-                    with metrics_lock:
-                        global_metrics["status"] = "Stream finalizado"
-                    break
-
-                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                results = face_detection.process(rgb_frame)
-
-                face_count = 0
-                user_face_found = False
-                status_text = "Buscando tu rostro..."
-                color = (255, 165, 0)
-
-                if results.detections:
-                    face_count = len(results.detections)
-                    user_face_found = True
-                    detection = results.detections[0]
-                    bboxC = detection.location_data.relative_bounding_box
-                    ih, iw, _ = frame.shape
-                    x = int(bboxC.xmin * iw)
-                    y = int(bboxC.ymin * ih)
-                    w = int(bboxC.width * iw)
-                    h = int(bboxC.height * ih)
-                    face_center = (x + w // 2, y + h // 2)
-
-                    if asistencia_registrada:
-                        status_text = "Asistencia ya registrada"
-                        color = (0, 128, 0)
-                    else:
-                        if liveness_step == 1:
-                            status_text = "¡Hola! Por favor, gira tu rostro"
-                            liveness_step = 2
-                            last_face_center = face_center
-                        elif liveness_step == 2:
-                            if last_face_center:
-                                move_distance = abs(face_center[0] - last_face_center[0]) + abs(face_center[1] - last_face_center[1])
-                                if move_distance > 20:
-                                    status_text = "¡Genial! Ahora quédate quieto"
-                                    liveness_step = 3
-                                    still_frames_count = 0
-                                else:
-                                    status_text = "Por favor, mueve un poco tu rostro"
-                            last_face_center = face_center
-                        elif liveness_step == 3:
-                            still_frames_count += 1
-                            status_text = f"Validando... ({still_frames_count}/30)"
-                            if still_frames_count > 30:
-                                Asistencia.objects.get_or_create(user=user, fecha_hora__date=today)
-                                asistencia_registrada = True
-                                liveness_step = 4
-                                status_text = "Asistencia Registrada"
-                                with metrics_lock:
-                                    global_metrics["status"] = "Asistencia Registrada"
-                        elif liveness_step == 4:
-                            status_text = "Asistencia Registrada"
-                            color = (0, 255, 0)
-
-                    cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
-                    cv2.putText(frame, status_text, (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
-
-                    with metrics_lock:
-                        global_metrics["face_count"] = face_count
-                        global_metrics["status"] = status_text
-                        global_metrics["liveness_step"] = liveness_step
-                else:
-                    with metrics_lock:
-                        global_metrics["face_count"] = 0
-                        global_metrics["status"] = "Buscando tu rostro..."
-                        global_metrics["liveness_step"] = 1
-
-                ret, buffer = cv2.imencode('.jpg', frame)
-                frame_bytes = buffer.tobytes()
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-
-        cap.release()
-        with metrics_lock:
-            global_metrics["status"] = "Cámara desconectada"
+def build_camera(camera_id=None):
+    """Servicio de captura compartido de una cámara configurada en settings."""
+    config = configured_cameras()[camera_id or default_camera_id()]
+    return get_camera(
+        config['source'],
+        idle_timeout=getattr(settings, 'CAMERA_IDLE_TIMEOUT', 5.0),
+        options={key: config[key] for key in CAPTURE_OPTIONS},
+    )
+
+def build_detector(camera_id=None):
+    """Detector de rostros configurado en settings, uno por kiosco."""
+    if getattr(settings, 'FACE_INFERENCE_BACKEND', 'pool') in ('pool', 'process'):
+        # El seguimiento es por kiosco; las detecciones van al pool compartido,
+        # que reparte su capacidad entre las cámaras según su peso
+        camera_id = camera_id or default_camera_id()
+        weight = configured_cameras()[camera_id]['weight']
+        detector = get_inference_service().detector(
+            timeout=getattr(settings, 'FACE_INFERENCE_TIMEOUT', 1.0), tenant=camera_id, weight=weight)
+    else:
+        detector = detector_factory_from_settings()()
+    return create_detector(
+        getattr(settings, 'FACE_DETECTION_MODE', 'tracking'),
+        budget_ms=getattr(settings, 'FACE_DETECTION_BUDGET_MS', 10.0),
+        max_interval=getattr(settings, 'FACE_DETECTION_MAX_INTERVAL', 10),
+        min_confidence=getattr(settings, 'FACE_TRACKING_MIN_CONFIDENCE', 0.5),
+        detector=detector,
+    )
+
+def build_recognizer():
+    """Reconocedor facial del kiosco, o None si ``FACE_RECOGNITION_MODE`` es 'off'."""
+    mode = getattr(settings, 'FACE_RECOGNITION_MODE', 'off')
+    if mode == 'off':
+        return None
+    return FaceRecognizer(
+        get_face_index(), get_embedder(),
+        threshold=getattr(settings, 'FACE_RECOGNITION_THRESHOLD', None),
+        samples=getattr(settings, 'FACE_RECOGNITION_SAMPLES', 5),
+        mode=mode,
+    )
+
+def build_validator(user, metrics, recognizer=None):
+    """
+    Prueba de vida que registra la asistencia al completarse.
+
+    Sin ``recognizer`` se registra a ``user``. En modo 'verify' solo si el
+    rostro reconocido es el de ``user``; en modo 'identify' (kiosco
+    compartido) se registra a la persona reconocida, sea quien sea.
+    """
+    identify = recognizer is not None and recognizer.mode == 'identify'
+    # Consulta O(1) en memoria; no toca la base de datos al (re)conectar
+    asistencia_registrada = not identify and get_presence_cache().has_attended(user.pk)
+    if asistencia_registrada:
+        metrics.update(status="Asistencia ya registrada hoy")
+
+    def rechazar(motivo):
+        # La prueba de vida muestra el motivo como estado del kiosco
+        future = Future()
+        future.set_exception(RegistroRechazado(motivo))
+        return future
+
+    def registrar_asistencia():
+        user_id = user.pk
+        if recognizer is not None:
+            identidad = recognizer.identity()
+            recognizer.reset()
+            if identidad is None:
+                return rechazar("Rostro no reconocido")
+            if not identify and identidad != user.pk:
+                return rechazar("El rostro no coincide con el usuario")
+            user_id = identidad
+        # La escritura ocurre en segundo plano; el Future confirma el registro
+        # (True) o avisa que ya existía (False, p. ej. desde otro kiosco)
+        future = get_attendance_writer().submit(user_id)
+
+        def confirmar(f):
+            if f.exception() is None:
+                metrics.update(status="Asistencia Registrada" if f.result() else "Asistencia ya registrada hoy")
+
+        future.add_done_callback(confirmar)
+        return future
+
+    return LivenessValidator(asistencia_registrada, on_register=registrar_asistencia)
+
+def stream_generator(user, metrics, limits=None, source=None, validator=None, camera_id=None):
+    """
+    Stream MJPEG con el análisis de rostro dibujado sobre cada frame.
+
+    Por defecto lee de la cámara ``camera_id`` (la principal si no se indica)
+    y registra la asistencia de ``user``. ``source`` (un iterable de frames BGR) y ``validator`` permiten
+    reproducir grabaciones sin cámara ni base de datos, p. ej. en
+    ``manage.py bench_stream``.
+    """
+    camera_id = camera_id or default_camera_id()
+    camera = None
+    if source is None:
+        camera = build_camera(camera_id)
+        source = camera.frames()
+
+    recognizer = None
+    if validator is None:
+        recognizer = build_recognizer()
+        validator = build_validator(user, metrics, recognizer)
+    detector = build_detector(camera_id)
+
+    def analizar(frame):
+        # El frame es compartido con otros visores: dibujamos sobre una copia
+        frame = frame.copy()
+        box, status_text, color = analyze_frame(frame, detector, validator, metrics, recognizer)
+        if box is None:
+            return frame, None
+
+        x, y, w, h = box
+        cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
+        cv2.putText(frame, status_text, (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
+        # Estado del overlay: si cambia, el frame se envía aunque la imagen no
+        return frame, (validator.liveness_step, color)
+
+    queue_size = getattr(settings, 'PIPELINE_QUEUE_SIZE', 2)
+    # Cada JPEG se copia a su parte del multipart apenas se codifica, así que
+    # basta un buffer: la cola nunca guarda vistas sobre él
+    encoder = create_encoder(
+        getattr(settings, 'JPEG_ENCODER', 'opencv'),
+        quality=getattr(settings, 'JPEG_QUALITY', 80),
+        subsampling=getattr(settings, 'JPEG_SUBSAMPLING', '420'),
+        lib_path=getattr(settings, 'TURBOJPEG_LIB_PATH', None),
+        slots=1,
+    )
+    # Techos de fps, calidad y ancho; el control baja de ahí si la red no da abasto
+    max_fps, max_quality, max_width = limits or (
+        getattr(settings, 'STREAM_MAX_FPS', 30),
+        getattr(settings, 'JPEG_QUALITY', 80),
+        getattr(settings, 'STREAM_MAX_WIDTH', None),
+    )
+    controller = AdaptiveStreamController(max_fps, max_quality, max_width)
+    # Frames casi idénticos (rostro quieto) no se recodifican ni se reenvían
+    gate = FrameDiffGate(
+        threshold=getattr(settings, 'STREAM_DIFF_THRESHOLD', 1.5),
+        keepalive=getattr(settings, 'STREAM_KEEPALIVE', 0.5),
+    )
+
+    def codificar(analyzed):
+        frame, overlay = analyzed
+        # La inferencia ve todos los frames; solo se limita lo que se envía
+        if not controller.admit() or not gate.should_send(frame, overlay):
+            return None
+        jpeg = encoder.encode(controller.prepare(frame, encoder))
+        if jpeg is None:
+            return None
+        # Una sola parte por frame: el servidor la escribe de una vez
+        return b''.join((FRAME_HEADER, jpeg, FRAME_TRAILER))
+
+    pipeline = FramePipeline(source, [
+        ('inference', analizar, detector.close),
+        ('encode', codificar),
+    ], maxsize=queue_size, name=f"video_feed:{camera_id}:{user.pk}", monitors={'bitrate': controller, 'diff_gate': gate})
+
+    for part in pipeline:
+        start = time.perf_counter()
+        yield part
+        # El generador queda bloqueado mientras el servidor escribe en el socket
+        controller.record_send(time.perf_counter() - start, len(part))
+
+    metrics.update(status=(camera and camera.error) or "Cámara desconectada")
 
 @login_required
-def video_feed(request):
-    return StreamingHttpResponse(stream_generator(request.user),
+def video_feed(request, camera_id=None):
+    camera_id = requested_camera(request, camera_id)
+    limits = parse_limits(
+        request.GET,
+        max_fps=getattr(settings, 'STREAM_MAX_FPS', 30),
+        max_quality=getattr(settings, 'JPEG_QUALITY', 80),
+        max_width=getattr(settings, 'STREAM_MAX_WIDTH', None),
+    )
+    return StreamingHttpResponse(stream_generator(request.user, session_metrics(request, camera_id), limits,
+                                                  camera_id=camera_id),
                                  content_type='multipart/x-mixed-replace; boundary=frame')
 
+def remote_kiosk(user, metrics):
+    recognizer = build_recognizer()
+    return RemoteKiosk(build_detector(), build_validator(user, metrics, recognizer), metrics, recognizer)
+
+@login_required
+@require_POST
+def analyze_frames(request):
+    """
+    Inferencia para kioscos que capturan en el navegador.
+
+    Recibe un lote de JPEG reducidos en el campo ``frames`` (en orden de
+    captura) y devuelve solo el estado de la prueba de vida.
+    """
+    max_batch = getattr(settings, 'CLIENT_CAPTURE_MAX_BATCH', 8)
+    uploads = request.FILES.getlist('frames')
+    if not uploads:
+        return JsonResponse({"error": "No se recibieron frames"}, status=400)
+    # Si el kiosco se atrasó, solo interesan los frames más recientes
+    frames = [decode_frame(upload.read()) for upload in uploads[-max_batch:]]
+    if any(frame is None for frame in frames):
+        return JsonResponse({"error": "Frame inválido"}, status=400)
+
+    metrics = session_metrics(request)
+    kiosk = remote_kiosks.get(
+        session_key(request),
+        lambda: remote_kiosk(request.user, metrics),
+    )
+    return JsonResponse(kiosk.analyze(frames))
+
 @login_required
 def get_metrics(request):
-    with metrics_lock:
-        data = global_metrics.copy()
-    return JsonResponse(data)
\ No newline at end of file
+    data = session_metrics(request, requested_camera(request)).snapshot()
+    return JsonResponse(data)
+
+@login_required
+def metrics_stream(request):
+    # Server-Sent Events: solo se envía un evento cuando cambian las métricas
+    response = StreamingHttpResponse(
+        sse_events(session_metrics(request, requested_camera(request)), keepalive=getattr(settings, 'METRICS_SSE_KEEPALIVE', 15.0)),
+        content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+@login_required
+def attendance_report(request):
+    """
+    Reporte de asistencias en JSON (ver ``core.reports``).
+
+    Parámetros: ``view`` (records, daily, users), ``days`` o ``start``/``end``,
+    ``limit`` y ``cursor`` (el ``next`` de la página anterior). El staff ve a
+    todos los usuarios (o a ``user``); los demás, solo sus registros.
+    """
+    user = None if request.user.is_staff else request.user
+    try:
+        data = attendance_report_data(request.GET, user)
+    except ValueError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    return JsonResponse(data)
+
+@user_passes_test(lambda u: u.is_staff)
+def pipeline_stats(request):
+    # Profundidad de cola y latencia por etapa de cada stream activo
+    data = {p.name: p.stats() for p in active_pipelines()}
+    data["attendance_writer"] = get_attendance_writer().stats()
+    if getattr(settings, 'FACE_INFERENCE_BACKEND', 'pool') in ('pool', 'process'):
+        data["inference_service"] = get_inference_service().stats()
+    return JsonResponse(data)
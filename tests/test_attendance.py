@@ -0,0 +1,211 @@
+# ============================================
+# ARCHIVO: tests/test_attendance.py
+# Pruebas del registro de asistencias en segundo plano
+# ============================================
+
+import os
+import sys
+import django
+
+# Configurar Django antes de importar modelos
+if __name__ == '__main__':
+    # Agregar el directorio raíz al path
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+    # Configurar settings de Django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'asistencia_project.settings')
+    django.setup()
+
+from concurrent.futures import Future
+from datetime import timedelta
+from unittest import mock
+import time
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.contrib.auth.models import User
+from django.utils import timezone
+from core.models import Asistencia
+from core.attendance import AttendanceWriter, PresenceCache, seconds_until_midnight
+from core.liveness import LivenessValidator
+
+
+class AttendanceWriterTest(TransactionTestCase):
+    """Pruebas de la cola de escritura diferida"""
+
+    def test_registration_is_confirmed_once_per_day(self):
+        """Prueba 1: El registro se confirma y no se duplica en el día"""
+        user = User.objects.create_user(username='kiosco', password='pass123')
+        writer = AttendanceWriter(max_delay=0.01)
+
+        self.assertTrue(writer.submit(user.pk).result(5))
+        self.assertFalse(writer.submit(user.pk).result(5))
+        self.assertEqual(Asistencia.objects.filter(user=user).count(), 1)
+        print("✓ Test 1: Registro confirmado una vez por día - PASSED")
+
+    def test_batched_throughput(self):
+        """Prueba 2: Cientos de registros se escriben en pocos lotes"""
+        users = User.objects.bulk_create(
+            [User(username=f'estudiante{i}') for i in range(500)]
+        )
+        writer = AttendanceWriter(batch_size=200, max_delay=0.05)
+
+        start = time.perf_counter()
+        futures = [writer.submit(user.pk) for user in users]
+        results = [future.result(10) for future in futures]
+        elapsed = time.perf_counter() - start
+
+        stats = writer.stats()
+        self.assertTrue(all(results))
+        self.assertEqual(Asistencia.objects.count(), 500)
+        self.assertEqual(stats['rows'], 500)
+        self.assertLessEqual(stats['batches'], 10)
+        print(f"✓ Test 2: {500 / elapsed:.0f} registros/s en {stats['batches']} lotes - PASSED")
+
+    def test_concurrent_insert_is_not_reported_as_created(self):
+        """Prueba 8: Un registro hecho por otro proceso no cuenta como creado"""
+        from core.metrics import MetricsChannel
+        from core.views import build_validator
+
+        otro = User.objects.create_user(username='otro_kiosco', password='pass123')
+        nuevo = User.objects.create_user(username='nuevo', password='pass123')
+        Asistencia.objects.create(user=otro)
+        writer = AttendanceWriter(max_delay=0.05)
+
+        # Simula la carrera: la consulta previa no ve el registro del otro proceso
+        with mock.patch.object(Asistencia.objects, 'filter') as filtro:
+            filtro.return_value.values_list.return_value = []
+            futures = [writer.submit(otro.pk), writer.submit(nuevo.pk)]
+            self.assertEqual([future.result(5) for future in futures], [False, True])
+        self.assertEqual(writer.stats()['rows'], 1)
+        self.assertEqual(Asistencia.objects.filter(user=otro).count(), 1)
+
+        # El kiosco no sabía del registro del otro proceso al empezar
+        metrics = MetricsChannel()
+        with mock.patch('core.views.get_presence_cache') as presence:
+            presence.return_value.has_attended.return_value = False
+            validator = build_validator(otro, metrics)
+        self.assertNotEqual(metrics.snapshot()['status'], "Asistencia ya registrada hoy")
+        self.assertFalse(validator.on_register().result(5))
+        deadline = time.monotonic() + 2
+        while metrics.snapshot()['status'] != "Asistencia ya registrada hoy" and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(metrics.snapshot()['status'], "Asistencia ya registrada hoy")
+        print("✓ Test 8: Registro concurrente no se cuenta como creado - PASSED")
+
+
+class PendingRegistrationTest(SimpleTestCase):
+    """Pruebas de la confirmación del registro en la prueba de vida"""
+
+    def _validar(self, future):
+        validator = LivenessValidator(on_register=lambda: future)
+        validator.update((100, 100))
+        validator.update((150, 100))
+        for _ in range(LivenessValidator.STILL_FRAMES + 1):
+            status, _ = validator.update((150, 100))
+        return validator, status
+
+    def test_status_waits_for_confirmation(self):
+        """Prueba 3: El estado espera la confirmación del registro"""
+        future = Future()
+        validator, status = self._validar(future)
+        self.assertEqual(status, "Registrando asistencia...")
+
+        future.set_result(True)
+        status, _ = validator.update((150, 100))
+        self.assertEqual(status, "Asistencia Registrada")
+        print("✓ Test 3: Confirmación del registro - PASSED")
+
+    def test_already_registered_result(self):
+        """Prueba 9: Si no se escribió nada, el estado dice que ya estaba registrada"""
+        future = Future()
+        validator, _ = self._validar(future)
+        future.set_result(False)
+        status, _ = validator.update((150, 100))
+        self.assertEqual(status, "Asistencia ya registrada")
+        print("✓ Test 9: Asistencia ya registrada por otro proceso - PASSED")
+
+    def test_failed_registration_restarts_validation(self):
+        """Prueba 4: Un registro fallido reinicia la validación"""
+        future = Future()
+        validator, _ = self._validar(future)
+        future.set_exception(RuntimeError("database is locked"))
+
+        status, _ = validator.update((150, 100))
+        self.assertEqual(status, "Error al registrar la asistencia")
+        self.assertEqual(validator.liveness_step, 1)
+        self.assertFalse(validator.asistencia_registrada)
+        print("✓ Test 4: Registro fallido reinicia la validación - PASSED")
+
+
+class PresenceCacheTest(TestCase):
+    """Pruebas de la caché de asistencias del día"""
+
+    def setUp(self):
+        self.user1 = User.objects.create_user(username='presente', password='pass123')
+        self.user2 = User.objects.create_user(username='ausente', password='pass123')
+        Asistencia.objects.create(user=self.user1)
+
+    def test_lookup_without_queries_after_warmup(self):
+        """Prueba 5: Tras cargarse, la caché responde sin consultar la BD"""
+        cache = PresenceCache()
+        self.assertEqual(cache.warm(), 1)
+
+        with self.assertNumQueries(0):
+            self.assertTrue(cache.has_attended(self.user1.pk))
+            cache.add([self.user2.pk])
+            self.assertTrue(cache.has_attended(self.user2.pk))
+        print("✓ Test 5: Consulta O(1) sin BD - PASSED")
+
+    def test_miss_checks_database(self):
+        """Prueba 10: Un registro hecho por otro worker se ve en la base de datos"""
+        cache = PresenceCache()
+        cache.warm()
+        # Otro proceso registra sin pasar por esta caché
+        Asistencia.objects.bulk_create([Asistencia(user=self.user2, fecha=timezone.localdate())])
+
+        with self.assertNumQueries(1):
+            self.assertTrue(cache.has_attended(self.user2.pk))
+        with self.assertNumQueries(0):
+            self.assertTrue(cache.has_attended(self.user2.pk))
+
+        otro = User.objects.create_user(username='otro', password='pass123')
+        with self.assertNumQueries(1):
+            self.assertFalse(cache.has_attended(otro.pk))
+        print("✓ Test 10: Fallo confirmado en la base de datos - PASSED")
+
+    def test_rollover_at_local_midnight(self):
+        """Prueba 6: La caché se renueva al cambiar el día local"""
+        cache = PresenceCache()
+        self.assertTrue(cache.has_attended(self.user1.pk))
+
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        with mock.patch('core.attendance.timezone.localdate', return_value=tomorrow):
+            self.assertFalse(cache.has_attended(self.user1.pk))
+        self.assertTrue(0 <= seconds_until_midnight() <= 24 * 3600)
+        print("✓ Test 6: Renovación a medianoche - PASSED")
+
+    def test_signals_keep_cache_current(self):
+        """Prueba 7: Crear o borrar asistencias actualiza la caché"""
+        from core.attendance import get_presence_cache
+        cache = get_presence_cache()
+        cache.invalidate()
+        self.assertFalse(cache.has_attended(self.user2.pk))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            asistencia = Asistencia.objects.create(user=self.user2)
+        with self.assertNumQueries(0):
+            self.assertTrue(cache.has_attended(self.user2.pk))
+
+        asistencia.delete()
+        self.assertFalse(cache.has_attended(self.user2.pk))
+        cache.invalidate()
+        print("✓ Test 7: Señales actualizan la caché - PASSED")
+
+
+if __name__ == '__main__':
+    import unittest
+
+    print("\n" + "="*70)
+    print("PRUEBAS DEL REGISTRO DE ASISTENCIAS - Sistema de Asistencia")
+    print("="*70 + "\n")
+
+    unittest.main(verbosity=2)
@@ -0,0 +1,161 @@
+# ============================================
+# ARCHIVO: tests/test_camera.py
+# Pruebas del servicio de captura compartido
+# ============================================
+
+import unittest
+import threading
+import time
+from unittest import mock
+import numpy as np
+import sys
+import os
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.camera import CameraService, get_camera
+
+
+class FakeCapture:
+    """Simula cv2.VideoCapture generando frames sintéticos"""
+
+    opened = 0
+
+    def __init__(self, frames=None, opened=True):
+        FakeCapture.opened += 1
+        self.remaining = frames
+        self._opened = opened
+
+    def isOpened(self):
+        return self._opened
+
+    def read(self):
+        time.sleep(0.005)
+        if self.remaining is not None:
+            if self.remaining <= 0:
+                return False, None
+            self.remaining -= 1
+        return True, np.zeros((48, 64, 3), dtype=np.uint8)
+
+    def release(self):
+        self._opened = False
+
+
+class FakeCameraService(CameraService):
+    def __init__(self, *args, frames=None, opened=True, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fake_frames = frames
+        self.fake_opened = opened
+
+    def _open(self):
+        return FakeCapture(self.fake_frames, self.fake_opened)
+
+
+class TestCameraService(unittest.TestCase):
+    """Pruebas del hilo de captura compartido"""
+
+    def setUp(self):
+        FakeCapture.opened = 0
+
+    def test_multiple_viewers_share_device(self):
+        """Prueba 1: Varios visores comparten un único dispositivo"""
+        service = FakeCameraService(idle_timeout=10)
+        received = [0, 0, 0]
+
+        def viewer(i):
+            for _ in service.frames():
+                received[i] += 1
+                if received[i] >= 5:
+                    break
+
+        threads = [threading.Thread(target=viewer, args=(i,)) for i in range(3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(5)
+        service.stop(5)
+
+        self.assertEqual(received, [5, 5, 5])
+        self.assertEqual(FakeCapture.opened, 1)
+        print("✓ Test 1: Visores comparten el dispositivo - PASSED")
+
+    def test_reconnect_reuses_open_device(self):
+        """Prueba 2: Reconectar dentro del periodo de gracia no reabre la cámara"""
+        service = FakeCameraService(idle_timeout=10)
+        next(service.frames())
+        next(service.frames())
+        service.stop(5)
+
+        self.assertEqual(FakeCapture.opened, 1)
+        print("✓ Test 2: Reconexión reutiliza el dispositivo - PASSED")
+
+    def test_camera_unavailable(self):
+        """Prueba 3: Cámara no disponible expone el error"""
+        service = FakeCameraService(opened=False)
+        frames = list(service.frames())
+
+        self.assertEqual(frames, [])
+        self.assertEqual(service.error, "Error: Cámara no disponible")
+        print("✓ Test 3: Cámara no disponible - PASSED")
+
+    def test_stream_end_stops_subscribers(self):
+        """Prueba 4: El fin del stream termina las suscripciones"""
+        service = FakeCameraService(frames=3)
+        frames = list(service.frames())
+
+        self.assertLessEqual(len(frames), 3)
+        self.assertFalse(service.running)
+        self.assertEqual(service.subscribers, 0)
+        print("✓ Test 4: Fin del stream libera a los visores - PASSED")
+
+    def test_source_errors_end_viewers(self):
+        """Prueba 5: Una fuente que falla al abrir o leer termina los visores"""
+        class BrokenCapture(FakeCapture):
+            def read(self):
+                raise RuntimeError("USB desconectado")
+
+        class BrokenReadService(FakeCameraService):
+            def _open(self):
+                return BrokenCapture()
+
+        results = {}
+
+        def consume(name, service):
+            results[name] = list(service.frames())
+
+        invalid = CameraService('synthetic:abc')
+        broken = BrokenReadService()
+        threads = [threading.Thread(target=consume, args=args, daemon=True)
+                   for args in (('invalid', invalid), ('broken', broken))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(5)
+
+        self.assertEqual(results, {'invalid': [], 'broken': []})
+        self.assertFalse(invalid.running)
+        self.assertIn("Cámara no disponible", invalid.error)
+        self.assertIn("synthetic:abc", invalid.error)
+        self.assertIn("USB desconectado", broken.error)
+        # Un visor nuevo vuelve a intentar abrir la fuente
+        self.assertEqual(list(invalid.frames()), [])
+        print("✓ Test 5: Errores de la fuente - PASSED")
+
+    def test_shared_source_requires_same_options(self):
+        """Prueba 6: Una fuente compartida no ignora opciones distintas"""
+        with mock.patch('core.camera._services', {}):
+            first = get_camera('synthetic:32x24', idle_timeout=5.0, options={'fps': 10})
+            self.assertIs(get_camera('synthetic:32x24', idle_timeout=5.0, options={'fps': 10}), first)
+            with self.assertRaises(ValueError):
+                get_camera('synthetic:32x24', idle_timeout=5.0, options={'fps': 30})
+            self.assertIsNot(get_camera('synthetic:64x48', options={'fps': 30}), first)
+        print("✓ Test 6: Opciones de una fuente compartida - PASSED")
+
+
+if __name__ == '__main__':
+    print("\n" + "="*70)
+    print("PRUEBAS DEL SERVICIO DE CAPTURA - Sistema de Asistencia")
+    print("="*70 + "\n")
+
+    unittest.main(verbosity=2)
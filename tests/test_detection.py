@@ -8,10 +8,16 @@ import cv2
 import numpy as np
 import sys
 import os
+import time
 
 # Agregar el directorio raíz al path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from core.detection import (
+    FaceBox, HaarDetector, InferenceResizer, TrackingDetector, box_to_pixels,
+    build_face_detector, create_detector,
+)
+
 class TestDetectionModule(unittest.TestCase):
     """Pruebas unitarias para el módulo de detección con OpenCV"""
     
@@ -79,6 +85,140 @@ class TestDetectionModule(unittest.TestCase):
         print("✓ Test 7: Redimensionamiento de imagen - PASSED")
 
 
+class FakeDetector:
+    """Detector simulado que devuelve siempre el mismo recuadro"""
+
+    def __init__(self, box=None, delay=0.0):
+        self.calls = 0
+        self.box = box
+        self.delay = delay
+
+    def detect(self, frame):
+        self.calls += 1
+        time.sleep(self.delay)
+        return [self.box] if self.box else []
+
+    def close(self):
+        pass
+
+
+def textured_frame(offset_x):
+    """Frame con un recuadro texturizado desplazado horizontalmente"""
+    frame = np.zeros((240, 320, 3), dtype=np.uint8)
+    rng = np.random.RandomState(0)
+    patch = rng.randint(0, 255, (80, 80, 3)).astype(np.uint8)
+    frame[80:160, 100 + offset_x:180 + offset_x] = patch
+    return frame
+
+
+class TestTrackingDetector(unittest.TestCase):
+    """Pruebas de la detección con salto de frames y seguimiento"""
+
+    def test_detector_runs_every_k_frames(self):
+        """Prueba 8: El modelo solo se ejecuta cada K frames"""
+        fake = FakeDetector(FaceBox(100 / 320, 80 / 240, 80 / 320, 80 / 240, 0.9), delay=0.02)
+        tracker = TrackingDetector(fake, budget_ms=5, max_interval=5, min_confidence=0.1)
+
+        results = [tracker.detect(textured_frame(0)) for _ in range(20)]
+
+        self.assertTrue(all(results))
+        self.assertEqual(tracker.interval, 5)
+        self.assertLess(fake.calls, 10)
+        print("✓ Test 8: Detección cada K frames - PASSED")
+
+    def test_tracker_follows_motion(self):
+        """Prueba 9: El recuadro sigue al rostro entre detecciones"""
+        fake = FakeDetector(FaceBox(100 / 320, 80 / 240, 80 / 320, 80 / 240, 0.9))
+        tracker = TrackingDetector(fake, budget_ms=0.001, max_interval=10, min_confidence=0.1)
+        tracker.detect(textured_frame(0))
+
+        boxes = tracker.detect(textured_frame(6))
+        x, y, w, h = box_to_pixels(boxes[0], (240, 320))
+
+        self.assertEqual(fake.calls, 1)
+        self.assertAlmostEqual(x, 106, delta=2)
+        self.assertAlmostEqual(y, 80, delta=2)
+        print("✓ Test 9: Seguimiento entre detecciones - PASSED")
+
+    def test_low_confidence_forces_detection(self):
+        """Prueba 10: La confianza baja fuerza una nueva detección"""
+        fake = FakeDetector(FaceBox(100 / 320, 80 / 240, 80 / 320, 80 / 240, 0.55))
+        tracker = TrackingDetector(fake, budget_ms=0.001, max_interval=10,
+                                   min_confidence=0.5, decay=0.5)
+        for _ in range(3):
+            tracker.detect(textured_frame(0))
+
+        self.assertEqual(fake.calls, 2)
+        print("✓ Test 10: Confianza baja fuerza detección - PASSED")
+
+
+class TestInferenceResizer(unittest.TestCase):
+    """Pruebas de la inferencia a resolución reducida"""
+
+    def test_resized_buffer_is_reused(self):
+        """Prueba 11: El frame reducido conserva aspecto y reutiliza el buffer"""
+        resizer = InferenceResizer(320)
+        frame = np.random.randint(0, 255, (480, 640, 3), dtype=np.uint8)
+
+        first = resizer.rgb(frame)
+        second = resizer.rgb(frame)
+
+        self.assertEqual(first.shape, (240, 320, 3))
+        self.assertIs(first, second)
+        print("✓ Test 11: Buffer de inferencia reutilizado - PASSED")
+
+    def test_relative_box_maps_to_full_resolution(self):
+        """Prueba 12: El recuadro relativo se proyecta sobre el frame completo"""
+        box = FaceBox(0.25, 0.5, 0.1, 0.2, 0.9)
+
+        self.assertEqual(box_to_pixels(box, (480, 640, 3)), (160, 240, 64, 96))
+        self.assertEqual(box_to_pixels(box, (240, 320, 3)), (80, 120, 32, 48))
+        print("✓ Test 12: Reproyección del recuadro - PASSED")
+
+
+class TestDetectorBackends(unittest.TestCase):
+    """Pruebas de la selección del detector de rostros"""
+
+    def test_haar_backend_returns_relative_boxes(self):
+        """Prueba 13: El backend Haar devuelve recuadros relativos"""
+        detector = build_face_detector('haar', input_width=320)
+        frame = np.full((480, 640, 3), 128, dtype=np.uint8)
+        cv2.circle(frame, (320, 240), 80, (200, 200, 200), -1)
+
+        detections = detector.detect(frame)
+        detector.close()
+
+        self.assertIsInstance(detector, HaarDetector)
+        self.assertIsInstance(detections, list)
+        for box in detections:
+            self.assertIsInstance(box, FaceBox)
+            self.assertTrue(0.0 <= box.xmin <= 1.0 and 0.0 < box.width <= 1.0)
+        print("✓ Test 13: Backend Haar - PASSED")
+
+    def test_unknown_backend_rejected(self):
+        """Prueba 14: Un backend desconocido se rechaza"""
+        with self.assertRaises(ValueError):
+            build_face_detector('retinaface')
+        print("✓ Test 14: Backend desconocido rechazado - PASSED")
+
+    def test_dnn_backends_require_model_file(self):
+        """Prueba 15: YuNet y SSD exigen un modelo local"""
+        for backend in ('yunet', 'ssd'):
+            with self.assertRaises(ValueError):
+                build_face_detector(backend)
+            with self.assertRaises(ValueError):
+                build_face_detector(backend, model_path='/no/existe.onnx')
+        print("✓ Test 15: Modelos DNN requeridos - PASSED")
+
+    def test_create_detector_with_backend(self):
+        """Prueba 16: create_detector envuelve el backend elegido con seguimiento"""
+        detector = create_detector(mode='tracking', backend='haar')
+        self.assertIsInstance(detector, TrackingDetector)
+        self.assertIsInstance(detector.detector, HaarDetector)
+        detector.close()
+        print("✓ Test 16: Detector con seguimiento sobre Haar - PASSED")
+
+
 if __name__ == '__main__':
     print("\n" + "="*70)
     print("PRUEBAS UNITARIAS - Módulo de Detección")
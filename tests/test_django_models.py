@@ -16,13 +16,14 @@ if __name__ == '__main__':
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'asistencia_project.settings')
     django.setup()
 
-from django.test import TestCase
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.core.files.uploadedfile import SimpleUploadedFile
 from datetime import datetime, timedelta
 from core.models import UserProfile, Asistencia
-import time
 
 
 class UserProfileModelTest(TestCase):
@@ -157,12 +158,11 @@ class AsistenciaModelTest(TestCase):
         
     def test_asistencia_multiple_records_same_user(self):
         """Prueba 11: Múltiples registros para el mismo usuario"""
-        asistencia1 = Asistencia.objects.create(user=self.user1)
+        # Solo se permite una asistencia por día: registros en días distintos
+        hoy = timezone.localdate()
+        asistencia1 = Asistencia.objects.create(user=self.user1, fecha=hoy - timedelta(days=1))
         
-        # Esperar 1 segundo para evitar conflicto de unique_together
-        time.sleep(1)
-        
-        asistencia2 = Asistencia.objects.create(user=self.user1)
+        asistencia2 = Asistencia.objects.create(user=self.user1, fecha=hoy)
         
         asistencias = Asistencia.objects.filter(user=self.user1)
         self.assertEqual(asistencias.count(), 2)
@@ -182,12 +182,11 @@ class AsistenciaModelTest(TestCase):
         
     def test_asistencia_ordering(self):
         """Prueba 13: Ordenamiento de registros de asistencia"""
-        # Crear varios registros con pausas para evitar unique constraint
-        asistencia1 = Asistencia.objects.create(user=self.user1)
-        time.sleep(1)
+        # Crear varios registros (una asistencia por usuario y día)
+        hoy = timezone.localdate()
+        asistencia1 = Asistencia.objects.create(user=self.user1, fecha=hoy - timedelta(days=1))
         
         asistencia2 = Asistencia.objects.create(user=self.user2)
-        time.sleep(1)
         
         asistencia3 = Asistencia.objects.create(user=self.user1)
         
@@ -215,15 +214,13 @@ class AsistenciaModelTest(TestCase):
         
     def test_asistencia_count_by_user(self):
         """Prueba 15: Contar asistencias por usuario"""
-        # Crear múltiples asistencias con pausas para evitar unique constraint
-        Asistencia.objects.create(user=self.user1)
-        time.sleep(1)
+        # Crear múltiples asistencias en días distintos
+        hoy = timezone.localdate()
+        Asistencia.objects.create(user=self.user1, fecha=hoy - timedelta(days=2))
         
-        Asistencia.objects.create(user=self.user1)
-        time.sleep(1)
+        Asistencia.objects.create(user=self.user1, fecha=hoy - timedelta(days=1))
         
-        Asistencia.objects.create(user=self.user1)
-        time.sleep(1)
+        Asistencia.objects.create(user=self.user1, fecha=hoy)
         
         Asistencia.objects.create(user=self.user2)
         
@@ -235,6 +232,27 @@ class AsistenciaModelTest(TestCase):
         self.assertEqual(count_user2, 1)
         print("✓ Test 15: Conteo de asistencias por usuario - PASSED")
 
+    def test_asistencia_fecha_local(self):
+        """Prueba 18: La fecha local se asigna automáticamente"""
+        asistencia = Asistencia.objects.create(user=self.user1)
+
+        self.assertEqual(asistencia.fecha, timezone.localdate(asistencia.fecha_hora))
+        print("✓ Test 18: Fecha local asignada - PASSED")
+
+    def test_asistencia_unica_por_dia(self):
+        """Prueba 19: Solo una asistencia por usuario y día"""
+        from django.db import IntegrityError, transaction
+
+        Asistencia.objects.create(user=self.user1)
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                Asistencia.objects.create(user=self.user1)
+
+        # Otro usuario sí puede registrar el mismo día
+        Asistencia.objects.create(user=self.user2)
+        self.assertEqual(Asistencia.objects.filter(fecha=timezone.localdate()).count(), 2)
+        print("✓ Test 19: Una asistencia por día - PASSED")
+
 
 class ModelIntegrationTest(TestCase):
     """Pruebas de integración entre modelos"""
@@ -282,6 +300,47 @@ class ModelIntegrationTest(TestCase):
         print("✓ Test 17: Flujo completo de asistencia - PASSED")
 
 
+class AsistenciaFechaMigrationTest(TransactionTestCase):
+    """Pruebas de la migración que exige una asistencia por día"""
+
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate([('core', target)])
+        return executor.loader.project_state([('core', target)]).apps
+
+    def tearDown(self):
+        # Deja la base en la última migración para las demás pruebas
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes('core'))
+
+    def test_duplicates_are_archived_and_restored(self):
+        """Prueba 20: Los duplicados del día se apartan y revertir los restaura"""
+        apps = self.migrate('0001_initial')
+        # Modelo histórico: sin las señales que crean el perfil del esquema actual
+        user = apps.get_model('auth', 'User').objects.create(username="duplicado")
+        Asistencia = apps.get_model('core', 'Asistencia')
+        moment = timezone.now().replace(hour=15, minute=0, second=0, microsecond=0)
+        first = Asistencia.objects.create(user_id=user.pk)
+        Asistencia.objects.filter(pk=first.pk).update(fecha_hora=moment)
+        ids = [first.pk]
+        for minutes in (5, 10):
+            extra = Asistencia.objects.create(user_id=user.pk)
+            Asistencia.objects.filter(pk=extra.pk).update(fecha_hora=moment + timedelta(minutes=minutes))
+            ids.append(extra.pk)
+
+        apps = self.migrate('0002_asistencia_fecha')
+        self.assertEqual(list(apps.get_model('core', 'Asistencia').objects.values_list('id', flat=True)), [first.pk])
+        archived = apps.get_model('core', 'AsistenciaDuplicada').objects.order_by('asistencia_id')
+        self.assertEqual([row.asistencia_id for row in archived], ids[1:])
+
+        apps = self.migrate('0001_initial')
+        restored = apps.get_model('core', 'Asistencia').objects.order_by('id')
+        self.assertEqual([row.id for row in restored], ids)
+        self.assertEqual(restored[2].fecha_hora, moment + timedelta(minutes=10))
+        print("✓ Test 20: Duplicados apartados y restaurables - PASSED")
+
+
 if __name__ == '__main__':
     import unittest
     
@@ -298,6 +357,7 @@ if __name__ == '__main__':
     suite.addTests(loader.loadTestsFromTestCase(UserProfileModelTest))
     suite.addTests(loader.loadTestsFromTestCase(AsistenciaModelTest))
     suite.addTests(loader.loadTestsFromTestCase(ModelIntegrationTest))
+    suite.addTests(loader.loadTestsFromTestCase(AsistenciaFechaMigrationTest))
     
     # Ejecutar pruebas
     runner = unittest.TextTestRunner(verbosity=2)
@@ -0,0 +1,87 @@
+# ============================================
+# ARCHIVO: tests/test_encoding.py
+# Pruebas de la codificación JPEG del stream
+# ============================================
+
+import unittest
+import cv2
+import numpy as np
+import sys
+import os
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.encoding import OpenCVEncoder, TurboJPEGEncoder, create_encoder
+
+try:
+    import turbojpeg
+except ImportError:
+    turbojpeg = None
+
+
+class FakeTurboJPEG:
+    """Simula TurboJPEG escribiendo el JPEG de OpenCV en el buffer recibido"""
+
+    def encode(self, img_array, quality=85, pixel_format=None, jpeg_subsample=None, dst=None):
+        ret, data = cv2.imencode('.jpg', img_array, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        dst[:data.nbytes] = data.tobytes()
+        return dst, data.nbytes
+
+
+class TestEncoding(unittest.TestCase):
+    """Pruebas de los codificadores JPEG"""
+
+    def setUp(self):
+        self.frame = np.random.randint(0, 255, (120, 160, 3), dtype=np.uint8)
+
+    def test_opencv_encoder_returns_decodable_view(self):
+        """Prueba 1: OpenCV devuelve una vista decodificable sin copiar"""
+        encoder = OpenCVEncoder(quality=70, subsampling="420")
+        jpeg = encoder.encode(self.frame)
+
+        self.assertIsInstance(jpeg, memoryview)
+        decoded = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+        self.assertEqual(decoded.shape, self.frame.shape)
+        print("✓ Test 1: Codificación con OpenCV - PASSED")
+
+    def test_quality_and_subsampling_reduce_size(self):
+        """Prueba 2: Menor calidad y croma 4:2:0 producen JPEG más pequeños"""
+        full = OpenCVEncoder(quality=90, subsampling="444").encode(self.frame).nbytes
+        light = OpenCVEncoder(quality=60, subsampling="420").encode(self.frame).nbytes
+
+        self.assertLess(light, full)
+        with self.assertRaises(ValueError):
+            OpenCVEncoder(subsampling="410")
+        print("✓ Test 2: Calidad y submuestreo configurables - PASSED")
+
+    @unittest.skipIf(turbojpeg is None, "PyTurboJPEG no instalado")
+    def test_turbojpeg_reuses_buffers(self):
+        """Prueba 3: libjpeg-turbo reutiliza sus buffers por turnos"""
+        encoder = TurboJPEGEncoder(slots=2, jpeg=FakeTurboJPEG())
+        first = encoder.encode(self.frame)
+        second = encoder.encode(self.frame)
+        third = encoder.encode(self.frame)
+
+        self.assertIs(first.obj, third.obj)
+        self.assertIsNot(first.obj, second.obj)
+        decoded = cv2.imdecode(np.frombuffer(third, dtype=np.uint8), cv2.IMREAD_COLOR)
+        self.assertEqual(decoded.shape, self.frame.shape)
+        print("✓ Test 3: Buffers reutilizados - PASSED")
+
+    def test_factory_falls_back_to_opencv(self):
+        """Prueba 4: Sin libjpeg-turbo se usa el codificador de OpenCV"""
+        encoder = create_encoder("turbojpeg", lib_path="/nonexistent/libturbojpeg.so")
+
+        self.assertEqual(encoder.name, "opencv")
+        with self.assertRaises(ValueError):
+            create_encoder("png")
+        print("✓ Test 4: Respaldo con OpenCV - PASSED")
+
+
+if __name__ == '__main__':
+    print("\n" + "="*70)
+    print("PRUEBAS DE LA CODIFICACIÓN JPEG - Sistema de Asistencia")
+    print("="*70 + "\n")
+
+    unittest.main(verbosity=2)
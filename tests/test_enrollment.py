@@ -0,0 +1,162 @@
+# ============================================
+# ARCHIVO: tests/test_enrollment.py
+# Pruebas del enrolamiento masivo (enroll_bulk)
+# ============================================
+
+import os
+import sys
+import django
+
+# Configurar Django antes de importar modelos
+if __name__ == '__main__':
+    # Agregar el directorio raíz al path
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+    # Configurar settings de Django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'asistencia_project.settings')
+    django.setup()
+
+import csv
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+import cv2
+import numpy as np
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from core.detection import FaceBox
+from core.models import FaceEmbedding, UserProfile
+from core.thumbnails import has_thumbnails
+
+
+class CenterDetector:
+    """Detector simulado: un rostro en el centro de la imagen"""
+
+    def detect(self, frame):
+        return [FaceBox(0.3, 0.3, 0.4, 0.4, 0.9)]
+
+    def close(self):
+        pass
+
+
+class EnrollBulkTest(TestCase):
+    """Pruebas del comando enroll_bulk"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.photos = os.path.join(self.tmp, 'fotos')
+        os.makedirs(self.photos)
+        self.settings_override = override_settings(
+            MEDIA_ROOT=os.path.join(self.tmp, 'media'),
+            FACE_EMBEDDINGS_DIR=os.path.join(self.tmp, 'embeddings'),
+        )
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def write_csv(self, rows):
+        path = os.path.join(self.tmp, 'alumnos.csv')
+        with open(path, 'w', newline='') as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(['username', 'first_name', 'foto', 'password'])
+            writer.writerows(rows)
+        return path
+
+    def write_photo(self, name, seed):
+        rng = np.random.default_rng(seed)
+        small = rng.integers(0, 255, (12, 9, 3), dtype=np.uint8)
+        cv2.imwrite(os.path.join(self.photos, name), cv2.resize(small, (900, 1200)))
+
+    @override_settings(FACE_RECOGNITION_MODE='identify', FACE_EMBEDDER_BACKEND='lbp')
+    def test_bulk_creates_users_profiles_and_vectors(self):
+        """Prueba 1: Usuarios, perfiles, fotos recortadas y vectores en lote"""
+        User.objects.create_user(username='existente', password='pass123')
+        rows = [[f'alumno{i}', f'Alumno {i}', f'a{i}.jpg', 'clave123' if i == 0 else ''] for i in range(5)]
+        for i in range(4):
+            self.write_photo(f'a{i}.jpg', i)
+        rows += [['existente', '', 'a0.jpg', ''], ['alumno1', '', 'a1.jpg', ''],
+                 ['ana maría', '', 'a2.jpg', ''], ['x' * 151, '', 'a3.jpg', '']]
+
+        out, err = StringIO(), StringIO()
+        with mock.patch('core.recognition._embedder', None), \
+                mock.patch('core.management.commands.enroll_bulk.detector_factory_from_settings',
+                           return_value=CenterDetector):
+            call_command('enroll_bulk', self.write_csv(rows), self.photos, workers=0, batch_size=2,
+                         stdout=out, stderr=err)
+
+        self.assertEqual(User.objects.filter(username__startswith='alumno').count(), 5)
+        self.assertEqual(UserProfile.objects.filter(user__username__startswith='alumno').count(), 5)
+        self.assertTrue(User.objects.get(username='alumno0').check_password('clave123'))
+        self.assertFalse(User.objects.get(username='alumno2').has_usable_password())
+
+        profile = UserProfile.objects.get(user__username='alumno1')
+        with profile.foto_perfil.open('rb') as photo:
+            image = cv2.imdecode(np.frombuffer(photo.read(), np.uint8), cv2.IMREAD_COLOR)
+        # 900x1200 reducida a 480x640 y recortada al rostro (40% + margen)
+        self.assertLess(image.shape[0], 640)
+        self.assertFalse(UserProfile.objects.get(user__username='alumno4').foto_perfil)
+        self.assertTrue(has_thumbnails(profile))
+        self.assertEqual(profile.miniaturas['foto'], profile.foto_perfil.name)
+
+        self.assertEqual(FaceEmbedding.objects.filter(modelo='lbp').count(), 4)
+        self.assertEqual(FaceEmbedding.objects.get(user=profile.user).foto, profile.foto_perfil.name)
+        self.assertTrue(os.path.exists(os.path.join(self.tmp, 'embeddings', 'lbp.npy')))
+        self.assertIn("Creados: 5", out.getvalue())
+        self.assertIn("ya existe", err.getvalue())
+        self.assertIn("repetido", err.getvalue())
+        self.assertIn("alumno4: foto faltante", err.getvalue())
+        self.assertEqual(err.getvalue().count("username inválido"), 2)
+        self.assertFalse(User.objects.filter(username__in=['ana maría', 'x' * 151]).exists())
+        print("✓ Test 1: Alta masiva en lote - PASSED")
+
+    def test_bulk_with_process_pool(self):
+        """Prueba 2: Las fotos se procesan en un pool de procesos"""
+        for i in range(3):
+            self.write_photo(f'a{i}.jpg', i)
+        rows = [[f'pool{i}', '', f'a{i}.jpg', ''] for i in range(3)]
+
+        out, err = StringIO(), StringIO()
+        call_command('enroll_bulk', self.write_csv(rows), self.photos, workers=2, stdout=out, stderr=err)
+
+        self.assertEqual(UserProfile.objects.filter(user__username__startswith='pool').count(), 3)
+        # Sin rostros reales: se guarda la foto reducida y se avisa
+        self.assertEqual(UserProfile.objects.exclude(foto_perfil='').exclude(foto_perfil=None).count(), 3)
+        self.assertIn("sin rostro detectable", err.getvalue())
+        self.assertFalse(FaceEmbedding.objects.exists())
+
+        with self.assertRaises(CommandError):
+            call_command('enroll_bulk', self.write_csv(rows), os.path.join(self.tmp, 'falta'))
+        print("✓ Test 2: Alta masiva con pool de procesos - PASSED")
+
+    def test_failed_batch_removes_saved_photos(self):
+        """Prueba 3: Un lote que falla no deja usuarios ni fotos huérfanas"""
+        for i in range(2):
+            self.write_photo(f'a{i}.jpg', i)
+        rows = [[f'falla{i}', '', f'a{i}.jpg', ''] for i in range(2)]
+
+        with mock.patch.object(UserProfile.objects, 'bulk_create', side_effect=IntegrityError("choque")):
+            with self.assertRaises(IntegrityError):
+                call_command('enroll_bulk', self.write_csv(rows), self.photos, workers=0,
+                             stdout=StringIO(), stderr=StringIO())
+
+        self.assertFalse(User.objects.filter(username__startswith='falla').exists())
+        media = os.path.join(self.tmp, 'media')
+        leftovers = [name for _, _, files in os.walk(media) for name in files]
+        self.assertEqual(leftovers, [])
+        print("✓ Test 3: Lote fallido sin fotos huérfanas - PASSED")
+
+
+if __name__ == '__main__':
+    import unittest
+
+    print("\n" + "="*70)
+    print("PRUEBAS DE ENROLAMIENTO MASIVO - Sistema de Asistencia")
+    print("="*70 + "\n")
+
+    unittest.main(verbosity=2)
@@ -0,0 +1,265 @@
+# ============================================
+# ARCHIVO: tests/test_inference.py
+# Pruebas del servicio central de inferencia
+# ============================================
+
+import unittest
+import threading
+import time
+import numpy as np
+import sys
+import os
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.detection import FaceBox, TrackingDetector, create_detector
+from core.inference import FairQueue, InferenceService, SharedMemoryDetector
+
+
+class EchoDetector:
+    """Detector simulado: devuelve un recuadro con el valor del primer píxel"""
+
+    instances = 0
+
+    def __init__(self, delay=0.0):
+        EchoDetector.instances += 1
+        self.delay = delay
+        self.closed = False
+
+    def detect(self, frame):
+        time.sleep(self.delay)
+        return [FaceBox(0.1, 0.1, 0.2, 0.2, float(frame[0, 0, 0]))]
+
+    def close(self):
+        self.closed = True
+
+
+def frame_with(value):
+    frame = np.zeros((8, 8, 3), dtype=np.uint8)
+    frame[0, 0, 0] = value
+    return frame
+
+
+def throughput(workers, streams=8, frames=10, delay=0.01):
+    """Frames por segundo con ``streams`` clientes concurrentes"""
+    service = InferenceService(lambda: EchoDetector(delay), workers=workers, max_delay=0.001)
+    detector = service.detector()
+
+    def stream():
+        for i in range(frames):
+            detector.detect(frame_with(i))
+
+    threads = [threading.Thread(target=stream) for _ in range(streams)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    service.close()
+    return streams * frames / elapsed
+
+
+class TestInferenceService(unittest.TestCase):
+    """Pruebas del pool de detectores con micro-lotes"""
+
+    def test_results_reach_their_stream(self):
+        """Prueba 1: Cada frame recibe su propio resultado"""
+        service = InferenceService(EchoDetector, workers=2)
+        futures = [service.submit(frame_with(i)) for i in range(50)]
+        scores = [f.result(5)[0].score for f in futures]
+        service.close()
+
+        self.assertEqual(scores, [float(i) for i in range(50)])
+        print("✓ Test 1: Resultados entregados a cada stream - PASSED")
+
+    def test_frames_are_micro_batched(self):
+        """Prueba 2: Los frames simultáneos se agrupan en lotes"""
+        service = InferenceService(EchoDetector, workers=1, max_batch=8, max_delay=0.05)
+        futures = [service.submit(frame_with(i)) for i in range(32)]
+        for f in futures:
+            f.result(5)
+        stats = service.stats()
+        service.close()
+
+        self.assertEqual(stats["frames"], 32)
+        self.assertLessEqual(stats["batches"], 8)
+        self.assertGreater(stats["avg_batch"], 2)
+        print(f"✓ Test 2: {stats['avg_batch']} frames por lote - PASSED")
+
+    def test_throughput_scales_with_workers(self):
+        """Prueba 3: El rendimiento crece con el número de detectores"""
+        single = throughput(workers=1)
+        quad = throughput(workers=4)
+
+        self.assertGreater(quad, single * 2.5)
+        print(f"✓ Test 3: {single:.0f} -> {quad:.0f} frames/s con 4 detectores - PASSED")
+
+    def test_fixed_pool_and_shutdown(self):
+        """Prueba 4: El pool tiene tamaño fijo y se libera al cerrar"""
+        EchoDetector.instances = 0
+        created = []
+
+        def factory():
+            detector = EchoDetector()
+            created.append(detector)
+            return detector
+
+        service = InferenceService(factory, workers=3)
+        detectors = [create_detector(detector=service.detector()) for _ in range(10)]
+        for i, detector in enumerate(detectors):
+            self.assertIsInstance(detector, TrackingDetector)
+            self.assertEqual(len(detector.detect(frame_with(i))), 1)
+            detector.close()
+        service.close()
+
+        self.assertEqual(EchoDetector.instances, 3)
+        self.assertTrue(all(d.closed for d in created))
+        print("✓ Test 4: Pool fijo compartido por los streams - PASSED")
+
+    def test_factory_error_reaches_caller(self):
+        """Prueba 5: Un detector que no se puede crear no bloquea los streams"""
+        def broken():
+            raise RuntimeError("modelo no disponible")
+
+        service = InferenceService(broken, workers=1)
+        with self.assertRaises(RuntimeError):
+            service.submit(frame_with(1)).result(5)
+        service.close()
+        print("✓ Test 5: Error del detector propagado - PASSED")
+
+    def test_stuck_detector_times_out_without_faces(self):
+        """Prueba 6: Un detector colgado no bloquea el stream"""
+        release = threading.Event()
+
+        class StuckDetector(EchoDetector):
+            def detect(self, frame):
+                release.wait(5)
+                return super().detect(frame)
+
+        service = InferenceService(StuckDetector, workers=1, max_batch=1)
+        detector = service.detector(timeout=0.1)
+        start = time.perf_counter()
+        self.assertEqual(detector.detect(frame_with(1)), [])
+        # El segundo frame vence en la cola y el servicio ya no lo procesa
+        self.assertEqual(detector.detect(frame_with(2)), [])
+        self.assertLess(time.perf_counter() - start, 1.0)
+        release.set()
+        self.assertEqual(service.submit(frame_with(3)).result(5)[0].score, 3.0)
+        stats = service.stats()
+        service.close()
+
+        self.assertEqual(stats["frames"], 2)
+        print("✓ Test 6: Detección vencida sin rostros - PASSED")
+
+
+class TestSharedMemoryDetector(unittest.TestCase):
+    """Pruebas de los detectores en procesos con memoria compartida"""
+
+    def test_frames_cross_process_boundary(self):
+        """Prueba 7: Los frames llegan al proceso por memoria compartida"""
+        detector = SharedMemoryDetector(EchoDetector, slots=4)
+        try:
+            self.assertEqual(detector.detect(frame_with(7))[0].score, 7.0)
+            # Un frame mayor que la ranura reserva un bloque nuevo
+            big = np.zeros((480, 640, 3), dtype=np.uint8)
+            big[0, 0, 0] = 42
+            self.assertEqual(detector.detect(big)[0].score, 42.0)
+            # Un lote mayor que las ranuras se envía en varios viajes
+            results = detector.detect_batch([frame_with(i) for i in range(10)])
+            self.assertEqual([r[0].score for r in results], [float(i) for i in range(10)])
+            self.assertIsInstance(results[0][0], FaceBox)
+        finally:
+            detector.close()
+        print("✓ Test 7: Memoria compartida entre procesos - PASSED")
+
+    def test_service_with_process_workers(self):
+        """Prueba 8: El servicio reparte los lotes entre procesos"""
+        service = InferenceService(lambda: SharedMemoryDetector(EchoDetector, slots=8),
+                                   workers=2, max_delay=0.01)
+        futures = [service.submit(frame_with(i)) for i in range(40)]
+        scores = [f.result(30)[0].score for f in futures]
+        stats = service.stats()
+        service.close()
+
+        self.assertEqual(scores, [float(i) for i in range(40)])
+        self.assertGreater(stats["avg_batch"], 1)
+        print("✓ Test 8: Servicio con procesos de detección - PASSED")
+
+
+class TestFairScheduling(unittest.TestCase):
+    """Pruebas del reparto de la inferencia entre cámaras"""
+
+    def test_fair_queue_balances_cpu_time(self):
+        """Prueba 9: La cámara con menos consumo se atiende primero"""
+        queue = FairQueue()
+        for i in range(6):
+            queue.put(("a", i), "a")
+        queue.put(("b", 0), "b")
+        queue.put(("b", 1), "b")
+
+        served = []
+        for _ in range(4):
+            tenant, _ = item = queue.get(timeout=1)
+            served.append(item)
+            queue.charge(tenant, 0.01)
+
+        self.assertEqual([t for t, _ in served], ["a", "b", "a", "b"])
+        self.assertEqual(queue.pending(), {"a": 4, "b": 0})
+
+        # Con doble peso, "c" recibe dos frames por cada uno de "a"
+        for i in range(4):
+            queue.put(("c", i), "c", weight=2.0)
+        order = []
+        for _ in range(6):
+            tenant, _ = queue.get(timeout=1)
+            order.append(tenant)
+            queue.charge(tenant, 0.01)
+        self.assertEqual(order.count("c"), 4)
+
+        # Un peso nulo fallaría en charge(), dentro del hilo del servicio
+        for weight in (0, -1.0):
+            with self.assertRaises(ValueError):
+                queue.put(("d", 0), "d", weight=weight)
+        self.assertNotIn("d", queue.pending())
+        print("✓ Test 9: Reparto por tiempo de inferencia - PASSED")
+
+    def test_busy_camera_does_not_starve_others(self):
+        """Prueba 10: Muchos visores en una cámara no frenan a otra"""
+        service = InferenceService(lambda: EchoDetector(0.005), workers=1, max_batch=1)
+        busy = service.detector(tenant="norte")
+        quiet = service.detector(tenant="sur")
+        stop = threading.Event()
+
+        def viewer():
+            while not stop.is_set():
+                busy.detect(frame_with(1))
+
+        threads = [threading.Thread(target=viewer) for _ in range(6)]
+        for t in threads:
+            t.start()
+        time.sleep(0.05)
+        start = time.perf_counter()
+        for i in range(10):
+            quiet.detect(frame_with(i))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        for t in threads:
+            t.join()
+        stats = service.stats()
+        service.close()
+
+        # Turnos alternos: cada frame de "sur" espera como mucho un frame de "norte"
+        self.assertLess(elapsed, 10 * 0.005 * 2 * 2)
+        self.assertEqual(stats["cameras"]["sur"]["frames"], 10)
+        self.assertIn("norte", stats["cameras"])
+        print(f"✓ Test 10: 10 frames de otra cámara en {elapsed * 1000:.0f} ms - PASSED")
+
+
+if __name__ == '__main__':
+    print("\n" + "="*70)
+    print("PRUEBAS DEL SERVICIO DE INFERENCIA - Sistema de Asistencia")
+    print("="*70 + "\n")
+
+    unittest.main(verbosity=2)
@@ -93,6 +93,243 @@ class URLIntegrationTests(TestCase):
         self.assertIn('liveness_step', data)
         print("✓ Test 6: Get metrics retorna JSON válido - PASSED")
 
+    def test_pipeline_stats_requires_staff(self):
+        """Prueba 18: Estadísticas del pipeline solo para staff"""
+        self.client.login(username='testuser', password='testpass123')
+        response = self.client.get('/pipeline_stats/')
+        self.assertEqual(response.status_code, 302)
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get('/pipeline_stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        print("✓ Test 18: Estadísticas del pipeline restringidas - PASSED")
+
+    def test_metrics_stream_sends_current_state(self):
+        """Prueba 19: El stream SSE de métricas envía el estado actual"""
+        response = self.client.get('/metrics_stream/')
+        self.assertEqual(response.status_code, 302)
+
+        self.client.login(username='testuser', password='testpass123')
+        response = self.client.get('/metrics_stream/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        content = iter(response.streaming_content)
+        first = next(content).decode()
+        response.close()
+        data = json.loads(first.split('data: ')[1])
+        self.assertIn('status', data)
+        self.assertIn('liveness_step', data)
+        print("✓ Test 19: Stream SSE de métricas - PASSED")
+
+    def test_metrics_are_scoped_per_session(self):
+        """Prueba 20: Las métricas de una sesión no afectan a otra"""
+        from core.views import metrics_registry
+
+        self.client.login(username='testuser', password='testpass123')
+        self.client.get('/')
+        otro = Client()
+        otro.login(username='testuser', password='testpass123')
+        otro.get('/')
+
+        metrics_registry.get(self.client.session.session_key).update(status='Validando... (5/30)')
+
+        data = json.loads(self.client.get('/get_metrics/').content)
+        self.assertEqual(data['status'], 'Validando... (5/30)')
+        data = json.loads(otro.get('/get_metrics/').content)
+        self.assertEqual(data['status'], 'Buscando tu rostro...')
+        print("✓ Test 20: Métricas aisladas por sesión - PASSED")
+
+    def test_analyze_frames_returns_liveness_state(self):
+        """Prueba 21: La captura en el navegador recibe solo el estado"""
+        from unittest import mock
+        import cv2
+        import numpy as np
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from core.detection import FaceBox
+
+        class FakeDetector:
+            def detect(self, frame):
+                return [FaceBox(0.25, 0.25, 0.5, 0.5, 0.9)]
+
+            def close(self):
+                pass
+
+        _, jpeg = cv2.imencode('.jpg', np.zeros((240, 320, 3), dtype=np.uint8))
+
+        def frames(count):
+            return [SimpleUploadedFile(f'frame{i}.jpg', jpeg.tobytes(), content_type='image/jpeg')
+                    for i in range(count)]
+
+        response = self.client.post('/analyze_frames/', {'frames': frames(1)})
+        self.assertEqual(response.status_code, 302)
+
+        self.client.login(username='testuser', password='testpass123')
+        self.client.get('/')
+        self.assertEqual(self.client.get('/analyze_frames/').status_code, 405)
+        with mock.patch('core.views.build_detector', return_value=FakeDetector()):
+            response = self.client.post('/analyze_frames/', {'frames': frames(3)})
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual(data['face_count'], 1)
+        self.assertEqual(data['liveness_step'], 2)
+        self.assertEqual(data['box'], [0.25, 0.25, 0.5, 0.5])
+
+        bad = SimpleUploadedFile('frame.jpg', b'no es un jpeg', content_type='image/jpeg')
+        response = self.client.post('/analyze_frames/', {'frames': [bad]})
+        self.assertEqual(response.status_code, 400)
+        print("✓ Test 21: Inferencia de frames del navegador - PASSED")
+
+    def test_bench_stream_replays_without_camera(self):
+        """Prueba 22: bench_stream reproduce frames sintéticos por el stream"""
+        from io import StringIO
+        from unittest import mock
+        from django.core.management import call_command
+        from core.detection import FaceBox
+
+        class FakeDetector:
+            def detect(self, frame):
+                return [FaceBox(0.25, 0.25, 0.5, 0.5, 0.9)]
+
+            def close(self):
+                pass
+
+        out = StringIO()
+        with mock.patch('core.views.build_detector', side_effect=lambda *args: FakeDetector()), \
+                mock.patch('core.views.get_camera') as get_camera:
+            call_command('bench_stream', '--streams', '2', '--frames', '20', '--fps', '200',
+                         '--warmup', '0', '--json', stdout=out)
+        report = json.loads(out.getvalue())
+
+        get_camera.assert_not_called()
+        self.assertEqual(report['streams'], 2)
+        self.assertEqual(list(report['stages']), ['capture', 'inference', 'encode'])
+        self.assertEqual(report['stages']['capture']['processed'], 40)
+        self.assertGreater(report['stages']['inference']['processed'], 0)
+        self.assertGreater(report['sent_fps'], 0)
+        for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+            self.assertIsNotNone(report['stages']['inference'][key])
+        self.assertIn('cpu_ms_per_frame', report)
+        self.assertIn('peak_memory_mb', report)
+        self.assertEqual(Asistencia.objects.count(), 0)
+        print("✓ Test 22: Benchmark del stream sin cámara - PASSED")
+
+    @override_settings(CAMERAS={
+        'norte': {'source': 'synthetic:64x48', 'name': 'Entrada norte'},
+        'sur': {'source': 'synthetic:80x60', 'weight': 2.0},
+    })
+    def test_multiple_cameras(self):
+        """Prueba 23: Cada cámara tiene su URL, su captura y sus métricas"""
+        from core import views
+
+        self.client.login(username='testuser', password='testpass123')
+        response = self.client.get('/?camera=sur')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '/video_feed/sur/')
+        self.assertContains(response, 'Entrada norte')
+        self.assertEqual(self.client.get('/?camera=oeste').status_code, 404)
+        self.assertEqual(self.client.get('/video_feed/oeste/').status_code, 404)
+
+        norte, sur = views.build_camera('norte'), views.build_camera('sur')
+        self.assertIsNot(norte, sur)
+        self.assertIs(views.build_camera(), norte)
+        self.assertEqual(sur.device, 'synthetic:80x60')
+
+        request = response.wsgi_request
+        views.session_metrics(request, 'sur').update(status="Cámara sur")
+        data = json.loads(self.client.get('/get_metrics/?camera=sur').content)
+        self.assertEqual(data['status'], "Cámara sur")
+        data = json.loads(self.client.get('/get_metrics/?camera=norte').content)
+        self.assertNotEqual(data['status'], "Cámara sur")
+        print("✓ Test 23: Varias cámaras - PASSED")
+
+    def test_stream_parts_survive_slow_viewer(self):
+        """Prueba 24: Cada frame sale en una parte propia aunque el visor se atrase"""
+        import time
+        from unittest import mock
+        import cv2
+        import numpy as np
+        from core import views
+        from core.encoding import TurboJPEGEncoder
+        from core.liveness import LivenessValidator
+        from core.metrics import MetricsChannel
+
+        class NoFaceDetector:
+            def detect(self, frame):
+                return []
+
+            def close(self):
+                pass
+
+        class FakeTurboJPEG:
+            def encode(self, img_array, quality=85, pixel_format=None, jpeg_subsample=None, dst=None):
+                _, data = cv2.imencode('.jpg', img_array, [cv2.IMWRITE_JPEG_QUALITY, quality])
+                dst[:data.nbytes] = data.tobytes()
+                return dst, data.nbytes
+
+        def source():
+            for i in range(8):
+                yield np.full((48, 64, 3), 20 + i * 30, dtype=np.uint8)
+                time.sleep(0.02)
+
+        # Un solo buffer reutilizado: el codificador lo pisa con cada frame
+        encoder = TurboJPEGEncoder(slots=1, jpeg=FakeTurboJPEG())
+        user = User.objects.get(username='testuser')
+        levels = []
+        with mock.patch('core.views.build_detector', side_effect=lambda *args: NoFaceDetector()), \
+                mock.patch('core.views.create_encoder', return_value=encoder):
+            for part in views.stream_generator(user, MetricsChannel(), (60, 80, None),
+                                               source=source(), validator=LivenessValidator()):
+                self.assertIsInstance(part, bytes)
+                self.assertTrue(part.startswith(views.FRAME_HEADER))
+                self.assertTrue(part.endswith(views.FRAME_TRAILER))
+                jpeg = np.frombuffer(part[len(views.FRAME_HEADER):-len(views.FRAME_TRAILER)], np.uint8)
+                levels.append(int(round(cv2.imdecode(jpeg, cv2.IMREAD_GRAYSCALE).mean())))
+                # Visor lento: la cola se llena mientras el codificador sigue
+                time.sleep(0.1)
+
+        self.assertGreater(len(levels), 1)
+        # Ninguna parte encolada quedó con la imagen de un frame posterior
+        self.assertEqual(levels, sorted(set(levels)))
+        print("✓ Test 24: Partes del stream con un visor lento - PASSED")
+
+    def test_shared_source_conflict_fails_before_streaming(self):
+        """Prueba 25: Una fuente compartida con opciones distintas falla antes del stream"""
+        from django.core.exceptions import ImproperlyConfigured
+        from core.camera import configured_cameras
+
+        self.client.login(username='testuser', password='testpass123')
+        with override_settings(CAMERAS={
+            'a': {'source': 'synthetic:64x48', 'fps': 10},
+            'b': {'source': 'synthetic:64x48', 'fps': 10, 'name': 'Otra vista'},
+        }):
+            self.assertEqual(set(configured_cameras()), {'a', 'b'})
+        with override_settings(CAMERAS={
+            'a': {'source': 'synthetic:64x48', 'fps': 10},
+            'b': {'source': 'synthetic:64x48', 'fps': 30},
+        }):
+            with self.assertRaisesMessage(ImproperlyConfigured, "'a' y 'b' comparten la fuente"):
+                configured_cameras()
+            # El error sale al resolver la cámara, no con el stream ya iniciado
+            with self.assertRaises(ImproperlyConfigured):
+                self.client.get('/video_feed/b/')
+        print("✓ Test 25: Fuente compartida con opciones distintas - PASSED")
+
+    def test_camera_weight_must_be_positive(self):
+        """Prueba 26: Un peso nulo, negativo o no numérico se rechaza al leer CAMERAS"""
+        from django.core.exceptions import ImproperlyConfigured
+        from core.camera import configured_cameras
+
+        with override_settings(CAMERAS={'a': {'source': 'synthetic:64x48', 'weight': '2.5'}}):
+            self.assertEqual(configured_cameras()['a']['weight'], 2.5)
+        for weight in (0, -1, 'alto', None, float('nan')):
+            with override_settings(CAMERAS={'a': {'source': 'synthetic:64x48', 'weight': weight}}):
+                with self.assertRaisesMessage(ImproperlyConfigured, "'weight' de 'a'"):
+                    configured_cameras()
+        print("✓ Test 26: Peso de cámara validado - PASSED")
+
 
 @override_settings(ALLOWED_HOSTS=['*'])
 class AuthenticationIntegrationTests(TestCase):
@@ -0,0 +1,232 @@
+# ============================================
+# ARCHIVO: tests/test_metrics.py
+# Pruebas de las métricas en tiempo real
+# ============================================
+
+import unittest
+import json
+import threading
+import tempfile
+import sys
+import os
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.metrics import MetricsChannel, MetricsRegistry, sse_events
+from core.metrics_backends import RedisBackend, UnixSocketBackend, create_metrics_backend
+
+
+class TestMetricsChannel(unittest.TestCase):
+    """Pruebas del canal de métricas con notificación de cambios"""
+
+    def test_version_only_advances_on_change(self):
+        """Prueba 1: La versión solo avanza cuando cambia un valor"""
+        channel = MetricsChannel()
+
+        self.assertTrue(channel.update(face_count=1))
+        self.assertFalse(channel.update(face_count=1))
+        self.assertEqual(channel.version, 1)
+        self.assertEqual(channel.snapshot()['face_count'], 1)
+        print("✓ Test 1: Versión solo avanza con cambios - PASSED")
+
+    def test_wait_wakes_on_update(self):
+        """Prueba 2: Los suscriptores despiertan al cambiar las métricas"""
+        channel = MetricsChannel()
+        timer = threading.Timer(0.05, channel.update, kwargs={'status': 'Validando...'})
+        timer.start()
+
+        version, data = channel.wait(0, timeout=5)
+        timer.join()
+
+        self.assertEqual(version, 1)
+        self.assertEqual(data['status'], 'Validando...')
+        self.assertEqual(channel.wait(1, timeout=0.01)[0], 1)
+        print("✓ Test 2: Espera de cambios - PASSED")
+
+
+class TestSSEEvents(unittest.TestCase):
+    """Pruebas del generador de Server-Sent Events"""
+
+    def test_events_only_on_change(self):
+        """Prueba 3: Se envía el estado inicial, keep-alive y luego cada cambio"""
+        channel = MetricsChannel()
+        events = sse_events(channel, keepalive=0.01)
+
+        first = next(events)
+        self.assertTrue(first.startswith('id: 0\n'))
+        self.assertEqual(json.loads(first.split('data: ')[1])['liveness_step'], 1)
+        self.assertEqual(next(events), ': ping\n\n')
+
+        channel.update(liveness_step=2)
+        event = next(events)
+        self.assertTrue(event.startswith('id: 1\n'))
+        self.assertEqual(json.loads(event.split('data: ')[1])['liveness_step'], 2)
+        events.close()
+        print("✓ Test 3: Eventos SSE solo con cambios - PASSED")
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    """Pruebas del registro de métricas por sesión"""
+
+    def test_channels_are_isolated_per_session(self):
+        """Prueba 4: Cada sesión tiene su propio canal"""
+        registry = MetricsRegistry(shards=4)
+        a = registry.get('kiosco-a')
+        b = registry.get('kiosco-b')
+        a.update(status='Validando...')
+
+        self.assertIs(registry.get('kiosco-a'), a)
+        self.assertIsNot(a, b)
+        self.assertNotEqual(b.snapshot()['status'], 'Validando...')
+        print("✓ Test 4: Canales aislados por sesión - PASSED")
+
+    def test_concurrent_kiosks(self):
+        """Prueba 5: Cientos de kioscos actualizan sus métricas en paralelo"""
+        registry = MetricsRegistry(shards=16)
+
+        def kiosk(i):
+            channel = registry.get(f'kiosco-{i}')
+            for step in range(50):
+                channel.update(face_count=i, liveness_step=step)
+
+        threads = [threading.Thread(target=kiosk, args=(i,)) for i in range(200)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(registry), 200)
+        for i in range(200):
+            data = registry.get(f'kiosco-{i}').snapshot()
+            self.assertEqual(data['face_count'], i)
+            self.assertEqual(data['liveness_step'], 49)
+        print("✓ Test 5: Kioscos concurrentes - PASSED")
+
+    def test_idle_channels_are_pruned(self):
+        """Prueba 6: Los canales sin uso se eliminan"""
+        registry = MetricsRegistry(shards=1, max_idle=0)
+        registry.get('viejo')
+        registry.get('nuevo')
+
+        self.assertEqual(len(registry), 1)
+        print("✓ Test 6: Canales inactivos eliminados - PASSED")
+
+
+class FakeRedis:
+    """Doble mínimo de un cliente Redis en memoria"""
+
+    def __init__(self):
+        self.hashes = {}
+        self.cond = threading.Condition()
+
+    def hset(self, name, mapping):
+        self.hashes.setdefault(name, {}).update({k.encode(): v.encode() for k, v in mapping.items()})
+
+    def hincrby(self, name, field, amount):
+        data = self.hashes.setdefault(name, {})
+        value = int(data.get(field.encode(), 0)) + amount
+        data[field.encode()] = str(value).encode()
+        return value
+
+    def expire(self, name, seconds):
+        return True
+
+    def hgetall(self, name):
+        return dict(self.hashes.get(name, {}))
+
+    def publish(self, channel, message):
+        with self.cond:
+            self.cond.notify_all()
+
+    def pipeline(self):
+        client = self
+
+        class Pipeline:
+            def __init__(self):
+                self.calls = []
+
+            def __getattr__(self, name):
+                return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+            def execute(self):
+                return [getattr(client, n)(*a, **k) for n, a, k in self.calls]
+
+        return Pipeline()
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        client = self
+
+        class PubSub:
+            def subscribe(self, name):
+                pass
+
+            def get_message(self, timeout=None):
+                with client.cond:
+                    client.cond.wait(timeout)
+
+            def close(self):
+                pass
+
+        return PubSub()
+
+
+class TestMetricsBackends(unittest.TestCase):
+    """Pruebas de los backends compartidos entre workers"""
+
+    def test_unix_socket_backend_shared_between_workers(self):
+        """Prueba 7: Dos workers comparten métricas por socket Unix"""
+        path = os.path.join(tempfile.mkdtemp(), 'metrics.sock')
+        worker_stream = UnixSocketBackend(path)
+        worker_metrics = UnixSocketBackend(path)
+
+        channel = worker_stream.get('kiosco-1')
+        self.assertTrue(channel.update(status='Validando...', liveness_step=3))
+        self.assertFalse(channel.update(status='Validando...'))
+
+        version, data = worker_metrics.get('kiosco-1').state()
+        self.assertEqual(data['status'], 'Validando...')
+        self.assertEqual(data['liveness_step'], 3)
+        self.assertIsNotNone(worker_stream.server)
+        self.assertIsNone(worker_metrics.server)
+
+        timer = threading.Timer(0.05, channel.update, kwargs={'status': 'Asistencia Registrada'})
+        timer.start()
+        new_version, data = worker_metrics.get('kiosco-1').wait(version, timeout=5)
+        timer.join()
+        self.assertGreater(new_version, version)
+        self.assertEqual(data['status'], 'Asistencia Registrada')
+        worker_stream.server.shutdown()
+        worker_stream.server.server_close()
+        print("✓ Test 7: Backend por socket Unix - PASSED")
+
+    def test_redis_backend_with_stub_client(self):
+        """Prueba 8: Backend Redis con un cliente simulado"""
+        backend = RedisBackend(client=FakeRedis())
+        channel = backend.get('kiosco-1')
+
+        self.assertEqual(channel.state(), (0, channel.snapshot()))
+        channel.update(face_count=1, status='¡Hola! Por favor, gira tu rostro')
+        version, data = backend.get('kiosco-1').state()
+        self.assertEqual(version, 1)
+        self.assertEqual(data['face_count'], 1)
+
+        events = sse_events(backend.get('kiosco-1'), keepalive=0.01)
+        self.assertTrue(next(events).startswith('id: 1\n'))
+        self.assertEqual(next(events), ': ping\n\n')
+        print("✓ Test 8: Backend Redis simulado - PASSED")
+
+    def test_memory_backend_is_default(self):
+        """Prueba 9: El backend por defecto es el registro en memoria"""
+        self.assertIsInstance(create_metrics_backend(), MetricsRegistry)
+        with self.assertRaises(ValueError):
+            create_metrics_backend('desconocido')
+        print("✓ Test 9: Backend en memoria por defecto - PASSED")
+
+
+if __name__ == '__main__':
+    print("\n" + "="*70)
+    print("PRUEBAS DE MÉTRICAS - Sistema de Asistencia")
+    print("="*70 + "\n")
+
+    unittest.main(verbosity=2)
@@ -0,0 +1,160 @@
+# ============================================
+# ARCHIVO: tests/test_pipeline.py
+# Pruebas del pipeline de frames y de la prueba de vida
+# ============================================
+
+import unittest
+import time
+import sys
+import os
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.pipeline import DropOldestQueue, FramePipeline, QueueClosed, StageStats, percentile
+from core.liveness import LivenessValidator
+
+
+class TestDropOldestQueue(unittest.TestCase):
+    """Pruebas de la cola acotada"""
+
+    def test_drops_oldest_when_full(self):
+        """Prueba 1: La cola descarta el elemento más antiguo"""
+        q = DropOldestQueue(maxsize=2)
+        for i in range(5):
+            q.put(i)
+
+        self.assertEqual(len(q), 2)
+        self.assertEqual(q.dropped, 3)
+        self.assertEqual(q.get(), 3)
+        self.assertEqual(q.get(), 4)
+        print("✓ Test 1: Cola descarta el más antiguo - PASSED")
+
+    def test_closed_queue_drains_then_raises(self):
+        """Prueba 2: Una cola cerrada entrega lo pendiente y luego termina"""
+        q = DropOldestQueue(maxsize=2)
+        q.put('a')
+        q.close()
+
+        self.assertFalse(q.put('b'))
+        self.assertEqual(q.get(), 'a')
+        with self.assertRaises(QueueClosed):
+            q.get()
+        with self.assertRaises(TimeoutError):
+            DropOldestQueue().get(timeout=0.01)
+        print("✓ Test 2: Cola cerrada - PASSED")
+
+
+class TestFramePipeline(unittest.TestCase):
+    """Pruebas del pipeline por etapas"""
+
+    def test_stages_process_in_order(self):
+        """Prueba 3: Las etapas se aplican en orden y terminan con la fuente"""
+        pipeline = FramePipeline(iter(range(3)), [
+            ('double', lambda x: x * 2),
+            ('str', str),
+        ], maxsize=10)
+
+        self.assertEqual(list(pipeline), ['0', '2', '4'])
+        stats = pipeline.stats()
+        self.assertEqual(list(stats), ['capture', 'double', 'str'])
+        self.assertEqual(stats['double']['processed'], 3)
+        self.assertIn('latency_ms', stats['str'])
+        self.assertIn('queue_depth', stats['capture'])
+        print("✓ Test 3: Etapas en orden - PASSED")
+
+    def test_slow_consumer_does_not_block_capture(self):
+        """Prueba 4: Un consumidor lento descarta frames en vez de frenar la captura"""
+        def slow(x):
+            time.sleep(0.02)
+            return x
+
+        pipeline = FramePipeline(iter(range(50)), [('slow', slow)], maxsize=1)
+        results = list(pipeline)
+
+        self.assertLess(len(results), 50)
+        self.assertEqual(results[-1], 49)
+        self.assertGreater(pipeline.stats()['capture']['dropped'], 0)
+        print("✓ Test 4: Captura no se bloquea - PASSED")
+
+    def test_close_stops_source(self):
+        """Prueba 5: Cerrar el pipeline detiene la fuente"""
+        closed = []
+
+        def source():
+            try:
+                while True:
+                    time.sleep(0.001)
+                    yield 1
+            finally:
+                closed.append(True)
+
+        pipeline = FramePipeline(source(), [('id', lambda x: x)])
+        iterator = iter(pipeline)
+        next(iterator)
+        iterator.close()
+        time.sleep(0.1)
+
+        self.assertEqual(closed, [True])
+        print("✓ Test 5: Cierre del pipeline - PASSED")
+
+
+class TestStageStats(unittest.TestCase):
+    """Pruebas de los percentiles de latencia"""
+
+    def test_latency_percentiles(self):
+        """Prueba 8: Las estadísticas incluyen p50/p95/p99 de la ventana reciente"""
+        stats = StageStats(window=100)
+        for ms in range(1, 201):
+            stats.record(ms / 1000)
+
+        snapshot = stats.snapshot()
+        self.assertEqual(snapshot['processed'], 200)
+        self.assertEqual(len(stats.samples()), 100)
+        self.assertEqual(snapshot['p50_latency_ms'], 150.0)
+        self.assertEqual(snapshot['p95_latency_ms'], 195.0)
+        self.assertEqual(snapshot['p99_latency_ms'], 199.0)
+        self.assertIsNone(percentile([], 50))
+        self.assertIsNone(StageStats().snapshot()['p99_latency_ms'])
+        print("✓ Test 8: Percentiles de latencia - PASSED")
+
+
+class TestLivenessValidator(unittest.TestCase):
+    """Pruebas de la máquina de estados de prueba de vida"""
+
+    def test_full_liveness_flow_registers_once(self):
+        """Prueba 6: Mover y quedarse quieto registra la asistencia"""
+        registros = []
+        validator = LivenessValidator(on_register=lambda: registros.append(1))
+
+        validator.update((100, 100))
+        self.assertEqual(validator.liveness_step, 2)
+        status, _ = validator.update((105, 100))
+        self.assertEqual(status, "Por favor, mueve un poco tu rostro")
+        validator.update((150, 100))
+        self.assertEqual(validator.liveness_step, 3)
+        for _ in range(LivenessValidator.STILL_FRAMES + 1):
+            status, _ = validator.update((150, 100))
+
+        self.assertEqual(status, "Asistencia Registrada")
+        self.assertEqual(validator.liveness_step, 4)
+        validator.update((150, 100))
+        self.assertEqual(registros, [1])
+        print("✓ Test 6: Flujo de prueba de vida - PASSED")
+
+    def test_already_registered(self):
+        """Prueba 7: Asistencia ya registrada no avanza el estado"""
+        validator = LivenessValidator(asistencia_registrada=True)
+        status, _ = validator.update((100, 100))
+
+        self.assertEqual(status, "Asistencia ya registrada")
+        self.assertEqual(validator.liveness_step, 1)
+        print("✓ Test 7: Asistencia ya registrada - PASSED")
+
+
+if __name__ == '__main__':
+    print("\n" + "="*70)
+    print("PRUEBAS DEL PIPELINE DE FRAMES - Sistema de Asistencia")
+    print("="*70 + "\n")
+
+    unittest.main(verbosity=2)
@@ -0,0 +1,337 @@
+# ============================================
+# ARCHIVO: tests/test_recognition.py
+# Pruebas del reconocimiento facial
+# ============================================
+
+import os
+import sys
+import django
+
+# Configurar Django antes de importar modelos
+if __name__ == '__main__':
+    # Agregar el directorio raíz al path
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+    # Configurar settings de Django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'asistencia_project.settings')
+    django.setup()
+
+import shutil
+import tempfile
+import cv2
+import numpy as np
+from unittest import mock
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.contrib.auth.models import User
+from core.detection import FaceBox
+from core.liveness import RegistroRechazado
+from core.metrics import MetricsChannel
+from core.models import Asistencia, FaceEmbedding
+from core.recognition import (
+    EmbeddingIndex, EmbeddingStore, FaceRecognizer, LBPEmbedder, StoredFaceIndex, enroll_user,
+    load_index, normalize,
+)
+
+
+def face_image(seed, size=96):
+    """Imagen con textura determinista: dos semillas distintas son dos "personas"."""
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 255, (12, 12), dtype=np.uint8)
+    gray = cv2.resize(small, (size, size), interpolation=cv2.INTER_CUBIC)
+    return cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+
+
+class CenterDetector:
+    """Detector simulado: un rostro en el centro de la imagen"""
+
+    def detect(self, frame):
+        return [FaceBox(0.2, 0.2, 0.6, 0.6, 0.9)]
+
+    def close(self):
+        pass
+
+
+class PixelEmbedder:
+    """Embedder simulado: el vector codifica el primer píxel del recorte"""
+
+    name = "pixel"
+    dim = 2
+    default_threshold = 0.99
+
+    def embed(self, face):
+        angle = float(face[0, 0, 0]) / 255 * np.pi / 2
+        return normalize([np.cos(angle), np.sin(angle)])
+
+
+class TestEmbeddingIndex(SimpleTestCase):
+    """Pruebas del índice vectorizado"""
+
+    def test_search_upsert_remove(self):
+        """Prueba 1: Búsqueda coseno, altas y bajas"""
+        vectors = np.eye(3, dtype=np.float32)
+        index = EmbeddingIndex(3, [10, 20, 30], vectors * 5)
+
+        self.assertEqual(index.search([0.1, 1, 0], 1)[0][0], 20)
+        self.assertEqual([uid for uid, _ in index.search([0.2, 1, 0.5], 3)], [20, 30, 10])
+        self.assertEqual(index.match([0, 0, 1], 0.9), (30, 1.0))
+        self.assertIsNone(index.match([1, 1, 1], 0.9)[0])
+
+        index.upsert(40, [1, 1, 0])
+        index.upsert(10, [0, 1, 1])
+        self.assertEqual(len(index), 4)
+        self.assertEqual(index.search([1, 1, 0], 1)[0][0], 40)
+        self.assertEqual(index.search([0, 1, 1], 1)[0][0], 10)
+
+        index.remove(20)
+        self.assertNotIn(20, index)
+        self.assertIn(index.search([0, 1, 0], 1)[0][0], (10, 40))
+        self.assertEqual(EmbeddingIndex(3).search([1, 0, 0]), [])
+        print("✓ Test 1: Índice de vectores - PASSED")
+
+    def test_lbp_embedder_separates_faces(self):
+        """Prueba 2: El embedding LBP es más parecido para la misma persona"""
+        embedder = LBPEmbedder()
+        a, b = face_image(1), face_image(2)
+        noisy = np.clip(a.astype(np.int16) + np.random.default_rng(3).integers(-6, 6, a.shape), 0, 255)
+
+        va, vb, vn = embedder.embed(a), embedder.embed(b), embedder.embed(noisy.astype(np.uint8))
+        self.assertEqual(va.shape, (embedder.dim,))
+        self.assertAlmostEqual(float(np.linalg.norm(va)), 1.0, places=5)
+        self.assertGreater(float(va @ vn), float(va @ vb))
+        print("✓ Test 2: Embedding LBP - PASSED")
+
+    def test_recognizer_votes(self):
+        """Prueba 3: La identidad se decide por mayoría de muestras"""
+        index = EmbeddingIndex(2, [7, 8], [PixelEmbedder().embed(np.full((1, 1, 3), v, np.uint8))
+                                          for v in (0, 255)])
+        recognizer = FaceRecognizer(index, PixelEmbedder(), samples=3, interval=1)
+        frame = np.zeros((100, 100, 3), dtype=np.uint8)
+        box = (20, 20, 60, 60)
+
+        for _ in range(5):
+            recognizer.observe(frame, box)
+        self.assertEqual(len(recognizer.votes), 3)
+        self.assertEqual(recognizer.identity(), 7)
+
+        recognizer.reset()
+        recognizer.observe(frame, box)
+        recognizer.observe(np.full_like(frame, 255), box)
+        self.assertIsNone(recognizer.identity())
+        print("✓ Test 3: Votación de identidad - PASSED")
+
+
+class EnrollmentTest(TestCase):
+    """Pruebas del enrolamiento desde la foto de perfil"""
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.media, FACE_EMBEDDINGS_DIR=os.path.join(self.media, 'embeddings'),
+        )
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media, ignore_errors=True)
+
+    def test_enroll_profile_photo(self):
+        """Prueba 4: La foto de perfil se convierte en un vector buscable"""
+        embedder = LBPEmbedder()
+        users = []
+        for seed in (1, 2):
+            user = User.objects.create_user(username=f'alumno{seed}', password='pass123')
+            _, png = cv2.imencode('.png', face_image(seed, 160))
+            user.profile.foto_perfil = SimpleUploadedFile(f'alumno{seed}.png', png.tobytes())
+            user.profile.save()
+            users.append(user)
+        sin_foto = User.objects.create_user(username='sinfoto', password='pass123')
+
+        for user in users:
+            self.assertIsNotNone(enroll_user(user, CenterDetector(), embedder))
+        self.assertIsNone(enroll_user(sin_foto, CenterDetector(), embedder))
+        self.assertEqual(FaceEmbedding.objects.filter(modelo='lbp').count(), 2)
+
+        index = load_index('lbp', embedder.dim)
+        self.assertEqual(len(index), 2)
+        frame = face_image(2, 160)
+        face = frame[16:144, 16:144]
+        self.assertEqual(index.search(embedder.embed(face), 1)[0][0], users[1].pk)
+        print("✓ Test 4: Enrolamiento desde la foto de perfil - PASSED")
+
+    def test_store_mmap_rows(self):
+        """Prueba 6: El almacén se mapea en memoria y se actualiza por filas"""
+        store = EmbeddingStore(os.path.join(self.media, 'embeddings'), 'prueba', 3)
+        self.assertIsNone(store.load())
+        store.write_all([10, 20], np.eye(3, dtype=np.float32)[:2] * 4)
+
+        index = store.load()
+        self.assertIsInstance(index._snapshot[0], np.memmap)
+        self.assertEqual(index.match([1, 0, 0], 0.9), (10, 1.0))
+
+        # Cambiar un vector existente se ve sin volver a cargar
+        version = store.version()
+        store.upsert(10, [0, 0, 1])
+        self.assertEqual(store.version(), version)
+        self.assertEqual(index.match([0, 0, 1], 0.9), (10, 1.0))
+
+        # Las altas crecen la capacidad; las bajas mueven la última fila
+        for user_id in range(100, 120):
+            store.upsert(user_id, [1, 1, user_id])
+        store.remove(20)
+        self.assertNotEqual(store.version(), version)
+        index = store.load()
+        self.assertEqual(len(index), 21)
+        self.assertNotIn(20, index)
+        self.assertEqual(index.search([1, 1, 119], 1)[0][0], 119)
+        self.assertEqual(index.match([0, 0, 1], 0.9)[0], 10)
+        print("✓ Test 6: Almacén mapeado en memoria - PASSED")
+
+    @override_settings(FACE_RECOGNITION_MODE='identify', FACE_EMBEDDER_BACKEND='lbp')
+    def test_profile_photo_change_refreshes_row(self):
+        """Prueba 7: Cambiar la foto de perfil recalcula solo ese vector"""
+        users = [User.objects.create_user(username=f'alumno{seed}', password='pass123') for seed in (1, 2)]
+        with mock.patch('core.recognition._embedder', None), \
+                mock.patch('core.recognition._index', None), \
+                mock.patch('core.recognition._enrollment_detector', return_value=CenterDetector()):
+            for seed, user in zip((1, 2), users):
+                _, png = cv2.imencode('.png', face_image(seed, 160))
+                user.profile.foto_perfil = SimpleUploadedFile(f'alumno{seed}.png', png.tobytes())
+                user.profile.save()
+            self.assertEqual(FaceEmbedding.objects.count(), 2)
+
+            from core.recognition import get_embedder, get_face_index
+
+            index = get_face_index()
+            self.assertIsInstance(index, StoredFaceIndex)
+            embedder = get_embedder()
+            face = face_image(3, 160)[16:144, 16:144]
+            self.assertNotEqual(index.search(embedder.embed(face), 1)[0][0], users[0].pk)
+
+            # Guardar sin cambiar la foto no recalcula nada
+            actualizado = users[1].face_embedding.actualizado
+            users[1].profile.save()
+            self.assertEqual(FaceEmbedding.objects.get(user=users[1]).actualizado, actualizado)
+
+            _, png = cv2.imencode('.png', face_image(3, 160))
+            users[0].profile.foto_perfil = SimpleUploadedFile('nueva.png', png.tobytes())
+            users[0].profile.save()
+            self.assertEqual(index.search(embedder.embed(face), 1)[0][0], users[0].pk)
+
+            users[1].delete()
+            index.check_interval = 0
+            self.assertEqual(len(index), 1)
+            self.assertNotIn(users[1].pk, index)
+        print("✓ Test 7: Actualización al cambiar la foto de perfil - PASSED")
+
+    @override_settings(FACE_RECOGNITION_MODE='identify', FACE_EMBEDDER_BACKEND='lbp')
+    def test_faceless_photo_drops_embedding(self):
+        """Prueba 8: Una foto nueva sin rostro deja de reconocer al usuario"""
+        user = User.objects.create_user(username='alumno1', password='pass123')
+        detector = mock.Mock(wraps=CenterDetector())
+        with mock.patch('core.recognition._embedder', None), \
+                mock.patch('core.recognition._index', None), \
+                mock.patch('core.recognition._enrollment_detector', return_value=detector):
+            _, png = cv2.imencode('.png', face_image(1, 160))
+            user.profile.foto_perfil = SimpleUploadedFile('alumno1.png', png.tobytes())
+            user.profile.save()
+
+            from core.recognition import get_embedder, get_face_index
+
+            embedder = get_embedder()
+            index = get_face_index()
+            index.check_interval = 0
+            face = face_image(1, 160)[16:144, 16:144]
+            self.assertEqual(index.match(embedder.embed(face), 0.9)[0], user.pk)
+
+            detector.detect.side_effect = lambda frame: []
+            user.profile.foto_perfil = SimpleUploadedFile('sin_rostro.png', png.tobytes())
+            user.profile.save()
+
+            self.assertFalse(FaceEmbedding.objects.filter(user=user).exists())
+            self.assertNotIn(user.pk, index)
+            self.assertIsNone(index.match(embedder.embed(face), 0.9)[0])
+        print("✓ Test 8: Foto sin rostro quita el vector - PASSED")
+
+
+class RecognitionRegistrationTest(TransactionTestCase):
+    """Pruebas del registro según la identidad reconocida"""
+
+    class StubRecognizer:
+        def __init__(self, identity, mode):
+            self._identity = identity
+            self.mode = mode
+            self.resets = 0
+
+        def identity(self):
+            return self._identity
+
+        def reset(self):
+            self.resets += 1
+
+        def observe(self, frame, box):
+            pass
+
+    def test_identify_and_verify_modes(self):
+        """Prueba 5: 'identify' registra al reconocido y 'verify' rechaza a otro"""
+        from core.views import build_validator
+
+        kiosco = User.objects.create_user(username='kiosco', password='pass123')
+        alumno = User.objects.create_user(username='alumno', password='pass123')
+
+        validator = build_validator(kiosco, MetricsChannel(), self.StubRecognizer(alumno.pk, 'identify'))
+        validator.on_register().result(5)
+        self.assertTrue(Asistencia.objects.filter(user=alumno).exists())
+        self.assertFalse(Asistencia.objects.filter(user=kiosco).exists())
+
+        validator = build_validator(kiosco, MetricsChannel(), self.StubRecognizer(alumno.pk, 'verify'))
+        with self.assertRaises(RegistroRechazado):
+            validator.on_register().result(5)
+
+        validator = build_validator(kiosco, MetricsChannel(), self.StubRecognizer(None, 'identify'))
+        with self.assertRaises(RegistroRechazado):
+            validator.on_register().result(5)
+        self.assertFalse(Asistencia.objects.filter(user=kiosco).exists())
+        print("✓ Test 5: Registro según la identidad reconocida - PASSED")
+
+    def test_mismatch_reason_reaches_kiosk(self):
+        """Prueba 9: El kiosco muestra por qué no se registró al rostro ajeno"""
+        from core.kiosk import analyze_frame
+        from core.views import build_validator
+
+        class MovingDetector:
+            x = 0.2
+
+            def detect(self, frame):
+                return [FaceBox(self.x, 0.2, 0.4, 0.4, 0.9)]
+
+        kiosco = User.objects.create_user(username='kiosco', password='pass123')
+        alumno = User.objects.create_user(username='alumno', password='pass123')
+        recognizer = self.StubRecognizer(alumno.pk, 'verify')
+        metrics = MetricsChannel()
+        validator = build_validator(kiosco, metrics, recognizer)
+        detector = MovingDetector()
+        frame = np.zeros((100, 100, 3), dtype=np.uint8)
+
+        analyze_frame(frame, detector, validator, metrics, recognizer)
+        detector.x = 0.5
+        statuses = [analyze_frame(frame, detector, validator, metrics, recognizer)[1]
+                    for _ in range(validator.STILL_FRAMES + 5)]
+
+        motivo = "El rostro no coincide con el usuario"
+        self.assertIn(motivo, statuses)
+        self.assertNotIn("Error al registrar la asistencia", statuses)
+        self.assertEqual(metrics.snapshot()['status'], motivo)
+        self.assertEqual(validator.liveness_step, 1)
+        self.assertFalse(Asistencia.objects.exists())
+        print("✓ Test 9: Motivo del rechazo visible en el kiosco - PASSED")
+
+
+if __name__ == '__main__':
+    import unittest
+
+    print("\n" + "="*70)
+    print("PRUEBAS DE RECONOCIMIENTO FACIAL - Sistema de Asistencia")
+    print("="*70 + "\n")
+
+    unittest.main(verbosity=2)
@@ -0,0 +1,131 @@
+# ============================================
+# ARCHIVO: tests/test_reports.py
+# Pruebas del reporte de asistencias
+# ============================================
+
+import os
+import sys
+import django
+
+# Configurar Django antes de importar modelos
+if __name__ == '__main__':
+    # Agregar el directorio raíz al path
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+    # Configurar settings de Django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'asistencia_project.settings')
+    django.setup()
+
+import datetime
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth.models import User
+from core.models import Asistencia
+from core.reports import date_range, decode_cursor, encode_cursor
+
+
+class TestReportParams(SimpleTestCase):
+    """Pruebas de los parámetros del reporte"""
+
+    def test_date_range_and_cursor(self):
+        """Prueba 1: Rango de fechas y cursor opaco"""
+        today = datetime.date(2026, 10, 17)
+        self.assertEqual(date_range({}, today), (datetime.date(2026, 9, 18), today))
+        self.assertEqual(date_range({'days': '7'}, today), (datetime.date(2026, 10, 11), today))
+        self.assertEqual(date_range({'start': '2026-10-01', 'end': '2026-10-05'}, today),
+                         (datetime.date(2026, 10, 1), datetime.date(2026, 10, 5)))
+        for params in ({'days': '0'}, {'days': 'x'}, {'start': '2026-10-05', 'end': '2026-10-01'},
+                       {'start': '01/10/2026'}, {'days': '500'}):
+            with self.assertRaises(ValueError):
+                date_range(params, today)
+
+        self.assertEqual(decode_cursor(encode_cursor(["2026-10-17T08:00:00+00:00", 42])),
+                         ["2026-10-17T08:00:00+00:00", 42])
+        with self.assertRaises(ValueError):
+            decode_cursor("no-es-un-cursor")
+        print("✓ Test 1: Parámetros del reporte - PASSED")
+
+
+class AttendanceReportTest(TestCase):
+    """Pruebas del endpoint de reportes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='admin', password='pass123', is_staff=True)
+        cls.users = [User.objects.create_user(username=f'alumno{i}', password='pass123') for i in range(3)]
+        today = timezone.localdate()
+        rows = []
+        for day in range(10):
+            fecha = today - datetime.timedelta(days=day)
+            for i, user in enumerate(cls.users):
+                if i == 2 and day % 2:
+                    continue
+                rows.append(Asistencia(user=user, fecha=fecha))
+        Asistencia.objects.bulk_create(rows)
+        # Mismo instante para todos los alumnos de un día: desempata el id
+        for asistencia in Asistencia.objects.all():
+            moment = datetime.datetime.combine(asistencia.fecha, datetime.time(8, 0))
+            Asistencia.objects.filter(pk=asistencia.pk).update(
+                fecha_hora=timezone.make_aware(moment))
+
+    def get(self, login, **params):
+        self.client.force_login(login)
+        return self.client.get(reverse('attendance_report'), params)
+
+    def test_records_keyset_pagination(self):
+        """Prueba 2: Los registros se paginan por cursor sin repetir ni saltar filas"""
+        seen, cursor, pages = [], None, 0
+        while True:
+            params = {'days': 30, 'limit': 7}
+            if cursor:
+                params['cursor'] = cursor
+            data = self.get(self.admin, **params).json()
+            seen.extend(record['id'] for record in data['results'])
+            pages += 1
+            cursor = data['next']
+            if not cursor:
+                break
+
+        expected = list(Asistencia.objects.order_by('-fecha_hora', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+        self.assertEqual(pages, 4)
+
+        # Un alumno solo ve sus registros aunque pida los de otro
+        data = self.get(self.users[0], view='records', days=7, user='alumno1').json()
+        self.assertEqual({record['username'] for record in data['results']}, {'alumno0'})
+        self.assertEqual(len(data['results']), 7)
+        self.assertEqual(data['results'][0]['time'], '08:00:00')
+        print("✓ Test 2: Paginación por cursor - PASSED")
+
+    def test_daily_and_user_aggregates(self):
+        """Prueba 3: Totales por día y por usuario calculados en la base de datos"""
+        data = self.get(self.admin, view='daily', days=10).json()
+        self.assertEqual(len(data['results']), 10)
+        today = data['results'][0]
+        self.assertEqual(today['date'], timezone.localdate().isoformat())
+        self.assertEqual((today['attendances'], today['users']), (3, 3))
+        self.assertEqual(data['results'][1]['attendances'], 2)
+
+        first = self.get(self.admin, view='users', days=10, limit=2).json()
+        rest = self.get(self.admin, view='users', days=10, limit=2, cursor=first['next']).json()
+        totals = {row['username']: row['attendances'] for row in first['results'] + rest['results']}
+        self.assertEqual(totals, {'alumno0': 10, 'alumno1': 10, 'alumno2': 5})
+        self.assertIsNone(rest['next'])
+
+        self.assertEqual(self.get(self.admin, view='users', user='alumno2').json()['results'][0]['attendances'], 5)
+        self.assertEqual(self.get(self.admin, view='otra').status_code, 400)
+        self.assertEqual(self.get(self.admin, cursor='roto').status_code, 400)
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('attendance_report')).status_code, 302)
+        print("✓ Test 3: Totales por día y por usuario - PASSED")
+
+
+if __name__ == '__main__':
+    import unittest
+
+    print("\n" + "="*70)
+    print("PRUEBAS DE REPORTES DE ASISTENCIA - Sistema de Asistencia")
+    print("="*70 + "\n")
+
+    unittest.main(verbosity=2)
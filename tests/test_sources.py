@@ -0,0 +1,125 @@
+# ============================================
+# ARCHIVO: tests/test_sources.py
+# Pruebas de las fuentes de frames
+# ============================================
+
+import unittest
+import tempfile
+import shutil
+import time
+import cv2
+import numpy as np
+import sys
+import os
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.camera import CameraService
+from core.sources import (
+    ImageDirectoryCapture, SyntheticCapture, VideoFileCapture, open_source, source_kind,
+)
+
+
+def frame_with(value, width=64, height=48):
+    return np.full((height, width, 3), value, dtype=np.uint8)
+
+
+class TestFrameSources(unittest.TestCase):
+    """Pruebas de la selección y lectura de fuentes"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_source_kind(self):
+        """Prueba 1: La especificación elige el tipo de fuente"""
+        self.assertEqual(source_kind(0), "device")
+        self.assertEqual(source_kind("1"), "device")
+        self.assertEqual(source_kind("rtsp://10.0.0.5/stream"), "url")
+        self.assertEqual(source_kind("synthetic:320x240"), "synthetic")
+        self.assertEqual(source_kind(self.tmp), "directory")
+        self.assertEqual(source_kind(os.path.join(self.tmp, "video.mp4")), "file")
+        print("✓ Test 1: Tipos de fuente - PASSED")
+
+    def test_image_directory_in_order_and_loops(self):
+        """Prueba 2: Un directorio se reproduce en orden y en bucle"""
+        for value in (30, 10, 20):
+            cv2.imwrite(os.path.join(self.tmp, f"{value:03d}.png"), frame_with(value))
+        with open(os.path.join(self.tmp, "notas.txt"), "w") as f:
+            f.write("no es una imagen")
+
+        cap = open_source(self.tmp, width=32, fps=0)
+        self.assertIsInstance(cap, ImageDirectoryCapture)
+        values = []
+        for _ in range(4):
+            success, frame = cap.read()
+            self.assertTrue(success)
+            self.assertEqual(frame.shape, (24, 32, 3))
+            values.append(int(frame[0, 0, 0]))
+        cap.release()
+
+        self.assertEqual(values, [10, 20, 30, 10])
+        cap = open_source(self.tmp, loop=False, fps=0)
+        self.assertEqual([cap.read()[0] for _ in range(4)], [True, True, True, False])
+        print("✓ Test 2: Directorio de imágenes - PASSED")
+
+    def test_video_file_paced_and_looped(self):
+        """Prueba 3: Un video se entrega a su velocidad y vuelve a empezar"""
+        path = os.path.join(self.tmp, "clip.avi")
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 50, (64, 48))
+        for value in (0, 100, 200):
+            writer.write(frame_with(value))
+        writer.release()
+
+        cap = open_source(path)
+        self.assertIsInstance(cap, VideoFileCapture)
+        start = time.monotonic()
+        frames = [cap.read() for _ in range(5)]
+        elapsed = time.monotonic() - start
+        cap.release()
+
+        self.assertTrue(all(success for success, _ in frames))
+        self.assertGreaterEqual(elapsed, 4 / 50 * 0.9)
+
+        cap = open_source(path, loop=False, fps=0)
+        read = [cap.read()[0] for _ in range(4)]
+        cap.release()
+        self.assertEqual(read, [True, True, True, False])
+        self.assertFalse(open_source(os.path.join(self.tmp, "falta.mp4")).isOpened())
+        print("✓ Test 3: Video reproducido a su velocidad - PASSED")
+
+    def test_synthetic_source(self):
+        """Prueba 4: Los frames sintéticos tienen el tamaño pedido y cambian"""
+        cap = open_source("synthetic:160x120", fps=0)
+        self.assertIsInstance(cap, SyntheticCapture)
+        _, first = cap.read()
+        _, second = cap.read()
+
+        self.assertEqual(first.shape, (120, 160, 3))
+        self.assertFalse(np.array_equal(first, second))
+        with self.assertRaises(ValueError):
+            open_source("synthetic:grande")
+        print("✓ Test 4: Fuente sintética - PASSED")
+
+    def test_camera_service_uses_source_options(self):
+        """Prueba 5: El servicio de captura abre la fuente con sus opciones"""
+        service = CameraService("synthetic:80x60", options={'fps': 200})
+        frames = service.frames()
+        frame = next(frames)
+        frames.close()
+        service.stop(timeout=2)
+
+        self.assertEqual(frame.shape, (60, 80, 3))
+        self.assertIsNone(service.error)
+        print("✓ Test 5: Servicio de captura sobre la fuente - PASSED")
+
+
+if __name__ == '__main__':
+    print("\n" + "="*70)
+    print("PRUEBAS DE FUENTES DE FRAMES - Sistema de Asistencia")
+    print("="*70 + "\n")
+
+    unittest.main(verbosity=2)
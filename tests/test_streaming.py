@@ -0,0 +1,117 @@
+# ============================================
+# ARCHIVO: tests/test_streaming.py
+# Pruebas del control adaptativo del stream de video
+# ============================================
+
+import unittest
+import numpy as np
+import sys
+import os
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.encoding import OpenCVEncoder
+from core.streaming import AdaptiveStreamController, FrameDiffGate, build_levels, parse_limits
+
+
+class TestAdaptiveStream(unittest.TestCase):
+    """Pruebas del control de calidad, resolución y fps"""
+
+    def test_query_limits_are_clamped(self):
+        """Prueba 1: Los techos de la URL se validan y limitan"""
+        self.assertEqual(parse_limits({}, 30, 80, None), (30, 80, None))
+        self.assertEqual(parse_limits({'fps': '10', 'q': '60', 'w': '480'}), (10, 60, 480))
+        self.assertEqual(parse_limits({'fps': '500', 'q': 'abc', 'w': '10'}), (30, 80, 160))
+        # El visor solo puede bajar los techos configurados
+        self.assertEqual(parse_limits({'fps': '60', 'q': '95', 'w': '4000'}, 30, 80, 640), (30, 80, 640))
+        self.assertEqual(parse_limits({'fps': '0', 'q': '5'}, 30, 80, 640), (1, 10, 640))
+        self.assertEqual(parse_limits({'w': '4000'}, 30, 80, None), (30, 80, 4000))
+        print("✓ Test 1: Techos de la URL validados - PASSED")
+
+    def test_levels_degrade_quality_then_size_then_fps(self):
+        """Prueba 2: La escalera degrada calidad, resolución y por último fps"""
+        levels = build_levels(30, 80)
+
+        self.assertEqual(levels[0], (30, 80, 1.0))
+        qualities = [level.quality for level in levels]
+        self.assertEqual(qualities, sorted(qualities, reverse=True))
+        first_scaled = next(i for i, level in enumerate(levels) if level.scale < 1.0)
+        first_slow = next(i for i, level in enumerate(levels) if level.fps < 30)
+        self.assertEqual(levels[first_scaled - 1].quality, levels[-1].quality)
+        self.assertGreater(first_slow, first_scaled)
+        print("✓ Test 2: Orden de degradación - PASSED")
+
+    def test_backpressure_lowers_and_recovers_level(self):
+        """Prueba 3: Un envío lento baja el nivel y uno holgado lo recupera"""
+        controller = AdaptiveStreamController(max_fps=30, max_quality=80)
+        # Enlace lento: cada frame tarda 50 ms en enviarse (más que 1/30 s)
+        for _ in range(20):
+            controller.record_send(0.05, 40000)
+        degraded = controller.level
+        self.assertGreater(degraded, 0)
+
+        # Enlace rápido: el envío es casi instantáneo
+        for _ in range(500):
+            controller.record_send(0.0005, 20000)
+        self.assertEqual(controller.level, 0)
+        self.assertGreater(controller.snapshot()["changes"], degraded)
+        print("✓ Test 3: Degradación y recuperación - PASSED")
+
+    def test_fps_ceiling_and_resolution(self):
+        """Prueba 4: Se respeta el techo de fps y el ancho del nivel"""
+        controller = AdaptiveStreamController(max_fps=10, max_quality=70, max_width=320)
+        # Cámara a 30 fps durante un segundo
+        admitted = sum(controller.admit(now=i / 30) for i in range(30))
+        self.assertLessEqual(admitted, 11)
+        self.assertGreaterEqual(admitted, 9)
+
+        encoder = OpenCVEncoder(quality=90)
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        scaled = controller.prepare(frame, encoder)
+        self.assertEqual(scaled.shape, (240, 320, 3))
+        self.assertEqual(encoder.quality, 70)
+        print("✓ Test 4: Techos de fps y ancho - PASSED")
+
+
+class TestFrameDiffGate(unittest.TestCase):
+    """Pruebas del filtro de frames sin cambios"""
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.frame = rng.integers(0, 255, (480, 640, 3), dtype=np.uint8)
+
+    def test_still_scene_is_gated_with_keepalive(self):
+        """Prueba 5: Una escena quieta solo envía frames de keep-alive"""
+        gate = FrameDiffGate(threshold=1.5, keepalive=0.5)
+        rng = np.random.default_rng(1)
+        sent = []
+        # Dos segundos a 30 fps con ruido de sensor leve
+        for i in range(60):
+            noise = rng.integers(0, 2, self.frame.shape, dtype=np.uint8)
+            sent.append(gate.should_send(self.frame + noise, key=(3, (0, 255, 0)), now=i / 30))
+
+        self.assertTrue(sent[0])
+        self.assertLessEqual(sum(sent), 5)
+        self.assertGreaterEqual(sum(sent), 4)
+        self.assertGreater(gate.snapshot()["gated_ratio"], 0.9)
+        print("✓ Test 5: Escena quieta filtrada - PASSED")
+
+    def test_motion_or_overlay_change_is_sent(self):
+        """Prueba 6: El movimiento o un cambio del overlay se envían"""
+        gate = FrameDiffGate()
+        self.assertTrue(gate.should_send(self.frame, key=2, now=0.0))
+        self.assertFalse(gate.should_send(self.frame, key=2, now=0.03))
+
+        moved = np.roll(self.frame, 40, axis=1)
+        self.assertTrue(gate.should_send(moved, key=2, now=0.06))
+        self.assertTrue(gate.should_send(moved, key=3, now=0.09))
+        print("✓ Test 6: Movimiento y overlay enviados - PASSED")
+
+
+if __name__ == '__main__':
+    print("\n" + "="*70)
+    print("PRUEBAS DEL STREAM ADAPTATIVO - Sistema de Asistencia")
+    print("="*70 + "\n")
+
+    unittest.main(verbosity=2)
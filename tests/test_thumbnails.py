@@ -0,0 +1,142 @@
+# ============================================
+# ARCHIVO: tests/test_thumbnails.py
+# Pruebas de las miniaturas de fotos de perfil
+# ============================================
+
+import os
+import sys
+import django
+
+# Configurar Django antes de importar modelos
+if __name__ == '__main__':
+    # Agregar el directorio raíz al path
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+    # Configurar settings de Django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'asistencia_project.settings')
+    django.setup()
+
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+import cv2
+import numpy as np
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.contrib.auth.models import User
+from core.models import UserProfile
+from core.thumbnails import render_thumbnails, thumbnail_name
+
+
+def photo_upload(name, width=800, height=600):
+    image = np.zeros((height, width, 3), dtype=np.uint8)
+    image[:, width // 2:] = (40, 160, 220)
+    _, jpg = cv2.imencode('.jpg', image)
+    return SimpleUploadedFile(name, jpg.tobytes(), content_type='image/jpeg')
+
+
+class TestRenderThumbnails(SimpleTestCase):
+    """Pruebas de la generación de miniaturas"""
+
+    def test_square_sizes_and_formats(self):
+        """Prueba 1: Miniaturas cuadradas por ancho y formato, sin ampliar"""
+        image = np.full((300, 200, 3), 128, dtype=np.uint8)
+        rendered = render_thumbnails(image, widths=(64, 160, 320), formats=('webp', 'jpeg'), quality=80)
+
+        self.assertEqual(len(rendered), 6)
+        sizes = {key: cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR).shape[:2]
+                 for key, data in rendered.items()}
+        self.assertEqual(sizes[64, 'webp'], (64, 64))
+        self.assertEqual(sizes[160, 'jpeg'], (160, 160))
+        # 320 no cabe en la foto: se genera con su ancho real
+        self.assertEqual(sizes[200, 'jpeg'], (200, 200))
+        self.assertTrue(rendered[64, 'webp'].startswith(b'RIFF'))
+
+        small = render_thumbnails(image[:100, :100], widths=(64, 160, 320), formats=('jpeg',), quality=80)
+        self.assertEqual(sorted(small), [(64, 'jpeg'), (100, 'jpeg')])
+        self.assertEqual(thumbnail_name('fotos_perfil/ana.v2.png', 64, 'jpeg'), 'fotos_perfil/ana.v2.64w.jpg')
+        print("✓ Test 1: Miniaturas cuadradas - PASSED")
+
+
+class ProfileThumbnailTest(TestCase):
+    """Pruebas de las miniaturas de las fotos subidas"""
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media, ignore_errors=True)
+
+    def test_upload_generates_thumbnails_and_tag(self):
+        """Prueba 2: Subir una foto genera sus miniaturas y la etiqueta las ofrece"""
+        user = User.objects.create_user(username='ana', password='pass123')
+        user.profile.foto_perfil = photo_upload('ana.jpg')
+        user.profile.save()
+
+        name = user.profile.foto_perfil.name
+        for width in (64, 160, 320):
+            for fmt in ('webp', 'jpeg'):
+                self.assertTrue(os.path.exists(os.path.join(self.media, thumbnail_name(name, width, fmt))))
+
+        html = Template("{% load thumbnails %}{% profile_picture profile 40 %}").render(
+            Context({'profile': user.profile}))
+        self.assertIn('<source type="image/webp"', html)
+        self.assertIn('.64w.webp 64w', html)
+        self.assertIn('src="/media/fotos_perfil/ana.64w.jpg"', html)
+        self.assertIn('sizes="40px"', html)
+        self.assertEqual(UserProfile.objects.get(user=user).miniaturas['anchos'], [64, 160, 320])
+
+        # Foto más chica que el ancho mayor: srcset con los anchos reales,
+        # leídos del perfil sin consultar el storage
+        user.profile.foto_perfil = photo_upload('chica.jpg', 200, 150)
+        user.profile.save()
+        profile = UserProfile.objects.get(user=user)
+        with mock.patch('django.core.files.storage.FileSystemStorage.exists') as exists:
+            html = Template("{% load thumbnails %}{% profile_picture profile 40 %}").render(
+                Context({'profile': profile}))
+        exists.assert_not_called()
+        self.assertIn('.150w.webp 150w', html)
+        self.assertNotIn('320w', html)
+        self.assertNotIn('160w', html)
+
+        sin_foto = User.objects.create_user(username='luis', password='pass123')
+        self.assertEqual(Template("{% load thumbnails %}{% profile_picture profile %}").render(
+            Context({'profile': sin_foto.profile})), '')
+        print("✓ Test 2: Miniaturas al subir la foto - PASSED")
+
+    def test_backfill_command(self):
+        """Prueba 3: build_thumbnails crea las miniaturas de fotos existentes"""
+        user = User.objects.create_user(username='ana', password='pass123')
+        UserProfile.objects.filter(user=user).update(foto_perfil='fotos_perfil/vieja.jpg')
+        os.makedirs(os.path.join(self.media, 'fotos_perfil'))
+        with open(os.path.join(self.media, 'fotos_perfil', 'vieja.jpg'), 'wb') as photo:
+            photo.write(photo_upload('vieja.jpg').read())
+        html = Template("{% load thumbnails %}{% profile_picture profile 40 %}").render(
+            Context({'profile': UserProfile.objects.get(user=user)}))
+        self.assertIn('src="/media/fotos_perfil/vieja.jpg"', html)
+
+        out = StringIO()
+        call_command('build_thumbnails', stdout=out)
+        self.assertIn("Con miniaturas nuevas: 1", out.getvalue())
+        self.assertTrue(os.path.exists(os.path.join(self.media, 'fotos_perfil', 'vieja.160w.webp')))
+
+        out = StringIO()
+        call_command('build_thumbnails', stdout=out)
+        self.assertIn("Ya tenían: 1", out.getvalue())
+        print("✓ Test 3: Miniaturas de fotos existentes - PASSED")
+
+
+if __name__ == '__main__':
+    import unittest
+
+    print("\n" + "="*70)
+    print("PRUEBAS DE MINIATURAS - Sistema de Asistencia")
+    print("="*70 + "\n")
+
+    unittest.main(verbosity=2)